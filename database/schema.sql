@@ -4,6 +4,14 @@ CREATE DATABASE IF NOT EXISTS restaurant_database;
 USE restaurant_database;
 
 -- Drop existing tables 
+DROP TABLE IF EXISTS schema_migrations;
+DROP TABLE IF EXISTS idempotency_keys;
+DROP TABLE IF EXISTS wallet_snapshots;
+DROP TABLE IF EXISTS wallet_ledger;
+DROP TABLE IF EXISTS id_sequences;
+DROP TABLE IF EXISTS staff_stats;
+DROP TABLE IF EXISTS revenue_daily;
+DROP TABLE IF EXISTS revenue_hourly;
 DROP TABLE IF EXISTS chat_ratings;
 DROP TABLE IF EXISTS chat_history;
 DROP TABLE IF EXISTS knowledge_base;
@@ -43,7 +51,9 @@ CREATE TABLE users(
     amount_warnings INT NOT NULL DEFAULT 0,
     vip_status BOOLEAN NOT NULL DEFAULT FALSE,
     is_blacklisted BOOLEAN NOT NULL DEFAULT FALSE,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_role_name (role, name),
+    INDEX idx_role_warnings (role, amount_warnings DESC, name)
 );
 
 -- ============================================
@@ -68,13 +78,15 @@ CREATE TABLE category(
 CREATE TABLE role (
     role_id INT AUTO_INCREMENT PRIMARY KEY,
     role_type VARCHAR(100) NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE INDEX idx_role_type (role_type)
 );
 
 CREATE TABLE permissions(
     permissions_id INT AUTO_INCREMENT PRIMARY KEY,
     permissions_type VARCHAR(255) NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE INDEX idx_permissions_type (permissions_type)
 );
 
 CREATE TABLE menu_items(
@@ -107,7 +119,10 @@ CREATE TABLE reservations(
     special_request VARCHAR(100),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (customer_id) REFERENCES users(user_id) ON DELETE CASCADE,
-    FOREIGN KEY (table_id) REFERENCES restaurant_tables(table_id) ON DELETE CASCADE
+    FOREIGN KEY (table_id) REFERENCES restaurant_tables(table_id) ON DELETE CASCADE,
+    INDEX idx_table_date (table_id, reservation_date),
+    INDEX idx_date_time (reservation_date, reservation_time),
+    INDEX idx_customer_date_time (customer_id, reservation_date, reservation_time)
 );
 
 CREATE TABLE orders(
@@ -125,7 +140,10 @@ CREATE TABLE orders(
     delivery_time TIME NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     INDEX idx_delivered_by (delivered_by),
-    INDEX idx_prepared_by (prepared_by)
+    INDEX idx_prepared_by (prepared_by),
+    INDEX idx_status_created (delivery_status, created_at),
+    INDEX idx_customer_created (customer_id, created_at),
+    INDEX idx_created (created_at)
 );
 
 CREATE TABLE payment(
@@ -139,6 +157,29 @@ CREATE TABLE payment(
     FOREIGN KEY (payed_by) REFERENCES users(user_id) ON DELETE CASCADE
 );
 
+-- Revenue rollups, kept current by order create/cancel; a bucket is spread
+-- over several slot rows (summed on read) so concurrent orders do not queue
+-- (rebuild with: python -m models.revenue_rollup backfill)
+CREATE TABLE revenue_hourly(
+    bucket_start DATETIME NOT NULL,
+    slot TINYINT UNSIGNED NOT NULL DEFAULT 0,
+    order_count INT NOT NULL DEFAULT 0,
+    gross_revenue DECIMAL(12,2) NOT NULL DEFAULT 0,
+    cancelled_count INT NOT NULL DEFAULT 0,
+    refunded_amount DECIMAL(12,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_start, slot)
+);
+
+CREATE TABLE revenue_daily(
+    bucket_start DATE NOT NULL,
+    slot TINYINT UNSIGNED NOT NULL DEFAULT 0,
+    order_count INT NOT NULL DEFAULT 0,
+    gross_revenue DECIMAL(12,2) NOT NULL DEFAULT 0,
+    cancelled_count INT NOT NULL DEFAULT 0,
+    refunded_amount DECIMAL(12,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_start, slot)
+);
+
 CREATE TABLE order_items(
     order_item_id INT AUTO_INCREMENT PRIMARY KEY,
     order_id INT NOT NULL,
@@ -170,7 +211,12 @@ CREATE TABLE feedback(
     message VARCHAR(300) NOT NULL,
     related_order INT NULL,
     FOREIGN KEY (related_order) REFERENCES orders(order_id) ON DELETE CASCADE, 
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_feedback_for_type (feedback_for, feedback_type),
+    INDEX idx_feedback_from (feedback_from),
+    INDEX idx_feedback_created (created_at),
+    INDEX idx_for_created (feedback_for, created_at),
+    INDEX idx_from_created (feedback_from, created_at)
 );
 
 CREATE TABLE role_permissions (
@@ -187,9 +233,47 @@ CREATE TABLE reviews (
     amount_stars INT NOT NULL,
     item_reviewed INT NOT NULL,
     reviewed_by INT NOT NULL,
+    related_order INT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (item_reviewed) REFERENCES menu_items(item_id) ON DELETE CASCADE,
-    FOREIGN KEY (reviewed_by) REFERENCES users(user_id) ON DELETE CASCADE
+    FOREIGN KEY (reviewed_by) REFERENCES users(user_id) ON DELETE CASCADE,
+    FOREIGN KEY (related_order) REFERENCES orders(order_id) ON DELETE SET NULL
+);
+
+-- Per-employee totals for chef/driver profiles and the manager's employee list
+-- (rebuild with: python -m models.staff_stats)
+CREATE TABLE staff_stats (
+    user_id INT PRIMARY KEY,
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+    dishes_prepared INT NOT NULL DEFAULT 0,
+    deliveries INT NOT NULL DEFAULT 0,
+    complaints INT NOT NULL DEFAULT 0,
+    compliments INT NOT NULL DEFAULT 0,
+    rating_sum INT NOT NULL DEFAULT 0,
+    rating_count INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- Wallet: append-only entries (positive = credit, negative = debit) and each
+-- user's balance up to last_entry_id; users.total_balance is the starting
+-- balance and is kept in sync by compaction (python -m models.wallet)
+CREATE TABLE wallet_ledger (
+    entry_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    amount DECIMAL(10,2) NOT NULL,
+    reason VARCHAR(20) NOT NULL,
+    order_id INT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+    INDEX idx_user_entry (user_id, entry_id)
+);
+
+CREATE TABLE wallet_snapshots (
+    user_id INT PRIMARY KEY,
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+    balance DECIMAL(12,2) NOT NULL DEFAULT 0,
+    last_entry_id BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
 
@@ -206,6 +290,7 @@ CREATE TABLE knowledge_base (
     is_approved BOOLEAN DEFAULT TRUE,
     is_active BOOLEAN DEFAULT TRUE,
     avg_rating DECIMAL(3,2) DEFAULT 0,
+    rating_sum INT DEFAULT 0,
     total_ratings INT DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
@@ -226,10 +311,17 @@ CREATE TABLE chat_history (
     FOREIGN KEY (kb_id) REFERENCES knowledge_base(kb_id) ON DELETE SET NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     INDEX idx_user (user_id),
+    INDEX idx_user_created (user_id, created_at),
     INDEX idx_session (session_id),
     INDEX idx_source (source)
 );
 
+-- Blocks of ids handed out ahead of time (chat_history rows are written in batches)
+CREATE TABLE id_sequences (
+    name VARCHAR(50) PRIMARY KEY,
+    next_id BIGINT NOT NULL
+);
+
 CREATE TABLE chat_ratings (
     rating_id INT AUTO_INCREMENT PRIMARY KEY,
     chat_id INT NOT NULL,
@@ -244,7 +336,8 @@ CREATE TABLE chat_ratings (
     review_status VARCHAR(50) DEFAULT 'pending',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     INDEX idx_flagged (is_flagged),
-    INDEX idx_review_status (review_status)
+    INDEX idx_review_status (review_status),
+    INDEX idx_flagged_pending (is_flagged, review_status, created_at)
 );
 
 
@@ -282,6 +375,42 @@ CREATE TABLE vip_requests (
 );
 
 
+-- SCHEMA VERSION (see new_backend/migrations.py; this file already includes every migration)
+
+
+-- Responses of POSTs sent with an Idempotency-Key, replayed to retries
+-- (key_hash = sha256 of caller, endpoint and key; purged after IDEMPOTENCY_TTL)
+CREATE TABLE idempotency_keys (
+    key_hash CHAR(64) PRIMARY KEY,
+    request_hash CHAR(64) NOT NULL,
+    status_code INT NULL,
+    response_body MEDIUMTEXT NULL,
+    content_type VARCHAR(100) NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_idempotency_created (created_at)
+);
+
+CREATE TABLE schema_migrations (
+    version INT PRIMARY KEY,
+    description VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO schema_migrations (version, description) VALUES
+(1, 'knowledge_base.rating_sum for incremental ratings'),
+(2, 'id_sequences for pre-allocated chat ids'),
+(3, 'hourly/daily revenue rollups'),
+(4, 'staff_stats rollup and reviews.related_order'),
+(5, 'composite indexes for hot query shapes'),
+(6, 'indexes for paged list sort orders'),
+(7, 'default role/permission matrix'),
+(8, 'wallet ledger and balance snapshots'),
+(9, 'idempotency_keys for replayed POSTs'),
+(10, 'slot column on revenue rollups'),
+(11, 'link older reviews to their order'),
+(12, 'wallet snapshots for existing users');
+
+
 -- INSERT SAMPLE DATA
 
 
@@ -306,6 +435,64 @@ INSERT INTO users (username, password_hash, name, email, phone, home_address, ro
 ('manager123', '$2b$12$yYL2CDC4NmdoWky60GzgtOtshIYqUtjGVmLCa6LriYnps91IEKt1C', 'Default Manager', 'manager@sdfoods.com', '1234567899', '132 Manager St', 'manager', 0, 5000.00, 0, 0),
 ('manager', '$2b$12$rui5wKppwA3GRyWycRMBX.oSaNkDnGEJVTQPiM5fbSLhL9FRp.hnq', 'Restaurant Manager', 'manager2@sdfoods.com', '1234567900', '133 Manager St', 'manager', 0, 5000.00, 0, 0);
 
+-- Every user starts with a wallet snapshot at their starting balance
+INSERT INTO wallet_snapshots (user_id, balance, last_entry_id)
+SELECT user_id, total_balance, 0 FROM users;
+
+-- Roles and permissions (loaded into memory by utils/permissions.py)
+INSERT INTO role (role_type) VALUES
+('chef'),
+('driver'),
+('delivery'),
+('manager'),
+('admin'),
+('customer');
+
+INSERT INTO permissions (permissions_type) VALUES
+('orders.prepare'),
+('menu.edit'),
+('knowledge.auto_approve'),
+('orders.deliver'),
+('manager.dashboard'),
+('feedback.resolve'),
+('staff.manage'),
+('customers.manage'),
+('bids.assign'),
+('knowledge.review');
+
+INSERT INTO role_permissions (role_id, permissions_id)
+SELECT r.role_id, p.permissions_id
+FROM role r
+JOIN permissions p
+WHERE (r.role_type, p.permissions_type) IN (
+    ('chef', 'orders.prepare'),
+    ('chef', 'menu.edit'),
+    ('chef', 'knowledge.auto_approve'),
+    ('driver', 'orders.deliver'),
+    ('driver', 'knowledge.auto_approve'),
+    ('delivery', 'orders.deliver'),
+    ('delivery', 'knowledge.auto_approve'),
+    ('manager', 'manager.dashboard'),
+    ('manager', 'feedback.resolve'),
+    ('manager', 'staff.manage'),
+    ('manager', 'customers.manage'),
+    ('manager', 'bids.assign'),
+    ('manager', 'orders.prepare'),
+    ('manager', 'menu.edit'),
+    ('manager', 'knowledge.auto_approve'),
+    ('manager', 'knowledge.review'),
+    ('admin', 'manager.dashboard'),
+    ('admin', 'feedback.resolve'),
+    ('admin', 'staff.manage'),
+    ('admin', 'customers.manage'),
+    ('admin', 'bids.assign'),
+    ('admin', 'orders.prepare'),
+    ('admin', 'orders.deliver'),
+    ('admin', 'menu.edit'),
+    ('admin', 'knowledge.auto_approve'),
+    ('admin', 'knowledge.review')
+);
+
 -- Insert categories
 INSERT INTO category (category_type) VALUES 
 ('Burgers'),
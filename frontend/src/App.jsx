@@ -18,6 +18,7 @@ import DeliveryDashboard from "./pages/DeliveryDashboard.jsx";
 
 // OrderHistory import
 import OrderHistory from "./pages/OrderHistory.jsx";
+import client, { getAllPages } from "./api/client";
 
 function OrderHistoryWrapper() {
   const navigate = useNavigate();
@@ -31,14 +32,17 @@ function OrderHistoryWrapper() {
       navigate("/login");
       return;
     }
-    setCustomer(JSON.parse(stored));
-    fetchOrders();
+    const parsed = JSON.parse(stored);
+    setCustomer(parsed);
+    fetchOrders(parsed);
   }, [navigate]);
 
-  const fetchOrders = async () => {
+  const fetchOrders = async (user) => {
     try {
-      const response = await fetch('/api/orders/history');
-      const data = await response.json();
+      // only this customer's orders, following X-Next-Cursor if paged
+      const data = await getAllPages("/orders/history", {
+        customer_id: user.customer_id || user.id,
+      });
       setOrders(data);
     } catch (error) {
       console.error('Error fetching orders:', error);
@@ -76,10 +80,9 @@ function OrderHistoryWrapper() {
 
   const updateRating = async (orderId, foodRating, deliveryRating) => {
     try {
-      await fetch(`/api/orders/${orderId}/rating`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ foodRating, deliveryRating })
+      await client.post(`/orders/${orderId}/rating`, {
+        food_rating: foodRating,
+        delivery_rating: deliveryRating
       });
 
       setOrders(prev =>
@@ -33,4 +33,17 @@ client.interceptors.response.use(
   }
 );
 
+// List endpoints return one page at a time and put the cursor for the
+// next page in the X-Next-Cursor header; follow it until the last page
+export const getAllPages = async (url, params = {}) => {
+  const rows = [];
+  let cursor = null;
+  do {
+    const res = await client.get(url, { params: cursor ? { ...params, cursor } : params });
+    rows.push(...(res.data || []));
+    cursor = res.headers['x-next-cursor'] || null;
+  } while (cursor);
+  return rows;
+};
+
 export default client;
\ No newline at end of file
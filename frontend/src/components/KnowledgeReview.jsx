@@ -1,6 +1,6 @@
 import { useState, useEffect } from "react";
 import { AlertTriangle, CheckCircle, XCircle, Star } from "lucide-react";
-import client from "../api/client";
+import client, { getAllPages } from "../api/client";
 
 export default function KnowledgeReview({ manager }) {
   const [flaggedItems, setFlaggedItems] = useState([]);
@@ -13,8 +13,7 @@ export default function KnowledgeReview({ manager }) {
   const loadFlaggedItems = async () => {
     try {
       setLoading(true);
-      const response = await client.get("/chat/knowledge/flagged");
-      setFlaggedItems(response.data || []);
+      setFlaggedItems(await getAllPages("/chat/knowledge/flagged"));
     } catch (error) {
       console.error("Failed to load flagged items:", error);
       setFlaggedItems([]);
@@ -167,6 +167,7 @@ export default function ChefDashboard() {
           <button
             onClick={() => {
               localStorage.removeItem("customer");
+              localStorage.removeItem("token");
               navigate("/login");
             }}
             className="btn btn-ghost btn-sm"
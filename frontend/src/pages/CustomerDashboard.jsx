@@ -33,6 +33,7 @@ export default function CustomerDashboard() {
 
   const handleLogout = () => {
     localStorage.removeItem("customer");
+    localStorage.removeItem("token");
     localStorage.removeItem("cart");
     navigate("/login");
   };
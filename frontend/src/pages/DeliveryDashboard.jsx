@@ -243,6 +243,7 @@ export default function DeliveryDashboard() {
 
   const handleLogout = () => {
     localStorage.removeItem("customer");
+    localStorage.removeItem("token");
     navigate("/login");
   };
 
@@ -31,8 +31,9 @@ export default function Login() {
       console.log("Login successful:", user);
       console.log(" User role:", user.role);
 
-      // Save to localStorage
+      // Save to localStorage (the api client sends the token on every request)
       localStorage.setItem("customer", JSON.stringify(user));
+      localStorage.setItem("token", user.token);
 
       // CRITICAL: Navigate based on role
       if (user.role === "chef") {
@@ -19,7 +19,7 @@ import {
   Crown,
   UserCheck,
 } from "lucide-react";
-import client from "../api/client";
+import client, { getAllPages } from "../api/client";
 import KnowledgeReview from "../components/KnowledgeReview"; 
 
 export default function ManagerDashboard() {
@@ -91,8 +91,7 @@ export default function ManagerDashboard() {
 
   const loadFeedback = async () => {
     try {
-      const res = await client.get("/manager/feedback");
-      setFeedback(res.data || []);
+      setFeedback(await getAllPages("/manager/feedback"));
     } catch (error) {
       console.error("Failed to load feedback:", error);
       setFeedback([]);
@@ -101,8 +100,7 @@ export default function ManagerDashboard() {
 
   const loadEmployees = async () => {
     try {
-      const res = await client.get("/manager/employees");
-      setEmployees(res.data || []);
+      setEmployees(await getAllPages("/manager/employees"));
     } catch (error) {
       console.error("Failed to load employees:", error);
       setEmployees([]);
@@ -111,8 +109,7 @@ export default function ManagerDashboard() {
 
   const loadCustomers = async () => {
     try {
-      const res = await client.get("/manager/customers");
-      setCustomers(res.data || []);
+      setCustomers(await getAllPages("/manager/customers"));
     } catch (error) {
       console.error("Failed to load customers:", error);
       setCustomers([]);
@@ -324,6 +321,7 @@ export default function ManagerDashboard() {
           <button
             onClick={() => {
               localStorage.removeItem("customer");
+              localStorage.removeItem("token");
               navigate("/login");
             }}
             className="btn btn-ghost btn-sm"
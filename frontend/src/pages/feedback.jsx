@@ -11,7 +11,7 @@ import {
   UtensilsCrossed,
   Truck,
 } from "lucide-react";
-import client from "../api/client";
+import client, { getAllPages } from "../api/client";
 
 export default function FeedbackPage() {
   const navigate = useNavigate();
@@ -46,10 +46,10 @@ export default function FeedbackPage() {
 
   const fetchFeedbackHistory = async (customerId) => {
     try {
-      const sentRes = await client.get(`/feedback/sent/${customerId}`);
-      const receivedRes = await client.get(`/feedback/received/${customerId}`);
-      setMyFeedback(sentRes.data || []);
-      setFeedbackReceived(receivedRes.data || []);
+      const sent = await getAllPages(`/feedback/sent/${customerId}`);
+      const received = await getAllPages(`/feedback/received/${customerId}`);
+      setMyFeedback(sent);
+      setFeedbackReceived(received);
     } catch (err) {
       console.error("Error loading feedback history:", err);
       setMyFeedback([]);
@@ -1,31 +1,40 @@
 from flask import Flask
 from flask_cors import CORS
-from config import FLASK_CONFIG, CORS_CONFIG
-
-# Import blueprints
-from routes.auth import auth_bp
-from routes.users import users_bp
-from routes.menu import menu_bp
-from routes.orders import orders_bp
-from routes.feedback import feedback_bp
-from routes.chat import chat_bp
-from routes.chef import chef_bp
-from routes.delivery import delivery_bp
-from routes.manager import manager_bp
-from routes.wallet import wallet_bp
+from config import FLASK_CONFIG, CORS_CONFIG, JOBS_CONFIG
 
+# Blueprints, models and jobs are imported inside the functions below: the
+# password hashing workers are spawned processes that re-import this module
+# (python app.py makes it __main__), and they only need utils.auth_helpers
 
 
 def create_app():
     """Application factory pattern"""
+    from routes.auth import auth_bp
+    from routes.users import users_bp
+    from routes.menu import menu_bp
+    from routes.orders import orders_bp
+    from routes.feedback import feedback_bp
+    from routes.chat import chat_bp
+    from routes.chef import chef_bp
+    from routes.delivery import delivery_bp
+    from routes.manager import manager_bp
+    from routes.wallet import wallet_bp
+    from routes.reservations import reservations_bp
+    from utils.serializers import FastJSONProvider
+    from utils.tokens import signing_key
+
+    # Fail at startup rather than hand out forgeable tokens
+    signing_key()
+
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)  # orjson when installed, same output as the default
     
     # Configuration
     app.config['SECRET_KEY'] = FLASK_CONFIG['SECRET_KEY']
     app.config['DEBUG'] = FLASK_CONFIG['DEBUG']
     
     # Enable CORS
-    CORS(app, origins=CORS_CONFIG['origins'])
+    CORS(app, origins=CORS_CONFIG['origins'], expose_headers=CORS_CONFIG['expose_headers'])
     
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -38,19 +47,31 @@ def create_app():
     app.register_blueprint(delivery_bp, url_prefix='/api/delivery')
     app.register_blueprint(manager_bp, url_prefix='/api/manager')
     app.register_blueprint(wallet_bp, url_prefix='/api/wallet')
+    app.register_blueprint(reservations_bp, url_prefix='/api/reservations')
+    
+    # Background jobs
+    if JOBS_CONFIG['enabled']:
+        start_background_jobs()
     
     # Health check route
     @app.route('/api/health', methods=['GET'])
     def health_check():
         """Health check endpoint"""
-        from db import get_db_connection
+        from db import get_db_connection, pool_stats
         try:
             conn = get_db_connection()
             if conn:
                 conn.close()
-                return {"status": "healthy", "database": "connected"}, 200
+                body = {"status": "healthy", "database": "connected"}
+                status = 200
             else:
-                return {"status": "unhealthy", "database": "disconnected"}, 500
+                body = {"status": "unhealthy", "database": "disconnected"}
+                status = 500
+
+            stats = pool_stats()
+            if stats is not None:
+                body["pool"] = stats
+            return body, status
         except Exception as e:
             return {"status": "error", "error": str(e)}, 500
     
@@ -66,6 +87,33 @@ def create_app():
     return app
 
 
+def start_background_jobs():
+    """Start periodic maintenance jobs (once per process)"""
+    from utils.background import start_periodic
+    from utils.tokens import revocations
+    from utils.permissions import permission_matrix
+    from utils.idempotency import purge_expired_keys
+    from models.kb_ratings import run_reconciliation
+    from models.dashboard_counters import dashboard_counters
+    from models.staff_stats import StaffStats
+    from models.wallet import Wallet
+
+    if JOBS_CONFIG['kb_ratings_interval'] > 0:
+        start_periodic("kb-ratings", JOBS_CONFIG['kb_ratings_interval'], run_reconciliation)
+    if JOBS_CONFIG['dashboard_interval'] > 0:
+        start_periodic("dashboard-recount", JOBS_CONFIG['dashboard_interval'], dashboard_counters.recount)
+    if JOBS_CONFIG['staff_stats_interval'] > 0:
+        start_periodic("staff-stats", JOBS_CONFIG['staff_stats_interval'], StaffStats.reconcile)
+    if JOBS_CONFIG['revocations_interval'] > 0:
+        start_periodic("token-revocations", JOBS_CONFIG['revocations_interval'], revocations.reload, run_at_start=True)
+    if JOBS_CONFIG['permissions_interval'] > 0:
+        start_periodic("permissions", JOBS_CONFIG['permissions_interval'], permission_matrix.reload, run_at_start=True)
+    if JOBS_CONFIG['wallet_compact_interval'] > 0:
+        start_periodic("wallet-compact", JOBS_CONFIG['wallet_compact_interval'], Wallet.compact)
+    if JOBS_CONFIG['idempotency_purge_interval'] > 0:
+        start_periodic("idempotency-purge", JOBS_CONFIG['idempotency_purge_interval'], purge_expired_keys)
+
+
 if __name__ == '__main__':
     app = create_app()
     app.run(
@@ -0,0 +1,136 @@
+"""
+Microbenchmark: order row serialization and JSON encoding
+
+    python bench_serializers.py [--orders 2000] [--items 3] [--repeat 5]
+
+Compares the old per-value serialize_order() against RowSerializer (with
+converters from cursor.description and learned from the first row), and
+Flask's default JSON provider against FastJSONProvider. Uses synthetic
+rows shaped like the order history query, so no database is needed.
+"""
+import argparse
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from utils.serializers import FastJSONProvider, RowSerializer, orjson
+
+
+def legacy_serialize_order(order):
+    """serialize_order() as it was in routes/orders.py"""
+    serialized = {}
+    for key in order:
+        value = order[key]
+        if isinstance(value, Decimal):
+            serialized[key] = float(value)
+        elif isinstance(value, timedelta):
+            total_seconds = int(value.total_seconds())
+            hours = total_seconds // 3600
+            minutes = (total_seconds % 3600) // 60
+            seconds = total_seconds % 60
+            if hours < 10:
+                hours_str = "0" + str(hours)
+            else:
+                hours_str = str(hours)
+            if minutes < 10:
+                minutes_str = "0" + str(minutes)
+            else:
+                minutes_str = str(minutes)
+            if seconds < 10:
+                seconds_str = "0" + str(seconds)
+            else:
+                seconds_str = str(seconds)
+            serialized[key] = hours_str + ":" + minutes_str + ":" + seconds_str
+        elif isinstance(value, datetime):
+            serialized[key] = value.isoformat()
+        else:
+            serialized[key] = value
+    return serialized
+
+
+# (name, mysql type code) for the order history SELECT o.*, ... columns
+ORDER_DESCRIPTION = [
+    ("order_id", 3), ("customer_id", 3), ("total_price", 246), ("delivery_status", 253),
+    ("delivery_address", 253), ("delivery_date", 10), ("delivery_time", 11),
+    ("prepared_by", 3), ("delivered_by", 3), ("created_at", 7),
+    ("customer_name", 253), ("chef_name", 253), ("driver_name", 253),
+]
+ITEM_DESCRIPTION = [
+    ("order_item_id", 3), ("order_id", 3), ("item_id", 3), ("quantity", 3),
+    ("price", 246), ("name", 253), ("image_url", 253),
+]
+
+
+def make_rows(order_count, items_per_order):
+    start = datetime(2024, 1, 1, 12, 0, 0)
+    orders, items = [], []
+    for i in range(order_count):
+        orders.append({
+            "order_id": i, "customer_id": i % 50, "total_price": Decimal("42.50"),
+            "delivery_status": "Delivered", "delivery_address": "123 Main St",
+            "delivery_date": None, "delivery_time": timedelta(hours=18, minutes=30),
+            "prepared_by": 2, "delivered_by": None if i % 3 else 3,
+            "created_at": start + timedelta(minutes=i),
+            "customer_name": "Customer", "chef_name": "Chef", "driver_name": None,
+        })
+        for j in range(items_per_order):
+            items.append({
+                "order_item_id": i * items_per_order + j, "order_id": i, "item_id": j,
+                "quantity": 2, "price": Decimal("9.99"), "name": "Dish", "image_url": None,
+            })
+    return orders, items
+
+
+def best(fn, repeat):
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    orders, items = make_rows(args.orders, args.items)
+    rows = orders + items
+
+    compiled_order = RowSerializer().compile(ORDER_DESCRIPTION)
+    compiled_item = RowSerializer().compile(ITEM_DESCRIPTION)
+    learned_order, learned_item = RowSerializer(), RowSerializer()
+
+    legacy = [legacy_serialize_order(row) for row in rows]
+    assert legacy == compiled_order.many(orders) + compiled_item.many(items)
+    assert legacy == learned_order.many(orders) + learned_item.many(items)
+
+    print(f"{len(orders)} orders, {len(items)} items, best of {args.repeat}")
+    print("\nRow serialization")
+    results = [
+        ("serialize_order (old)", lambda: [legacy_serialize_order(row) for row in rows]),
+        ("RowSerializer compiled", lambda: compiled_order.many(orders) + compiled_item.many(items)),
+        ("RowSerializer learned", lambda: learned_order.many(orders) + learned_item.many(items)),
+    ]
+    base = None
+    for name, fn in results:
+        ms = best(fn, args.repeat)
+        base = base or ms
+        print(f"  {name:26s} {ms:8.2f} ms  {base / ms:5.2f}x")
+
+    app = Flask(__name__)
+    default, fast = DefaultJSONProvider(app), FastJSONProvider(app)
+    payload = legacy
+    assert default.loads(default.dumps(payload)) == fast.loads(fast.dumps(payload))
+
+    print(f"\nJSON encoding ({'orjson' if orjson else 'orjson not installed, stdlib'})")
+    base = None
+    for name, provider in (("DefaultJSONProvider", default), ("FastJSONProvider", fast)):
+        ms = best(lambda: provider.dumps(payload), args.repeat)
+        base = base or ms
+        print(f"  {name:26s} {ms:8.2f} ms  {base / ms:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
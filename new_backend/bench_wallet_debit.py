@@ -0,0 +1,197 @@
+"""
+Concurrency benchmark: parallel orders against one wallet
+
+    python bench_wallet_debit.py [--workers 8] [--attempts 200] [--affordable 50]
+                                 [--price 10] [--hold-ms 5] [--orders]
+
+Creates a scratch customer whose balance covers exactly --affordable
+orders, then fires --attempts debits at it from --workers threads, once
+with the old read-then-write check (SELECT balance, compare in Python,
+UPDATE users) and once with Wallet.debit (lock the wallet snapshot, check
+snapshot + recent entries, append a ledger entry). --hold-ms keeps each
+transaction open after the debit, like the order inserts and rollups
+around it in create_order.
+
+Correct means exactly --affordable debits succeed and the balance ends
+at 0; the old check can let more through and overdraw the account.
+
+--orders also places real orders through POST /api/orders/ with the
+Flask test client. They are removed with the scratch customer, but the
+revenue rollups and dashboard counters keep them: use a dev database.
+Needs the database from config.py (.env).
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from db import get_db_connection
+from models.wallet import Wallet
+
+
+def legacy_debit(cursor, user_id, amount):
+    """The balance check create_order used before Wallet.debit"""
+    cursor.execute("SELECT total_balance FROM users WHERE user_id = %s", (user_id,))
+    balance = float(cursor.fetchone()[0])
+    if balance < amount:
+        return False
+    cursor.execute(
+        "UPDATE users SET total_balance = total_balance - %s WHERE user_id = %s",
+        (amount, user_id)
+    )
+    return True
+
+
+def create_customer(balance):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    tag = f"bench_debit_{time.time_ns()}"
+    cursor.execute("""
+        INSERT INTO users (username, password_hash, name, email, phone, home_address,
+                           role, total_balance)
+        VALUES (%s, 'x', 'Debit Bench', %s, '', 'Bench St', 'customer', %s)
+    """, (tag, f"{tag}@example.com", balance))
+    conn.commit()
+    user_id = cursor.lastrowid
+    cursor.close()
+    conn.close()
+    return user_id
+
+
+def ledger_debit(cursor, user_id, amount):
+    return Wallet.debit(cursor, user_id, amount, 'adjustment')
+
+
+def set_balance(user_id, balance):
+    """Reset the wallet to a starting balance with no ledger entries"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM wallet_ledger WHERE user_id = %s", (user_id,))
+    cursor.execute("UPDATE users SET total_balance = %s WHERE user_id = %s", (balance, user_id))
+    cursor.execute("""
+        INSERT INTO wallet_snapshots (user_id, balance, last_entry_id) VALUES (%s, %s, 0)
+        ON DUPLICATE KEY UPDATE balance = VALUES(balance), last_entry_id = 0
+    """, (user_id, balance))
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def get_balance(user_id):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    balance = Wallet.balance(cursor, user_id)
+    cursor.close()
+    conn.close()
+    return balance
+
+
+def delete_customer(user_id):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM users WHERE user_id = %s", (user_id,))
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def run_debits(debit, user_id, args):
+    def attempt(_):
+        conn = get_db_connection()
+        cursor = conn.cursor(buffered=True)
+        try:
+            ok = debit(cursor, user_id, args.price)
+            if args.hold_ms:
+                time.sleep(args.hold_ms / 1000)
+            conn.commit()
+            return ok
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    with ThreadPoolExecutor(args.workers) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(attempt, range(args.attempts)))
+        elapsed = time.perf_counter() - start
+    return sum(results), elapsed
+
+
+def run_orders(user_id, args):
+    from app import create_app
+
+    app = create_app()
+    item = {"dish_id": args.item_id, "quantity": 1, "price": args.price}
+    body = {
+        "customer_id": user_id,
+        "items": [item],
+        "total_amount": args.price,
+        "delivery_address": "Bench St",
+    }
+    lock = threading.Lock()
+    statuses = {}
+
+    def attempt(_):
+        with app.test_client() as client:
+            status = client.post("/api/orders/", json=body).status_code
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+        return status == 201
+
+    with ThreadPoolExecutor(args.workers) as pool:
+        start = time.perf_counter()
+        placed = sum(pool.map(attempt, range(args.attempts)))
+        elapsed = time.perf_counter() - start
+    return placed, elapsed, statuses
+
+
+def report(name, succeeded, elapsed, user_id, args):
+    expected = min(args.attempts, args.affordable)
+    balance = get_balance(user_id)
+    correct = succeeded == expected and balance >= 0
+    print(f"  {name:22s} {succeeded:5d}/{expected:<5d} ok  balance {balance!s:>9}  "
+          f"{args.attempts / elapsed:8.1f} attempts/s  {'correct' if correct else 'OVERDRAWN' if balance < 0 else 'WRONG'}")
+    return correct
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--attempts", type=int, default=200)
+    parser.add_argument("--affordable", type=int, default=50)
+    parser.add_argument("--price", type=float, default=10.0)
+    parser.add_argument("--hold-ms", type=float, default=5.0)
+    parser.add_argument("--orders", action="store_true", help="also place real orders through the API")
+    parser.add_argument("--item-id", type=int, default=1, help="menu item used by --orders")
+    args = parser.parse_args()
+
+    start_balance = Decimal(str(args.price)) * args.affordable
+    user_id = create_customer(start_balance)
+    print(f"{args.attempts} debits of {args.price} from {args.workers} threads, "
+          f"balance covers {args.affordable}, hold {args.hold_ms} ms")
+
+    all_correct = True
+    try:
+        for name, debit in (("read-then-write (old)", legacy_debit), ("Wallet.debit", ledger_debit)):
+            set_balance(user_id, start_balance)
+            succeeded, elapsed = run_debits(debit, user_id, args)
+            correct = report(name, succeeded, elapsed, user_id, args)
+            all_correct = all_correct and (correct or debit is legacy_debit)
+
+        if args.orders:
+            set_balance(user_id, start_balance)
+            placed, elapsed, statuses = run_orders(user_id, args)
+            all_correct = report("POST /api/orders/", placed, elapsed, user_id, args) and all_correct
+            print(f"  status codes: {dict(sorted(statuses.items()))}")
+    finally:
+        delete_customer(user_id)
+
+    if not all_correct:
+        raise SystemExit("Wallet.debit let through a wrong number of debits")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+from dotenv import load_dotenv
+import os
+
+# Load .env file
+load_dotenv()
+
+# Database Configuration
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", ""),
+    "database": os.getenv("DB_NAME", "restaurant_database")
+}
+
+# Connection pool settings (see db.py)
+DB_POOL_CONFIG = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),              # connections kept open
+    "max_overflow": int(os.getenv("DB_POOL_MAX_OVERFLOW", "10")),  # extra connections under load
+    "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),          # seconds to wait for a free connection
+    "recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),          # replace connections older than this (seconds)
+    "pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+    "expose_metrics": os.getenv("DB_POOL_METRICS", "true").lower() == "true"  # include pool stats in /api/health
+}
+
+# In-process caches (seconds before a full reload from MySQL)
+CACHE_CONFIG = {
+    "bid_book_max_age": float(os.getenv("BID_BOOK_MAX_AGE", "30")),
+    "menu_max_age": float(os.getenv("MENU_CACHE_MAX_AGE", "300")),
+    "kb_index_max_age": float(os.getenv("KB_INDEX_MAX_AGE", "300")),
+    "llm_answer_ttl": float(os.getenv("LLM_ANSWER_TTL", "600")),             # how long an AI answer is reused
+    "llm_answer_max_entries": int(os.getenv("LLM_ANSWER_MAX_ENTRIES", "500"))
+}
+
+# Ollama (AI chat) settings; point OLLAMA_URL at a stub server for testing
+OLLAMA_CONFIG = {
+    "url": os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate"),
+    "model": os.getenv("OLLAMA_MODEL", "phi"),
+    "timeout": float(os.getenv("OLLAMA_TIMEOUT", "120")),         # seconds for a full answer / between streamed pieces
+    "connect_timeout": float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5")),
+    "workers": int(os.getenv("OLLAMA_WORKERS", "4")),              # concurrent ollama calls
+    "queue_limit": int(os.getenv("OLLAMA_QUEUE_LIMIT", "8")),      # waiting calls before answering 503
+    "deadline": float(os.getenv("OLLAMA_DEADLINE", "60")),         # max seconds a request waits for an answer
+    "retry_after": int(os.getenv("OLLAMA_RETRY_AFTER", "5")),
+    "breaker_failures": int(os.getenv("OLLAMA_BREAKER_FAILURES", "5")),  # failures in a row that open the circuit
+    "breaker_reset": float(os.getenv("OLLAMA_BREAKER_RESET", "30"))      # seconds before trying ollama again
+}
+
+# Chat history write buffer (see models/chat_history.py)
+CHAT_HISTORY_CONFIG = {
+    "batch_size": int(os.getenv("CHAT_HISTORY_BATCH_SIZE", "50")),            # rows per INSERT batch
+    "flush_interval": float(os.getenv("CHAT_HISTORY_FLUSH_INTERVAL", "1")),   # max seconds a row waits
+    "queue_limit": int(os.getenv("CHAT_HISTORY_QUEUE_LIMIT", "1000")),        # buffered rows before writing inline
+    "id_block": int(os.getenv("CHAT_HISTORY_ID_BLOCK", "100"))                # chat_ids reserved per round trip
+}
+
+# Password hashing and login throttling (see utils/auth_helpers.py)
+AUTH_CONFIG = {
+    "bcrypt_rounds": int(os.getenv("BCRYPT_ROUNDS", "12")),                  # cost for new hashes; old ones are rehashed on login
+    "hash_workers": int(os.getenv("PASSWORD_HASH_WORKERS", "2")),             # bcrypt processes, 0 = hash inline
+    "hash_queue_limit": int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "16")),  # waiting hashes before answering 503
+    "hash_timeout": float(os.getenv("PASSWORD_HASH_TIMEOUT", "10")),         # max seconds a request waits for bcrypt
+    "retry_after": int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "2")),
+    "login_attempts": int(os.getenv("LOGIN_RATE_LIMIT", "20")),              # login attempts per IP per window, 0 = no limit
+    "login_window": float(os.getenv("LOGIN_RATE_WINDOW", "60")),             # seconds
+    "token_ttl": int(os.getenv("TOKEN_TTL", "28800")),                       # access token lifetime (seconds)
+    "require_tokens": os.getenv("REQUIRE_TOKENS", "true").lower() != "false"  # reject permission-checked calls without a token; "false" opts out
+}
+
+# Streamed list responses (see utils/streaming.py)
+STREAM_CONFIG = {
+    "batch_size": int(os.getenv("STREAM_BATCH_SIZE", "500"))  # rows fetched and written per chunk
+}
+
+# Idempotency-Key replay for order and deposit POSTs (see utils/idempotency.py)
+IDEMPOTENCY_CONFIG = {
+    "ttl": int(os.getenv("IDEMPOTENCY_TTL", "86400")),                            # seconds a key and its response are kept
+    "cache_size": int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "1000")),               # completed responses kept in memory
+    "in_progress_timeout": int(os.getenv("IDEMPOTENCY_IN_PROGRESS_TIMEOUT", "60"))  # seconds before an unfinished key can be retried
+}
+
+# Background jobs (seconds between runs, 0 disables a job)
+JOBS_CONFIG = {
+    "enabled": os.getenv("BACKGROUND_JOBS", "true").lower() == "true",
+    "kb_ratings_interval": float(os.getenv("KB_RATINGS_RECONCILE_INTERVAL", "3600")),  # recompute KB rating totals
+    "dashboard_interval": float(os.getenv("DASHBOARD_RECOUNT_INTERVAL", "300")),       # recount manager dashboard stats
+    "staff_stats_interval": float(os.getenv("STAFF_STATS_RECONCILE_INTERVAL", "3600")),  # rebuild chef/driver totals
+    "revocations_interval": float(os.getenv("TOKEN_REVOCATIONS_INTERVAL", "60")),         # reload blacklisted users for tokens
+    "permissions_interval": float(os.getenv("PERMISSIONS_RELOAD_INTERVAL", "60")),        # reload the role/permission matrix
+    "wallet_compact_interval": float(os.getenv("WALLET_COMPACT_INTERVAL", "30")),         # fold wallet entries into snapshots
+    "idempotency_purge_interval": float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "3600"))  # delete expired Idempotency-Keys
+}
+
+# Flask Configuration
+FLASK_CONFIG = {
+    "SECRET_KEY": os.getenv("FLASK_SECRET_KEY", ""),  # required, signs access tokens (no default)
+    "DEBUG": True,
+    "HOST": "0.0.0.0",
+    "PORT": 5000
+}
+
+# CORS Configuration
+CORS_CONFIG = {
+    "origins": ["http://localhost:3000", "http://localhost:5173"],
+    "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    "allow_headers": ["Content-Type", "Authorization", "Idempotency-Key"],
+    "expose_headers": ["X-Next-Cursor", "Idempotent-Replayed"]  # pagination cursor, replayed POST responses
+}
@@ -1,24 +1,326 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
 import mysql.connector
-from config import DB_CONFIG
+from config import DB_CONFIG, DB_POOL_CONFIG
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes free before the checkout timeout"""
+
+
+class PooledConnection:
+    """
+    Wrapper handed out by the pool.
+
+    Behaves like a normal mysql.connector connection, except that close()
+    gives the connection back to the pool instead of dropping the socket.
+    """
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._released = False
+
+    def __getattr__(self, name):
+        # Only called for attributes not defined on the wrapper itself
+        return getattr(self._raw, name)
+
+    def close(self):
+        """Return the connection to the pool (safe to call more than once)"""
+        if self._released:
+            return
+        self._released = True
+        self._pool.release(self._raw, self._created_at)
+
+    def discard(self):
+        """
+        Drop the connection instead of returning it, e.g. with a large
+        unread result that close() would have to read to the end first
+        """
+        if self._released:
+            return
+        self._released = True
+        self._pool.release(self._raw, self._created_at, reusable=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __del__(self):
+        # Handlers that forget to close on an error path must not leak a pool slot
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe MySQL connection pool.
+
+    - pool_size connections are kept open and reused
+    - up to max_overflow extra connections are opened under load and
+      closed again when they are returned
+    - connections are pinged on checkout (pre_ping) and replaced once
+      they are older than recycle seconds
+    """
+
+    def __init__(self, connect_args, pool_size=5, max_overflow=10, timeout=10.0,
+                 recycle=1800, pre_ping=True):
+        self.connect_args = connect_args
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._total = 0
+        self._in_use = 0
+        self._waiting = 0
+
+        # Metrics
+        self._checkouts = 0
+        self._timeouts = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+
+    def _connect(self):
+        return mysql.connector.connect(**self.connect_args)
+
+    def _is_usable(self, raw, created_at):
+        if self.recycle and time.monotonic() - created_at > self.recycle:
+            return False
+        if self.pre_ping:
+            try:
+                return raw.is_connected()
+            except Exception:
+                return False
+        return True
+
+    @staticmethod
+    def _discard(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """
+        Check out a connection, waiting up to timeout seconds if the pool is exhausted
+
+        Returns:
+            PooledConnection
+
+        Raises:
+            PoolTimeoutError: no connection became free in time
+            mysql.connector.Error: a new connection could not be opened
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        raw = None
+        created_at = None
+
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    if self._idle:
+                        # LIFO keeps the most recently used (warmest) connection busy
+                        raw, created_at = self._idle.pop()
+                        break
+                    if self._total < self.pool_size + self.max_overflow:
+                        # Reserve a slot, the socket is opened outside the lock
+                        self._total += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"No database connection available after {self.timeout}s"
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+        if raw is not None and not self._is_usable(raw, created_at):
+            # Stale or dead connection: keep its slot and open a fresh one
+            self._discard(raw)
+            raw = None
+
+        if raw is None:
+            try:
+                raw = self._connect()
+                created_at = time.monotonic()
+            except Exception:
+                with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+                raise
+
+        elapsed = time.monotonic() - start
+        with self._cond:
+            self._in_use += 1
+            self._checkouts += 1
+            self._checkout_time_total += elapsed
+            self._checkout_time_max = max(self._checkout_time_max, elapsed)
+
+        return PooledConnection(self, raw, created_at)
+
+    def release(self, raw, created_at, reusable=True):
+        """
+        Give a connection back; resets any open transaction first
+
+        With reusable=False the socket is shut down without reading what
+        the server is still sending, and the slot is freed.
+        """
+        healthy = reusable
+        try:
+            if healthy and getattr(raw, "unread_result", False):
+                raw.consume_results()
+            if healthy and raw.in_transaction:
+                raw.rollback()
+        except Exception:
+            healthy = False
+
+        expired = bool(self.recycle) and time.monotonic() - created_at > self.recycle
+
+        with self._cond:
+            self._in_use -= 1
+            if healthy and not expired and len(self._idle) < self.pool_size:
+                self._idle.append((raw, created_at))
+                raw = None
+            else:
+                self._total -= 1
+            self._cond.notify()
+
+        if raw is not None:
+            if reusable:
+                self._discard(raw)
+            else:
+                self._shutdown(raw)
+
+    @staticmethod
+    def _shutdown(raw):
+        # shutdown() closes the socket without the QUIT round trip, which
+        # would wait behind the unread rows
+        try:
+            getattr(raw, "shutdown", raw.close)()
+        except Exception:
+            pass
+
+    def dispose(self):
+        """Close every idle connection (checked-out ones close when returned)"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._total -= len(idle)
+        for raw, _ in idle:
+            self._discard(raw)
+
+    def stats(self):
+        """
+        Snapshot of pool metrics
+
+        Returns:
+            dict: sizes, in-use/idle/waiting counts and checkout latency in ms
+        """
+        with self._cond:
+            avg = self._checkout_time_total / self._checkouts if self._checkouts else 0.0
+            return {
+                "pool_size": self.pool_size,
+                "max_overflow": self.max_overflow,
+                "open": self._total,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "checkout_ms_avg": round(avg * 1000, 3),
+                "checkout_ms_max": round(self._checkout_time_max * 1000, 3),
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Return the process-wide pool, creating it on first use
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    connect_args={
+                        "host": DB_CONFIG["host"],
+                        "user": DB_CONFIG["user"],
+                        "password": DB_CONFIG["password"],
+                        "database": DB_CONFIG["database"],
+                        "autocommit": False,  # Disable autocommit for transaction control
+                    },
+                    pool_size=DB_POOL_CONFIG["pool_size"],
+                    max_overflow=DB_POOL_CONFIG["max_overflow"],
+                    timeout=DB_POOL_CONFIG["timeout"],
+                    recycle=DB_POOL_CONFIG["recycle"],
+                    pre_ping=DB_POOL_CONFIG["pre_ping"],
+                )
+    return _pool
+
 
 def get_db_connection():
     """
-    Create and return a MySQL database connection
+    Check out a MySQL connection from the pool
+
+    Calling close() on the returned connection hands it back to the pool.
+    Returns None if no connection could be obtained.
     """
     try:
-        conn = mysql.connector.connect(
-            host=DB_CONFIG["host"],
-            user=DB_CONFIG["user"],
-            password=DB_CONFIG["password"],
-            database=DB_CONFIG["database"],
-            autocommit=False  # Disable autocommit for transaction control
-        )
-        return conn
-    except mysql.connector.Error as e:
+        return get_pool().acquire()
+    except (mysql.connector.Error, PoolTimeoutError) as e:
         print(f"Database connection error: {e}")
         return None
 
 
+@contextmanager
+def db_connection():
+    """
+    Context manager that always returns the connection to the pool
+
+    Usage:
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            ...
+            conn.commit()
+
+    Uncommitted work is rolled back when the block exits.
+    """
+    conn = get_pool().acquire()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def pool_stats():
+    """
+    Pool metrics for monitoring, or None when DB_POOL_CONFIG disables them
+    """
+    if not DB_POOL_CONFIG["expose_metrics"]:
+        return None
+    return get_pool().stats()
+
+
 def test_connection():
     """
     Test the database connection
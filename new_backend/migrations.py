@@ -0,0 +1,458 @@
+"""
+Versioned schema migrations for databases created from an older schema.sql
+
+    python migrations.py status    # list applied / pending migrations
+    python migrations.py upgrade   # apply pending migrations in order
+    python migrations.py check     # EXPLAIN the hot route queries, exit 1 on a full scan
+
+Every step checks information_schema first, so running upgrade against a
+database that already has a change (e.g. one built from the current
+schema.sql) only records the version. Columns, indexes and foreign keys are
+added with ALGORITHM=INPLACE, LOCK=NONE so reads and writes keep going while
+they build.
+"""
+import sys
+
+from db import get_db_connection
+
+
+# ----------------------------------------------------------------------
+# Helpers
+# ----------------------------------------------------------------------
+
+def table_exists(cursor, table):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = %s
+    """, (table,))
+    return cursor.fetchone()[0] > 0
+
+
+def column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    return cursor.fetchone()[0] > 0
+
+
+def index_exists(cursor, table, index):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+    """, (table, index))
+    return cursor.fetchone()[0] > 0
+
+
+def add_column(cursor, table, column, definition):
+    if column_exists(cursor, table, column):
+        print(f"  {table}.{column} already exists")
+        return
+    print(f"  adding {table}.{column}")
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}, ALGORITHM=INPLACE, LOCK=NONE")
+
+
+def add_index(cursor, table, index, columns, unique=False):
+    if index_exists(cursor, table, index):
+        print(f"  {table}.{index} already exists")
+        return
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    print(f"  adding {kind.lower()} {table}.{index} ({columns})")
+    cursor.execute(f"ALTER TABLE {table} ADD {kind} {index} ({columns}), ALGORITHM=INPLACE, LOCK=NONE")
+
+
+def create_table(cursor, table, body):
+    if table_exists(cursor, table):
+        print(f"  table {table} already exists")
+        return
+    print(f"  creating table {table}")
+    cursor.execute(f"CREATE TABLE {table} ({body})")
+
+
+# ----------------------------------------------------------------------
+# Migrations (append only; never renumber an applied version)
+# ----------------------------------------------------------------------
+
+def m001_kb_rating_sum(cursor):
+    add_column(cursor, "knowledge_base", "rating_sum", "INT DEFAULT 0 AFTER avg_rating")
+
+
+def m001_after():
+    from models.kb_ratings import reconcile_kb_ratings
+    reconcile_kb_ratings()
+
+
+def m002_id_sequences(cursor):
+    create_table(cursor, "id_sequences", """
+        name VARCHAR(50) PRIMARY KEY,
+        next_id BIGINT NOT NULL
+    """)
+
+
+def m003_revenue_rollups(cursor):
+    columns = """
+        order_count INT NOT NULL DEFAULT 0,
+        gross_revenue DECIMAL(12,2) NOT NULL DEFAULT 0,
+        cancelled_count INT NOT NULL DEFAULT 0,
+        refunded_amount DECIMAL(12,2) NOT NULL DEFAULT 0
+    """
+    create_table(cursor, "revenue_hourly", "bucket_start DATETIME PRIMARY KEY," + columns)
+    create_table(cursor, "revenue_daily", "bucket_start DATE PRIMARY KEY," + columns)
+
+
+def m003_after():
+    from models.revenue_rollup import RevenueRollup
+    RevenueRollup.backfill()
+
+
+def m004_staff_stats(cursor):
+    if not column_exists(cursor, "reviews", "related_order"):
+        add_column(cursor, "reviews", "related_order", "INT NULL")
+        # an online (INPLACE) foreign key needs foreign_key_checks off; the
+        # new column is all NULL, so there is nothing to validate
+        cursor.execute("SET SESSION foreign_key_checks = 0")
+        try:
+            cursor.execute("""
+                ALTER TABLE reviews
+                ADD FOREIGN KEY (related_order) REFERENCES orders(order_id) ON DELETE SET NULL,
+                ALGORITHM=INPLACE, LOCK=NONE
+            """)
+        finally:
+            cursor.execute("SET SESSION foreign_key_checks = 1")
+    create_table(cursor, "staff_stats", """
+        user_id INT PRIMARY KEY,
+        FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+        dishes_prepared INT NOT NULL DEFAULT 0,
+        deliveries INT NOT NULL DEFAULT 0,
+        complaints INT NOT NULL DEFAULT 0,
+        compliments INT NOT NULL DEFAULT 0,
+        rating_sum INT NOT NULL DEFAULT 0,
+        rating_count INT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    """)
+
+
+def backfill_review_orders(cursor):
+    # reviews written before related_order existed: rate_order reviews every
+    # item of one order, so take the reviewer's latest order with that item
+    # placed before the review
+    cursor.execute("""
+        UPDATE reviews rv
+        SET rv.related_order = (
+            SELECT MAX(o.order_id) FROM orders o
+            JOIN order_items oi ON oi.order_id = o.order_id
+            WHERE o.customer_id = rv.reviewed_by
+              AND oi.item_id = rv.item_reviewed
+              AND o.created_at <= rv.created_at
+        )
+        WHERE rv.related_order IS NULL
+    """)
+    print(f"  linked {cursor.rowcount} review(s) to their order")
+
+
+def m004_after():
+    from models.staff_stats import StaffStats
+
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+    try:
+        cursor = conn.cursor()
+        backfill_review_orders(cursor)
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+    StaffStats.reconcile()
+
+
+def m005_hot_query_indexes(cursor):
+    add_index(cursor, "orders", "idx_status_created", "delivery_status, created_at")
+    add_index(cursor, "orders", "idx_customer_created", "customer_id, created_at")
+    add_index(cursor, "orders", "idx_created", "created_at")
+    add_index(cursor, "feedback", "idx_feedback_for_type", "feedback_for, feedback_type")
+    add_index(cursor, "feedback", "idx_feedback_from", "feedback_from")
+    add_index(cursor, "reservations", "idx_table_date", "table_id, reservation_date")
+    add_index(cursor, "chat_history", "idx_user_created", "user_id, created_at")
+
+
+def m006_page_indexes(cursor):
+    # one index per keyset sort order so every page is an index range read
+    add_index(cursor, "users", "idx_role_name", "role, name")
+    add_index(cursor, "users", "idx_role_warnings", "role, amount_warnings DESC, name")
+    add_index(cursor, "reservations", "idx_date_time", "reservation_date, reservation_time")
+    add_index(cursor, "reservations", "idx_customer_date_time", "customer_id, reservation_date, reservation_time")
+    add_index(cursor, "feedback", "idx_feedback_created", "created_at")
+    add_index(cursor, "feedback", "idx_for_created", "feedback_for, created_at")
+    add_index(cursor, "feedback", "idx_from_created", "feedback_from, created_at")
+    add_index(cursor, "chat_ratings", "idx_flagged_pending", "is_flagged, review_status, created_at")
+
+
+def m007_permissions(cursor):
+    add_index(cursor, "role", "idx_role_type", "role_type", unique=True)
+    add_index(cursor, "permissions", "idx_permissions_type", "permissions_type", unique=True)
+
+
+def m007_after():
+    # seed the built-in grants; rows that already exist are left alone
+    from utils.permissions import DEFAULT_GRANTS
+
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+    try:
+        cursor = conn.cursor()
+        for role, permissions in DEFAULT_GRANTS.items():
+            cursor.execute("INSERT IGNORE INTO role (role_type) VALUES (%s)", (role,))
+            for permission in permissions:
+                cursor.execute("INSERT IGNORE INTO permissions (permissions_type) VALUES (%s)", (permission,))
+                cursor.execute("""
+                    INSERT IGNORE INTO role_permissions (role_id, permissions_id)
+                    SELECT r.role_id, p.permissions_id FROM role r, permissions p
+                    WHERE r.role_type = %s AND p.permissions_type = %s
+                """, (role, permission))
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
+
+def m008_wallet_ledger(cursor):
+    # balances start from users.total_balance; every user gets a snapshot
+    # row up front so Wallet never takes a locking read on a missing one
+    create_table(cursor, "wallet_ledger", """
+        entry_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        amount DECIMAL(10,2) NOT NULL,
+        reason VARCHAR(20) NOT NULL,
+        order_id INT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+        INDEX idx_user_entry (user_id, entry_id)
+    """)
+    create_table(cursor, "wallet_snapshots", """
+        user_id INT PRIMARY KEY,
+        FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+        balance DECIMAL(12,2) NOT NULL DEFAULT 0,
+        last_entry_id BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    """)
+    seed_wallet_snapshots(cursor)
+
+
+def seed_wallet_snapshots(cursor):
+    # users that already have a snapshot keep it
+    cursor.execute("""
+        INSERT IGNORE INTO wallet_snapshots (user_id, balance, last_entry_id)
+        SELECT user_id, total_balance, 0 FROM users
+    """)
+    print(f"  seeded {cursor.rowcount} wallet snapshot(s)")
+
+
+def m009_idempotency_keys(cursor):
+    create_table(cursor, "idempotency_keys", """
+        key_hash CHAR(64) PRIMARY KEY,
+        request_hash CHAR(64) NOT NULL,
+        status_code INT NULL,
+        response_body MEDIUMTEXT NULL,
+        content_type VARCHAR(100) NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_idempotency_created (created_at)
+    """)
+
+
+def m010_revenue_slots(cursor):
+    # existing rows become slot 0; swapping the primary key in the same
+    # statement keeps it an online rebuild
+    for table in ("revenue_hourly", "revenue_daily"):
+        if column_exists(cursor, table, "slot"):
+            print(f"  {table}.slot already exists")
+            continue
+        print(f"  adding {table}.slot to the primary key")
+        cursor.execute(f"""
+            ALTER TABLE {table}
+            ADD COLUMN slot TINYINT UNSIGNED NOT NULL DEFAULT 0 AFTER bucket_start,
+            DROP PRIMARY KEY, ADD PRIMARY KEY (bucket_start, slot),
+            ALGORITHM=INPLACE, LOCK=NONE
+        """)
+
+
+def m011_after():
+    # chef ratings now include the reviews linked by backfill_review_orders
+    from models.staff_stats import StaffStats
+    StaffStats.reconcile()
+
+
+# (version, description, schema step, optional data step run after the DDL)
+MIGRATIONS = [
+    (1, "knowledge_base.rating_sum for incremental ratings", m001_kb_rating_sum, m001_after),
+    (2, "id_sequences for pre-allocated chat ids", m002_id_sequences, None),
+    (3, "hourly/daily revenue rollups", m003_revenue_rollups, m003_after),
+    (4, "staff_stats rollup and reviews.related_order", m004_staff_stats, m004_after),
+    (5, "composite indexes for hot query shapes", m005_hot_query_indexes, None),
+    (6, "indexes for paged list sort orders", m006_page_indexes, None),
+    (7, "default role/permission matrix", m007_permissions, m007_after),
+    (8, "wallet ledger and balance snapshots", m008_wallet_ledger, None),
+    (9, "idempotency_keys for replayed POSTs", m009_idempotency_keys, None),
+    (10, "slot column on revenue rollups", m010_revenue_slots, None),
+    # databases that applied 4 before it backfilled related_order
+    (11, "link older reviews to their order", backfill_review_orders, m011_after),
+    # databases that applied 8 before it seeded every user's snapshot
+    (12, "wallet snapshots for existing users", seed_wallet_snapshots, None),
+]
+
+
+# ----------------------------------------------------------------------
+# EXPLAIN checks: (name, query, sample params, tables allowed to be scanned)
+# ----------------------------------------------------------------------
+
+def explain_checks():
+    # the routes' own query constants, so a changed query is checked as it
+    # is sent (imported here so status/upgrade do not load the routes)
+    from models.kitchen_queue import KITCHEN_STATUSES, QUEUE_SQL
+    from models.wallet import USER_BALANCE_SQL
+    from routes.chat import CHAT_HISTORY_SQL, FLAGGED_SQL
+    from routes.delivery import AVAILABLE_ORDERS_SQL
+    from routes.feedback import FEEDBACK_RECEIVED_SQL, FEEDBACK_SENT_SQL
+    from routes.manager import MANAGER_FEEDBACK_SQL
+    from routes.orders import history_query
+    from routes.reservations import RESERVATIONS_SQL
+
+    return [
+        ("chef queue", QUEUE_SQL, KITCHEN_STATUSES, ()),
+        ("delivery board", AVAILABLE_ORDERS_SQL, (), ()),
+        ("customer order history", history_query(["o.customer_id = %s"]) + " LIMIT %s", (1, 51), ()),
+        ("order history page", history_query([]) + " LIMIT %s", (51,), ()),
+        ("feedback received", FEEDBACK_RECEIVED_SQL.format(after=""), (1, 51), ()),
+        ("feedback sent", FEEDBACK_SENT_SQL.format(after=""), (1, 51), ()),
+        ("chat history", CHAT_HISTORY_SQL.format(where="WHERE user_id = %s"), (1, 20), ()),
+        ("flagged chats", FLAGGED_SQL.format(after=""), (101,), ()),
+        ("manager feedback page", MANAGER_FEEDBACK_SQL.format(where="") + " LIMIT %s", (101,), ()),
+        ("wallet balance", USER_BALANCE_SQL, (1,), ()),
+        ("reservations page", RESERVATIONS_SQL.format(where=""), (101,), ()),
+    ]
+
+
+# ----------------------------------------------------------------------
+# Commands
+# ----------------------------------------------------------------------
+
+def _ensure_version_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(cursor):
+    _ensure_version_table(cursor)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def status():
+    conn = get_db_connection()
+    if not conn:
+        print("Failed to establish database connection")
+        return 1
+    try:
+        cursor = conn.cursor()
+        applied = applied_versions(cursor)
+        cursor.close()
+    finally:
+        conn.close()
+
+    for version, description, _, _ in MIGRATIONS:
+        state = "applied" if version in applied else "pending"
+        print(f"{version:03d}  {state:8s} {description}")
+    return 0
+
+
+def upgrade():
+    conn = get_db_connection()
+    if not conn:
+        print("Failed to establish database connection")
+        return 1
+
+    try:
+        cursor = conn.cursor()
+        applied = applied_versions(cursor)
+
+        pending = [m for m in MIGRATIONS if m[0] not in applied]
+        if not pending:
+            print("Schema is up to date")
+            return 0
+
+        for version, description, schema_step, data_step in pending:
+            print(f"Applying {version:03d}: {description}")
+            # DDL commits implicitly, so each step is written to be re-runnable
+            schema_step(cursor)
+            if data_step:
+                data_step()
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                (version, description),
+            )
+            conn.commit()
+
+        cursor.close()
+        print(f"Applied {len(pending)} migration(s)")
+        return 0
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        return 1
+    finally:
+        conn.close()
+
+
+def check():
+    """
+    EXPLAIN each hot query; any table read with type=ALL (full scan) fails
+
+    Run against a database with realistic data: on near-empty tables
+    MySQL may prefer a scan even when a usable index exists.
+    """
+    conn = get_db_connection()
+    if not conn:
+        print("Failed to establish database connection")
+        return 1
+
+    failures = 0
+    try:
+        cursor = conn.cursor(dictionary=True)
+        for name, query, params, allowed_scans in explain_checks():
+            cursor.execute("EXPLAIN " + query, params)
+            plan = cursor.fetchall()
+            scans = [
+                row["table"] for row in plan
+                if row.get("type") == "ALL" and row.get("table") not in allowed_scans
+            ]
+            if scans:
+                failures += 1
+                print(f"FAIL  {name}: full scan on {', '.join(scans)}")
+            else:
+                keys = ", ".join(f"{row['table']}:{row.get('key') or '-'}" for row in plan)
+                print(f"ok    {name} ({keys})")
+        cursor.close()
+    finally:
+        conn.close()
+
+    if failures:
+        print(f"{failures} query plan(s) use a full table scan")
+        return 1
+    print("All query plans use an index")
+    return 0
+
+
+COMMANDS = {"status": status, "upgrade": upgrade, "check": check}
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    if command not in COMMANDS:
+        print(f"Usage: python migrations.py [{'|'.join(COMMANDS)}]")
+        sys.exit(2)
+    sys.exit(COMMANDS[command]())
@@ -0,0 +1,155 @@
+import threading
+import time
+from typing import Dict, Iterable, List
+
+from config import CACHE_CONFIG
+from db import get_db_connection
+
+
+def _sort_key(bid):
+    return (bid['bid_amount'], bid['created_at'])
+
+
+class BidBook:
+    """
+    In-memory book of delivery bids for orders waiting on a driver.
+
+    Bids are kept per order, sorted by bid_amount then created_at. The
+    whole book is loaded with one query and then kept current by the
+    routes that change bids (place_bid, approve_bid, reject_bid). A full
+    reload happens every max_age seconds to pick up changes made by other
+    processes.
+    """
+
+    def __init__(self, max_age: float = 30):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._by_order = {}      # order_id -> sorted list of bids
+        self._order_of_bid = {}  # bid_id -> order_id
+        self._loaded_at = None
+
+    def _load(self) -> bool:
+        conn = get_db_connection()
+        if not conn:
+            return False
+
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT
+                    b.bid_id,
+                    b.order_id,
+                    b.driver_id,
+                    b.bid_amount,
+                    b.bid_status,
+                    b.created_at,
+                    u.name AS driver_name
+                FROM delivery_bids b
+                JOIN users u ON b.driver_id = u.user_id
+                JOIN orders o ON b.order_id = o.order_id
+                WHERE o.delivery_status = 'Ready for Delivery'
+                  AND o.delivered_by IS NULL
+            """)
+            rows = cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()
+
+        by_order = {}
+        order_of_bid = {}
+        for row in rows:
+            bid = self._normalize(row)
+            by_order.setdefault(bid['order_id'], []).append(bid)
+            order_of_bid[bid['bid_id']] = bid['order_id']
+        for bids in by_order.values():
+            bids.sort(key=_sort_key)
+
+        with self._lock:
+            self._by_order = by_order
+            self._order_of_bid = order_of_bid
+            self._loaded_at = time.monotonic()
+        return True
+
+    @staticmethod
+    def _normalize(row) -> Dict:
+        return {
+            'bid_id': row['bid_id'],
+            'order_id': row['order_id'],
+            'driver_id': row['driver_id'],
+            'bid_amount': float(row['bid_amount']),
+            'bid_status': row['bid_status'],
+            'created_at': row['created_at'],
+            'driver_name': row['driver_name'],
+        }
+
+    def _ensure_loaded(self):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.max_age:
+            if not self._load() and loaded_at is None:
+                raise RuntimeError("Could not load delivery bids")
+
+    def bids_for(self, order_ids: Iterable[int]) -> Dict[int, List[Dict]]:
+        """
+        Bids for each order, cheapest first
+
+        Args:
+            order_ids: Orders shown on the board
+
+        Returns:
+            dict: order_id -> list of {bid_id, driver_id, bid_amount, bid_status, driver_name}
+        """
+        self._ensure_loaded()
+        result = {}
+        with self._lock:
+            for order_id in order_ids:
+                result[order_id] = [
+                    {
+                        'bid_id': bid['bid_id'],
+                        'driver_id': bid['driver_id'],
+                        'bid_amount': bid['bid_amount'],
+                        'bid_status': bid['bid_status'],
+                        'driver_name': bid['driver_name'],
+                    }
+                    for bid in self._by_order.get(order_id, [])
+                ]
+        return result
+
+    def upsert(self, row: Dict):
+        """
+        Add or replace a bid (row needs the delivery_bids columns plus driver_name)
+        """
+        bid = self._normalize(row)
+        with self._lock:
+            bids = [b for b in self._by_order.get(bid['order_id'], []) if b['bid_id'] != bid['bid_id']]
+            bids.append(bid)
+            bids.sort(key=_sort_key)
+            self._by_order[bid['order_id']] = bids
+            self._order_of_bid[bid['bid_id']] = bid['order_id']
+
+    def set_status(self, bid_id: int, status: str):
+        """
+        Change the status of a single bid
+        """
+        with self._lock:
+            order_id = self._order_of_bid.get(bid_id)
+            for bid in self._by_order.get(order_id, []):
+                if bid['bid_id'] == bid_id:
+                    bid['bid_status'] = status
+
+    def drop_order(self, order_id: int):
+        """
+        Forget an order once a driver is assigned (it leaves the board)
+        """
+        with self._lock:
+            for bid in self._by_order.pop(order_id, []):
+                self._order_of_bid.pop(bid['bid_id'], None)
+
+    def invalidate(self):
+        """
+        Force a full reload on next read
+        """
+        with self._lock:
+            self._loaded_at = None
+
+
+bid_book = BidBook(max_age=CACHE_CONFIG["bid_book_max_age"])
@@ -0,0 +1,247 @@
+import atexit
+import queue
+import threading
+from datetime import datetime
+from typing import Optional
+
+from config import CHAT_HISTORY_CONFIG
+from db import get_db_connection
+
+
+INSERT_SQL = """
+    INSERT INTO chat_history (chat_id, user_id, session_id, message, response, source, kb_id, created_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+class ChatHistoryWriter:
+    """
+    Write-behind buffer for chat_history rows.
+
+    add() hands back a chat_id straight away and queues the row; a
+    background thread writes queued rows with executemany once batch_size
+    rows are waiting or every flush_interval seconds. chat_ids come from
+    blocks reserved in the id_sequences table, so they are known before
+    the row exists. When the queue is full the row is written on the
+    caller's thread instead, which keeps memory bounded without losing
+    chats. The thread starts with the first add(), so importing the module
+    starts nothing. Remaining rows are flushed when the process exits.
+    """
+
+    SEQUENCE = "chat_history"
+
+    def __init__(self, batch_size: int = 50, flush_interval: float = 1.0,
+                 queue_limit: int = 1000, id_block: int = 100):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.id_block = id_block
+        self._queue = queue.Queue(maxsize=queue_limit)
+        self._pending = set()            # chat_ids queued or being written
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self._id_lock = threading.Lock()
+        self._next_id = 0
+        self._block_end = 0              # first id not in the reserved block
+        self._sequence_ready = False
+
+        self.written = 0
+        self.batches = 0
+        self.direct_writes = 0
+        self.failed = 0
+
+    # ------------------------------------------------------------------
+    # chat_id allocation
+    # ------------------------------------------------------------------
+
+    def _reserve_block(self):
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError("Database connection failed")
+
+        try:
+            cursor = conn.cursor()
+            if not self._sequence_ready:
+                # Start (or move) the sequence past any existing chat_id
+                cursor.execute("""
+                    INSERT INTO id_sequences (name, next_id)
+                    SELECT %s, COALESCE(MAX(chat_id), 0) + 1 FROM chat_history
+                    ON DUPLICATE KEY UPDATE next_id = GREATEST(next_id, VALUES(next_id))
+                """, (self.SEQUENCE,))
+
+            cursor.execute("""
+                UPDATE id_sequences
+                SET next_id = LAST_INSERT_ID(next_id + %s)
+                WHERE name = %s
+            """, (self.id_block, self.SEQUENCE))
+            cursor.execute("SELECT LAST_INSERT_ID()")
+            block_end = cursor.fetchone()[0]
+            conn.commit()
+            cursor.close()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        self._sequence_ready = True
+        self._next_id = block_end - self.id_block
+        self._block_end = block_end
+
+    def _allocate_id(self) -> int:
+        with self._id_lock:
+            if self._next_id >= self._block_end:
+                self._reserve_block()
+            chat_id = self._next_id
+            self._next_id += 1
+            return chat_id
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="chat-history-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+        return self
+
+    def add(self, user_id, session_id, message, response_text, source, kb_id=None) -> Optional[int]:
+        """
+        Queue one question/answer pair
+
+        Returns:
+            int: The chat_id the row will have, or None if it could not be saved
+        """
+        if self._thread is None:
+            self.start()
+
+        try:
+            chat_id = self._allocate_id()
+        except Exception as e:
+            print(f"Error allocating chat_id: {e}")
+            return None
+
+        row = (chat_id, user_id, session_id, message, response_text, source, kb_id, datetime.now())
+        with self._pending_lock:
+            self._pending.add(chat_id)
+
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.direct_writes += 1
+            if not self._write([row]):
+                return None
+            return chat_id
+
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+        return chat_id
+
+    def _write(self, rows) -> bool:
+        ok = True
+        conn = get_db_connection()
+        if not conn:
+            print(f"Error saving chats: database connection failed ({len(rows)} rows dropped)")
+            self.failed += len(rows)
+            ok = False
+        else:
+            try:
+                cursor = conn.cursor()
+                try:
+                    cursor.executemany(INSERT_SQL, rows)
+                    conn.commit()
+                    self.batches += 1
+                    self.written += len(rows)
+                except Exception as e:
+                    # One bad row (e.g. a user deleted meanwhile) shouldn't sink the batch
+                    print(f"Error saving chat batch, retrying row by row: {e}")
+                    conn.rollback()
+                    for row in rows:
+                        try:
+                            cursor.execute(INSERT_SQL, row)
+                            conn.commit()
+                            self.written += 1
+                        except Exception as row_error:
+                            print(f"Error saving chat {row[0]}: {row_error}")
+                            conn.rollback()
+                            self.failed += 1
+                            ok = False
+                cursor.close()
+            finally:
+                conn.close()
+
+        with self._pending_lock:
+            for row in rows:
+                self._pending.discard(row[0])
+        return ok
+
+    def flush(self):
+        """
+        Write everything queued so far before returning
+        """
+        with self._flush_lock:
+            while True:
+                rows = []
+                try:
+                    while len(rows) < self.batch_size:
+                        rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    pass
+                if not rows:
+                    return
+                self._write(rows)
+
+    def ensure_written(self, chat_id):
+        """
+        Flush if chat_id is still waiting in the buffer (used before a
+        route reads the row back, e.g. /api/chat/rate)
+        """
+        try:
+            chat_id = int(chat_id)
+        except (TypeError, ValueError):
+            return
+        with self._pending_lock:
+            pending = chat_id in self._pending
+        if pending:
+            self.flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Chat history writer error: {e}")
+
+    def close(self):
+        """
+        Stop the background thread and write whatever is left
+        """
+        self._stop.set()
+        self._wake.set()
+        self.flush()
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "direct_writes": self.direct_writes,
+            "failed": self.failed,
+        }
+
+
+chat_history_writer = ChatHistoryWriter(
+    batch_size=CHAT_HISTORY_CONFIG["batch_size"],
+    flush_interval=CHAT_HISTORY_CONFIG["flush_interval"],
+    queue_limit=CHAT_HISTORY_CONFIG["queue_limit"],
+    id_block=CHAT_HISTORY_CONFIG["id_block"],
+)
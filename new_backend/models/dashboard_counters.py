@@ -0,0 +1,202 @@
+import threading
+from typing import Dict
+
+from db import get_db_connection
+
+
+# Complaint statuses the manager still has to act on
+PENDING_COMPLAINT_STATUSES = ('Open', 'Pending', 'Under Review')
+
+EMPLOYEE_ROLES = ('chef', 'driver', 'delivery')
+
+
+def is_pending_complaint(feedback_type, complaint_status) -> bool:
+    return feedback_type == 'complaint' and complaint_status in PENDING_COMPLAINT_STATUSES
+
+
+class DashboardCounters:
+    """
+    In-memory totals behind GET /api/manager/stats.
+
+    Seeded by one recount (on first read and then periodically by a
+    background job) and kept current by the routes that create orders,
+    users, feedback, bids and VIP decisions, so the dashboard is a dict
+    read instead of six COUNT/SUM queries. Deletes that cascade (firing or
+    deregistering a user) invalidate the counters instead; the next read
+    recounts. Anything changed outside this process is picked up by the
+    periodic recount.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._total_orders = 0
+        self._total_revenue = 0.0
+        self._total_users = 0
+        self._employee_count = 0
+        self._pending_feedback = 0
+        self._vip_requests = 0
+        self._pending_bids = {}   # order_id -> set of pending bid_ids
+        self._order_of_bid = {}   # pending bid_id -> order_id
+
+    # ------------------------------------------------------------------
+    # Recount
+    # ------------------------------------------------------------------
+
+    def recount(self) -> bool:
+        """
+        Recompute every counter from the tables
+        """
+        conn = get_db_connection()
+        if not conn:
+            return False
+
+        try:
+            cursor = conn.cursor(dictionary=True)
+
+            cursor.execute("""
+                SELECT COUNT(*) AS total_orders,
+                       COALESCE(SUM(total_price), 0) AS total_revenue
+                FROM orders
+            """)
+            order_row = cursor.fetchone() or {}
+
+            cursor.execute("""
+                SELECT COUNT(*) AS total_users,
+                       COALESCE(SUM(role IN ('chef', 'driver', 'delivery')), 0) AS employee_count
+                FROM users
+            """)
+            user_row = cursor.fetchone() or {}
+
+            cursor.execute("""
+                SELECT COUNT(*) AS pending_feedback
+                FROM feedback
+                WHERE feedback_type = 'complaint'
+                AND complaint_status IN ('Open', 'Pending', 'Under Review')
+            """)
+            fb_row = cursor.fetchone() or {}
+
+            cursor.execute("""
+                SELECT bid_id, order_id
+                FROM delivery_bids
+                WHERE bid_status = 'pending'
+            """)
+            bid_rows = cursor.fetchall()
+
+            cursor.execute("""
+                SELECT COUNT(*) AS vip_requests
+                FROM vip_requests
+                WHERE request_status = 'pending'
+            """)
+            vip_row = cursor.fetchone() or {}
+
+            cursor.close()
+        finally:
+            conn.close()
+
+        pending_bids = {}
+        order_of_bid = {}
+        for row in bid_rows:
+            pending_bids.setdefault(row['order_id'], set()).add(row['bid_id'])
+            order_of_bid[row['bid_id']] = row['order_id']
+
+        with self._lock:
+            self._total_orders = int(order_row.get('total_orders') or 0)
+            self._total_revenue = float(order_row.get('total_revenue') or 0)
+            self._total_users = int(user_row.get('total_users') or 0)
+            self._employee_count = int(user_row.get('employee_count') or 0)
+            self._pending_feedback = int(fb_row.get('pending_feedback') or 0)
+            self._vip_requests = int(vip_row.get('vip_requests') or 0)
+            self._pending_bids = pending_bids
+            self._order_of_bid = order_of_bid
+            self._loaded = True
+        return True
+
+    def invalidate(self):
+        """
+        Recount on next read
+        """
+        with self._lock:
+            self._loaded = False
+
+    def snapshot(self) -> Dict:
+        """
+        Current dashboard numbers (same keys as GET /api/manager/stats)
+        """
+        if not self._loaded and not self.recount():
+            raise RuntimeError("Database connection failed")
+
+        with self._lock:
+            return {
+                "total_orders": self._total_orders,
+                "total_revenue": round(self._total_revenue, 2),
+                "total_users": self._total_users,
+                "employee_count": self._employee_count,
+                "pending_feedback": self._pending_feedback,
+                "pending_bids": len(self._pending_bids),
+                "vip_requests": self._vip_requests,
+            }
+
+    # ------------------------------------------------------------------
+    # Updates from write paths (call after commit; ignored until loaded)
+    # ------------------------------------------------------------------
+
+    def order_created(self, total_price):
+        with self._lock:
+            if self._loaded:
+                self._total_orders += 1
+                self._total_revenue += float(total_price or 0)
+
+    def user_added(self, role='customer'):
+        with self._lock:
+            if self._loaded:
+                self._total_users += 1
+                if role in EMPLOYEE_ROLES:
+                    self._employee_count += 1
+
+    def feedback_added(self, feedback_type, complaint_status):
+        if not is_pending_complaint(feedback_type, complaint_status):
+            return
+        with self._lock:
+            if self._loaded:
+                self._pending_feedback += 1
+
+    def feedback_status_changed(self, feedback_type, old_status, new_status):
+        delta = (int(is_pending_complaint(feedback_type, new_status))
+                 - int(is_pending_complaint(feedback_type, old_status)))
+        if not delta:
+            return
+        with self._lock:
+            if self._loaded:
+                self._pending_feedback += delta
+
+    def bid_pending(self, order_id, bid_id):
+        with self._lock:
+            if self._loaded:
+                self._pending_bids.setdefault(order_id, set()).add(bid_id)
+                self._order_of_bid[bid_id] = order_id
+
+    def bid_closed(self, bid_id):
+        with self._lock:
+            order_id = self._order_of_bid.pop(bid_id, None)
+            bids = self._pending_bids.get(order_id)
+            if bids is not None:
+                bids.discard(bid_id)
+                if not bids:
+                    del self._pending_bids[order_id]
+
+    def order_bids_closed(self, order_id):
+        with self._lock:
+            for bid_id in self._pending_bids.pop(order_id, ()):
+                self._order_of_bid.pop(bid_id, None)
+
+    def vip_request_decided(self, old_status, new_status):
+        delta = int(new_status == 'pending') - int(old_status == 'pending')
+        if not delta:
+            return
+        with self._lock:
+            if self._loaded:
+                self._vip_requests += delta
+
+
+dashboard_counters = DashboardCounters()
@@ -0,0 +1,91 @@
+from db import get_db_connection
+
+
+def record_rating(cursor, kb_id, rating):
+    """
+    Add one rating to a knowledge base entry's running totals
+
+    Runs inside the caller's transaction. MySQL applies single-table
+    UPDATE assignments left to right, so avg_rating is computed from the
+    already-incremented rating_sum and total_ratings.
+
+    Args:
+        cursor: Cursor of the transaction that inserted the chat_ratings row
+        kb_id: Knowledge base entry that was rated
+        rating: Rating value (0-5)
+
+    Returns:
+        float: The entry's new average rating
+    """
+    cursor.execute("""
+        UPDATE knowledge_base
+        SET rating_sum = rating_sum + %s,
+            total_ratings = total_ratings + 1,
+            avg_rating = rating_sum / total_ratings
+        WHERE kb_id = %s
+    """, (rating, kb_id))
+
+    cursor.execute("SELECT avg_rating FROM knowledge_base WHERE kb_id = %s", (kb_id,))
+    row = cursor.fetchone()
+    if not row:
+        return 0.0
+    value = row["avg_rating"] if isinstance(row, dict) else row[0]
+    return float(value or 0)
+
+
+def reconcile_kb_ratings():
+    """
+    Recompute every entry's rating totals from chat_ratings in one statement
+
+    Corrects drift in the running totals kept by record_rating (e.g.
+    ratings deleted with their chat). Safe to run at any time.
+
+    Returns:
+        int: Number of knowledge base rows that changed
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE knowledge_base kb
+            LEFT JOIN (
+                SELECT ch.kb_id,
+                       SUM(cr.rating) AS rating_sum,
+                       COUNT(*) AS total_ratings
+                FROM chat_ratings cr
+                JOIN chat_history ch ON cr.chat_id = ch.chat_id
+                WHERE ch.kb_id IS NOT NULL
+                GROUP BY ch.kb_id
+            ) agg ON agg.kb_id = kb.kb_id
+            SET kb.rating_sum = COALESCE(agg.rating_sum, 0),
+                kb.total_ratings = COALESCE(agg.total_ratings, 0),
+                kb.avg_rating = COALESCE(agg.rating_sum / agg.total_ratings, 0)
+        """)
+        changed = cursor.rowcount
+        conn.commit()
+        cursor.close()
+        return changed
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def run_reconciliation():
+    """
+    Background job entry point: reconcile, then refresh the search index
+    if any rating changed
+    """
+    changed = reconcile_kb_ratings()
+    if changed:
+        from models.knowledge_index import knowledge_index
+        knowledge_index.rebuild()
+        print(f"Knowledge base ratings reconciled ({changed} entries corrected)")
+
+
+if __name__ == "__main__":
+    print(f"Reconciled {reconcile_kb_ratings()} knowledge base entries")
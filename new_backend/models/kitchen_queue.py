@@ -0,0 +1,108 @@
+import hashlib
+from typing import Dict, List
+
+
+# Statuses that still need the kitchen's attention
+KITCHEN_STATUSES = ('Pending', 'Preparing', 'Confirmed')
+
+# Queued order headers, oldest first (params: KITCHEN_STATUSES)
+QUEUE_SQL = f"""
+    SELECT o.order_id,
+           o.customer_id,
+           o.delivery_status,
+           o.total_price,
+           o.created_at,
+           o.delivered_to,
+           u.name AS customer_name
+    FROM orders o
+    JOIN users u ON o.customer_id = u.user_id
+    WHERE o.delivery_status IN ({", ".join(["%s"] * len(KITCHEN_STATUSES))})
+    ORDER BY o.created_at ASC, o.order_id ASC
+"""
+
+
+class KitchenQueue:
+    """
+    Read model for the chef dashboard queue.
+
+    The queue is loaded in two queries: the order headers (served by the
+    idx_status_created index) and the items of every queued order. The
+    version token is computed from the headers alone, so a client that
+    already has the current queue can be answered without loading items.
+    """
+
+    @staticmethod
+    def load_headers(cursor) -> List[Dict]:
+        """
+        Load the queued orders (without items), oldest first
+
+        Args:
+            cursor: Dictionary cursor
+
+        Returns:
+            List of order rows
+        """
+        cursor.execute(QUEUE_SQL, KITCHEN_STATUSES)
+        return cursor.fetchall()
+
+    @staticmethod
+    def version(orders: List[Dict]) -> str:
+        """
+        Version token for a queue
+
+        Order items never change after an order is placed, so the headers
+        fully determine what the chef dashboard shows.
+
+        Args:
+            orders: Rows from load_headers
+
+        Returns:
+            str: Hex digest usable as an ETag
+        """
+        digest = hashlib.sha1()
+        for order in orders:
+            row = "|".join(str(order[key]) for key in (
+                'order_id', 'delivery_status', 'total_price',
+                'created_at', 'delivered_to', 'customer_name'
+            ))
+            digest.update(row.encode('utf-8'))
+            digest.update(b"\n")
+        return digest.hexdigest()
+
+    @staticmethod
+    def attach_items(cursor, orders: List[Dict]) -> List[Dict]:
+        """
+        Load the items of every queued order in one query and attach them
+        as order['items'] = [{"quantity": ..., "name": ...}, ...]
+
+        Args:
+            cursor: Dictionary cursor
+            orders: Rows from load_headers (modified in place)
+
+        Returns:
+            The same list of orders
+        """
+        items_by_order = {order['order_id']: [] for order in orders}
+
+        if items_by_order:
+            placeholders = ", ".join(["%s"] * len(items_by_order))
+            cursor.execute(f"""
+                SELECT oi.order_id,
+                       oi.quantity,
+                       m.name
+                FROM order_items oi
+                JOIN menu_items m ON oi.item_id = m.item_id
+                WHERE oi.order_id IN ({placeholders})
+                ORDER BY oi.order_id, oi.order_item_id
+            """, tuple(items_by_order))
+
+            for item in cursor.fetchall():
+                items_by_order[item['order_id']].append({
+                    'quantity': item['quantity'],
+                    'name': item['name'],
+                })
+
+        for order in orders:
+            order['items'] = items_by_order[order['order_id']]
+
+        return orders
@@ -0,0 +1,230 @@
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+from config import CACHE_CONFIG
+from db import get_db_connection
+
+
+# Same word rule as utils.llm_cache.normalize_question: letters and digits
+# of any script, so "café" and "crème" are search terms too
+TOKEN_RE = re.compile(r"[\w']+")
+
+# Words that match almost every entry and carry no meaning for search
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "can", "do", "does", "for",
+    "from", "how", "i", "if", "in", "is", "it", "me", "my", "of", "on", "or",
+    "the", "to", "we", "what", "when", "where", "which", "who", "why", "will",
+    "with", "you", "your",
+}
+
+
+def tokenize(text: str):
+    """
+    Split text into casefolded search terms, dropping stopwords
+    """
+    return [token for token in TOKEN_RE.findall((text or "").casefold()) if token not in STOPWORDS]
+
+
+class KnowledgeIndex:
+    """
+    In-memory inverted index over approved, active knowledge_base rows.
+
+    Entries are ranked with BM25 (question terms count double) and the
+    score is boosted by the entry's avg_rating. The index is loaded with
+    one query, then updated one entry at a time by the chat routes that
+    add, approve, reject or remove knowledge. A full rebuild happens every
+    max_age seconds to pick up changes made by other processes.
+    """
+
+    K1 = 1.5
+    B = 0.75
+    QUESTION_WEIGHT = 2
+    # Score multiplier at a perfect 5-star average: 1 + RATING_WEIGHT
+    RATING_WEIGHT = 0.25
+    # Fraction of the query terms an entry must contain to count as a hit
+    MIN_COVERAGE = 0.5
+
+    def __init__(self, max_age: float = 300):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._docs = {}       # kb_id -> {"row": dict, "tf": Counter, "length": int}
+        self._postings = {}   # term -> {kb_id: term frequency}
+        self._total_length = 0
+        self._loaded_at = None
+
+    # ------------------------------------------------------------------
+    # Index maintenance
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _fetch(kb_id: Optional[int] = None):
+        conn = get_db_connection()
+        if not conn:
+            return None
+
+        try:
+            cursor = conn.cursor(dictionary=True)
+            query = """
+                SELECT kb_id, question, answer, category, avg_rating
+                FROM knowledge_base
+                WHERE is_active = TRUE
+                  AND is_approved = TRUE
+            """
+            if kb_id is None:
+                cursor.execute(query)
+            else:
+                cursor.execute(query + " AND kb_id = %s", (kb_id,))
+            rows = cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()
+
+        return rows
+
+    def _add_locked(self, row: Dict):
+        kb_id = row["kb_id"]
+        self._remove_locked(kb_id)
+
+        terms = tokenize(row["question"]) * self.QUESTION_WEIGHT + tokenize(row["answer"])
+        tf = Counter(terms)
+
+        self._docs[kb_id] = {
+            "row": {
+                "kb_id": kb_id,
+                "question": row["question"],
+                "answer": row["answer"],
+                "category": row["category"],
+                "avg_rating": float(row["avg_rating"] or 0),
+            },
+            "tf": tf,
+            "length": len(terms),
+        }
+        self._total_length += len(terms)
+        for term, count in tf.items():
+            self._postings.setdefault(term, {})[kb_id] = count
+
+    def _remove_locked(self, kb_id: int):
+        doc = self._docs.pop(kb_id, None)
+        if not doc:
+            return
+        self._total_length -= doc["length"]
+        for term in doc["tf"]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(kb_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def rebuild(self) -> bool:
+        """
+        Reload every approved, active entry with one query
+        """
+        rows = self._fetch()
+        if rows is None:
+            return False
+
+        with self._lock:
+            self._docs = {}
+            self._postings = {}
+            self._total_length = 0
+            for row in rows:
+                self._add_locked(row)
+            self._loaded_at = time.monotonic()
+        return True
+
+    def _ensure_loaded(self):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.max_age:
+            self.rebuild()
+
+    def refresh(self, kb_id: int):
+        """
+        Re-read one entry after it was added or approved (drops it if it is
+        no longer approved and active)
+        """
+        if self._loaded_at is None:
+            # Not built yet, the first search loads everything anyway
+            return
+        rows = self._fetch(kb_id)
+        if rows is None:
+            return
+        with self._lock:
+            if rows:
+                self._add_locked(rows[0])
+            else:
+                self._remove_locked(kb_id)
+
+    def remove(self, kb_id: int):
+        """
+        Drop an entry after it was rejected or deactivated
+        """
+        with self._lock:
+            self._remove_locked(kb_id)
+
+    def update_rating(self, kb_id: int, avg_rating: float):
+        """
+        Update the rating used for ranking without re-indexing the text
+        """
+        with self._lock:
+            doc = self._docs.get(kb_id)
+            if doc:
+                doc["row"]["avg_rating"] = float(avg_rating or 0)
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def search(self, query: str) -> Optional[Dict]:
+        """
+        Best matching entry for a customer question
+
+        Args:
+            query: The customer's message
+
+        Returns:
+            dict with kb_id, question, answer, category, avg_rating, or None
+        """
+        self._ensure_loaded()
+
+        query_terms = set(tokenize(query))
+        if not query_terms:
+            return None
+
+        with self._lock:
+            doc_count = len(self._docs)
+            if doc_count == 0:
+                return None
+            avg_length = self._total_length / doc_count
+
+            scores = {}
+            matched = {}
+            for term in query_terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for kb_id, tf in postings.items():
+                    length = self._docs[kb_id]["length"]
+                    norm = tf + self.K1 * (1 - self.B + self.B * length / avg_length)
+                    scores[kb_id] = scores.get(kb_id, 0.0) + idf * tf * (self.K1 + 1) / norm
+                    matched[kb_id] = matched.get(kb_id, 0) + 1
+
+            best = None
+            best_score = 0.0
+            for kb_id, score in scores.items():
+                if matched[kb_id] / len(query_terms) < self.MIN_COVERAGE:
+                    continue
+                row = self._docs[kb_id]["row"]
+                score *= 1 + self.RATING_WEIGHT * row["avg_rating"] / 5
+                if score > best_score:
+                    best = row
+                    best_score = score
+
+            return dict(best) if best else None
+
+
+knowledge_index = KnowledgeIndex(max_age=CACHE_CONFIG["kb_index_max_age"])
@@ -1,4 +1,5 @@
 from db import get_db_connection
+from models.menu_snapshot import menu_snapshot
 from typing import Optional, Dict, List
 
 
@@ -67,6 +68,8 @@ class MenuItem:
             cursor.close()
             conn.close()
             
+            menu_snapshot.invalidate()
+            
             return item_id
             
         except Exception as e:
@@ -231,6 +234,8 @@ class MenuItem:
             cursor.close()
             conn.close()
             
+            menu_snapshot.invalidate()
+            
             return True
             
         except Exception as e:
@@ -258,6 +263,8 @@ class MenuItem:
             cursor.close()
             conn.close()
             
+            menu_snapshot.invalidate()
+            
             return True
             
         except Exception as e:
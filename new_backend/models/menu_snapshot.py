@@ -0,0 +1,103 @@
+import hashlib
+import threading
+import time
+
+from config import CACHE_CONFIG
+from db import get_db_connection
+
+
+class MenuSnapshot:
+    """
+    Process-wide cache of the public menu (GET /api/menu).
+
+    Holds the already-serialized JSON body plus an ETag derived from it.
+    Menu writes call invalidate(); the snapshot is also rebuilt after
+    max_age seconds so edits made by another process show up eventually.
+    """
+
+    def __init__(self, max_age: float = 300):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._body = None
+        self._etag = None
+        self._built_at = None
+        self._generation = 0
+
+    @staticmethod
+    def _load_items():
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError("Database connection failed")
+
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+            SELECT m.*, c.category_type
+            FROM menu_items m
+            JOIN category c ON m.category = c.category_id
+            WHERE m.in_stock = TRUE
+            """)
+            items = cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()
+
+        return [
+            {
+                'item_id': item['item_id'],
+                'name': item['name'],
+                'description': item['description'],
+                'price': float(item['price']),
+                'category': item['category'],
+                'category_type': item['category_type'],
+                'is_time_limited': item['is_time_limited'],
+                'in_stock': item['in_stock'],
+                'image_url': item['image_url'],
+                'created_by': item['created_by'],
+                'updated_by': item['updated_by'],
+                'dietary_restrictions': item['dietary_restrictions'],
+            }
+            for item in items
+        ]
+
+    def get(self, dumps):
+        """
+        Return the current snapshot, rebuilding it if needed
+
+        Args:
+            dumps: Function turning the item list into a JSON string
+                   (the app's JSON provider, so output matches jsonify)
+
+        Returns:
+            tuple: (body bytes, etag)
+        """
+        with self._lock:
+            fresh = self._built_at is not None and time.monotonic() - self._built_at <= self.max_age
+            if fresh:
+                return self._body, self._etag
+            generation = self._generation
+
+        body = dumps(self._load_items()).encode('utf-8')
+        etag = hashlib.sha1(body).hexdigest()
+
+        with self._lock:
+            # Only publish if nothing invalidated the menu while we were loading
+            if generation == self._generation:
+                self._body = body
+                self._etag = etag
+                self._built_at = time.monotonic()
+
+        return body, etag
+
+    def invalidate(self):
+        """
+        Drop the snapshot; called by every write that changes the menu
+        """
+        with self._lock:
+            self._generation += 1
+            self._body = None
+            self._etag = None
+            self._built_at = None
+
+
+menu_snapshot = MenuSnapshot(max_age=CACHE_CONFIG["menu_max_age"])
@@ -1,4 +1,8 @@
 from db import get_db_connection
+from models.dashboard_counters import dashboard_counters
+from models.revenue_rollup import RevenueRollup
+from models.staff_stats import StaffStats
+from models.wallet import Wallet
 from typing import Optional, Dict, List
 from datetime import datetime, timedelta
 
@@ -34,8 +38,10 @@ class Order:
             delivered_by: Delivery person ID (optional)
             
         Returns:
-            int: New order ID or None on failure
+            int: New order ID or None on failure (including a balance
+            that does not cover total_price)
         """
+        conn = None
         try:
             conn = get_db_connection()
             if not conn:
@@ -75,12 +81,16 @@ class Order:
                 cursor.execute(item_query, (
                     order_id, item['dish_id'], item['quantity'], item['price']
                 ))
-            
-            # Deduct from customer balance
-            cursor.execute(
-                "UPDATE users SET total_balance = total_balance - %s WHERE user_id = %s",
-                (total_price, customer_id)
-            )
+
+            # Deduct from customer wallet (fails if it does not cover the order)
+            if not Wallet.debit(cursor, customer_id, total_price, 'order', order_id):
+                print(f"Error creating order: insufficient balance for customer {customer_id}")
+                conn.rollback()
+                cursor.close()
+                conn.close()
+                return None
+
+            RevenueRollup.record_order(cursor, order_id)
             
             # Create payment record
             payment_query = """
@@ -102,6 +112,8 @@ class Order:
             conn.commit()
             cursor.close()
             conn.close()
+
+            dashboard_counters.order_created(total_price)
             
             return order_id
             
@@ -139,27 +151,10 @@ class Order:
                 conn.close()
                 return None
             
-            order = Order(
-                order_id=result['order_id'],
-                customer_id=result['customer_id'],
-                delivered_by=result['delivered_by'],
-                delivered_to=result['delivered_to'],
-                delivery_status=result['delivery_status'],
-                total_price=float(result['total_price']),
-                delivery_date=result['delivery_date'],
-                delivery_time=result['delivery_time'],
-                created_at=result['created_at']
-            )
+            order = Order._from_row(result)
             
             # Get order items
-            cursor.execute("""
-                SELECT oi.*, m.name, m.image_url
-                FROM order_items oi
-                JOIN menu_items m ON oi.item_id = m.item_id
-                WHERE oi.order_id = %s
-            """, (order_id,))
-            
-            order.items = cursor.fetchall()
+            order.items = Order.load_items([order_id], cursor)[order_id]
             
             cursor.close()
             conn.close()
@@ -171,12 +166,92 @@ class Order:
             return None
     
     @staticmethod
-    def get_by_customer(customer_id: int) -> List['Order']:
+    def _from_row(result) -> 'Order':
+        """
+        Build an Order (without items) from an orders row
+        """
+        return Order(
+            order_id=result['order_id'],
+            customer_id=result['customer_id'],
+            delivered_by=result['delivered_by'],
+            delivered_to=result['delivered_to'],
+            delivery_status=result['delivery_status'],
+            total_price=float(result['total_price']),
+            delivery_date=result['delivery_date'],
+            delivery_time=result['delivery_time'],
+            created_at=result['created_at']
+        )
+    
+    @staticmethod
+    def load_items(order_ids: List[int], cursor=None) -> Dict[int, List[Dict]]:
+        """
+        Load the items of many orders with a single query
+        
+        Args:
+            order_ids: Order IDs to load items for
+            cursor: Optional dictionary cursor to reuse (a connection is
+                    opened when omitted)
+            
+        Returns:
+            dict: order_id -> list of item rows (empty list for orders without items)
+        """
+        items_by_order = {order_id: [] for order_id in order_ids}
+        
+        if not order_ids:
+            return items_by_order
+        
+        conn = None
+        own_cursor = cursor is None
+        try:
+            if own_cursor:
+                conn = get_db_connection()
+                if not conn:
+                    return items_by_order
+                cursor = conn.cursor(dictionary=True)
+            
+            placeholders = ", ".join(["%s"] * len(order_ids))
+            cursor.execute(f"""
+                SELECT oi.*, m.name, m.image_url
+                FROM order_items oi
+                JOIN menu_items m ON oi.item_id = m.item_id
+                WHERE oi.order_id IN ({placeholders})
+                ORDER BY oi.order_id, oi.order_item_id
+            """, tuple(order_ids))
+            
+            for item in cursor.fetchall():
+                items_by_order[item['order_id']].append(item)
+            
+            return items_by_order
+            
+        finally:
+            if own_cursor:
+                if cursor:
+                    cursor.close()
+                if conn:
+                    conn.close()
+    
+    @staticmethod
+    def _hydrate(cursor, results, include_items: bool) -> List['Order']:
+        """
+        Turn order rows into Order objects, loading all items in one query
+        """
+        orders = [Order._from_row(result) for result in results]
+        
+        if include_items and orders:
+            items_by_order = Order.load_items([order.order_id for order in orders], cursor)
+            for order in orders:
+                order.items = items_by_order[order.order_id]
+        
+        return orders
+    
+    @staticmethod
+    def get_by_customer(customer_id: int, include_items: bool = True) -> List['Order']:
         """
         Get all orders for a customer
         
         Args:
             customer_id: Customer ID
+            include_items: Also load order items (False returns headers only)
             
         Returns:
             List of Order objects
@@ -197,32 +272,7 @@ class Order:
             """
             cursor.execute(query, (customer_id,))
             
-            results = cursor.fetchall()
-            orders = []
-            
-            for result in results:
-                order = Order(
-                    order_id=result['order_id'],
-                    customer_id=result['customer_id'],
-                    delivered_by=result['delivered_by'],
-                    delivered_to=result['delivered_to'],
-                    delivery_status=result['delivery_status'],
-                    total_price=float(result['total_price']),
-                    delivery_date=result['delivery_date'],
-                    delivery_time=result['delivery_time'],
-                    created_at=result['created_at']
-                )
-                
-                # Get items for this order
-                cursor.execute("""
-                    SELECT oi.*, m.name, m.image_url
-                    FROM order_items oi
-                    JOIN menu_items m ON oi.item_id = m.item_id
-                    WHERE oi.order_id = %s
-                """, (order.order_id,))
-                
-                order.items = cursor.fetchall()
-                orders.append(order)
+            orders = Order._hydrate(cursor, cursor.fetchall(), include_items)
             
             cursor.close()
             conn.close()
@@ -234,12 +284,13 @@ class Order:
             return []
     
     @staticmethod
-    def get_by_status(status: str) -> List['Order']:
+    def get_by_status(status: str, include_items: bool = True) -> List['Order']:
         """
         Get all orders with a specific status
         
         Args:
             status: Order status (Pending, Preparing, Ready for Delivery, etc.)
+            include_items: Also load order items (False returns headers only)
             
         Returns:
             List of Order objects
@@ -260,32 +311,7 @@ class Order:
             """
             cursor.execute(query, (status,))
             
-            results = cursor.fetchall()
-            orders = []
-            
-            for result in results:
-                order = Order(
-                    order_id=result['order_id'],
-                    customer_id=result['customer_id'],
-                    delivered_by=result['delivered_by'],
-                    delivered_to=result['delivered_to'],
-                    delivery_status=result['delivery_status'],
-                    total_price=float(result['total_price']),
-                    delivery_date=result['delivery_date'],
-                    delivery_time=result['delivery_time'],
-                    created_at=result['created_at']
-                )
-                
-                # Get items
-                cursor.execute("""
-                    SELECT oi.*, m.name
-                    FROM order_items oi
-                    JOIN menu_items m ON oi.item_id = m.item_id
-                    WHERE oi.order_id = %s
-                """, (order.order_id,))
-                
-                order.items = cursor.fetchall()
-                orders.append(order)
+            orders = Order._hydrate(cursor, cursor.fetchall(), include_items)
             
             cursor.close()
             conn.close()
@@ -341,6 +367,10 @@ class Order:
                 return False
             
             cursor = conn.cursor()
+
+            # Book the refund in the revenue rollups (before the status changes)
+            RevenueRollup.record_cancellation(cursor, self.order_id)
+            StaffStats.order_cancelled(cursor, self.order_id)
             
             # Update status
             cursor.execute(
@@ -349,11 +379,8 @@ class Order:
             )
             
             # Refund customer
-            cursor.execute("""
-                UPDATE users
-                SET total_balance = total_balance + %s
-                WHERE user_id = %s
-            """, (self.total_price, self.customer_id))
+            if self.total_price:
+                Wallet.credit(cursor, self.customer_id, self.total_price, 'refund', self.order_id)
             
             conn.commit()
             
@@ -0,0 +1,276 @@
+import argparse
+import random
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from db import get_db_connection
+
+
+# Re-bucketing choices for the time-series endpoint
+BUCKETS = ('hour', 'day', 'week', 'month')
+
+# Most points one time-series request may return
+MAX_POINTS = 2000
+
+# Hour of the order's created_at (no DATE_FORMAT, its % clashes with query params)
+HOUR_EXPR = "TIMESTAMP(DATE(created_at), MAKETIME(HOUR(created_at), 0, 0))"
+
+METRICS = ('order_count', 'gross_revenue', 'cancelled_count', 'refunded_amount')
+
+# Rows per bucket that writers spread over (slot column, summed on read), so
+# concurrent orders in the same hour do not all wait on one row lock
+SLOTS = 16
+
+
+class RevenueRollup:
+    """
+    Hourly and daily order/revenue totals (revenue_hourly, revenue_daily).
+
+    record_order() and record_cancellation() run inside the transaction
+    that creates or cancels the order, so the rollups never disagree with
+    orders. A cancellation is booked against the bucket the order was
+    placed in, which is also what backfill() computes from scratch.
+
+    Each bucket is split over up to SLOTS rows and every write picks one at
+    random, so two order transactions only contend for a rollup row lock
+    when they land on the same slot. Reads sum the slots of a bucket.
+    """
+
+    @staticmethod
+    def record_order(cursor, order_id: int):
+        """
+        Add a just-inserted order to its hour and day
+
+        Args:
+            cursor: Cursor of the transaction that inserted the order
+            order_id: The new order
+        """
+        slot = random.randrange(SLOTS)
+        cursor.execute(f"""
+            INSERT INTO revenue_hourly (bucket_start, slot, order_count, gross_revenue)
+            SELECT {HOUR_EXPR}, %s, 1, total_price FROM orders WHERE order_id = %s
+            ON DUPLICATE KEY UPDATE
+                order_count = order_count + 1,
+                gross_revenue = gross_revenue + VALUES(gross_revenue)
+        """, (slot, order_id))
+        cursor.execute("""
+            INSERT INTO revenue_daily (bucket_start, slot, order_count, gross_revenue)
+            SELECT DATE(created_at), %s, 1, total_price FROM orders WHERE order_id = %s
+            ON DUPLICATE KEY UPDATE
+                order_count = order_count + 1,
+                gross_revenue = gross_revenue + VALUES(gross_revenue)
+        """, (slot, order_id))
+
+    @staticmethod
+    def record_cancellation(cursor, order_id: int):
+        """
+        Book a refund against the order's buckets
+
+        Must run before the order is marked Cancelled (an order that is
+        already cancelled is not counted twice).
+
+        Args:
+            cursor: Cursor of the transaction that cancels the order
+            order_id: Order being cancelled
+        """
+        slot = random.randrange(SLOTS)
+        cursor.execute(f"""
+            INSERT INTO revenue_hourly (bucket_start, slot, cancelled_count, refunded_amount)
+            SELECT {HOUR_EXPR}, %s, 1, total_price FROM orders
+            WHERE order_id = %s AND delivery_status <> 'Cancelled'
+            ON DUPLICATE KEY UPDATE
+                cancelled_count = cancelled_count + 1,
+                refunded_amount = refunded_amount + VALUES(refunded_amount)
+        """, (slot, order_id))
+        cursor.execute("""
+            INSERT INTO revenue_daily (bucket_start, slot, cancelled_count, refunded_amount)
+            SELECT DATE(created_at), %s, 1, total_price FROM orders
+            WHERE order_id = %s AND delivery_status <> 'Cancelled'
+            ON DUPLICATE KEY UPDATE
+                cancelled_count = cancelled_count + 1,
+                refunded_amount = refunded_amount + VALUES(refunded_amount)
+        """, (slot, order_id))
+
+    @staticmethod
+    def backfill(since: Optional[date] = None) -> int:
+        """
+        Rebuild the rollups from the orders table
+
+        Args:
+            since: Only rebuild buckets from this day on (default: everything)
+
+        Returns:
+            int: Number of hourly buckets written
+        """
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError("Database connection failed")
+
+        since_dt = datetime.combine(since, datetime.min.time()) if since else datetime(1970, 1, 1)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM revenue_hourly WHERE bucket_start >= %s", (since_dt,))
+            cursor.execute("DELETE FROM revenue_daily WHERE bucket_start >= %s", (since_dt.date(),))
+
+            # rebuilt buckets use slot 0 only
+            cursor.execute(f"""
+                INSERT INTO revenue_hourly
+                    (bucket_start, order_count, gross_revenue, cancelled_count, refunded_amount)
+                SELECT {HOUR_EXPR} AS bucket,
+                       COUNT(*),
+                       SUM(total_price),
+                       SUM(delivery_status = 'Cancelled'),
+                       SUM(CASE WHEN delivery_status = 'Cancelled' THEN total_price ELSE 0 END)
+                FROM orders
+                WHERE created_at >= %s
+                GROUP BY bucket
+            """, (since_dt,))
+            hourly = cursor.rowcount
+
+            cursor.execute("""
+                INSERT INTO revenue_daily
+                    (bucket_start, order_count, gross_revenue, cancelled_count, refunded_amount)
+                SELECT DATE(bucket_start) AS bucket,
+                       SUM(order_count),
+                       SUM(gross_revenue),
+                       SUM(cancelled_count),
+                       SUM(refunded_amount)
+                FROM revenue_hourly
+                WHERE bucket_start >= %s
+                GROUP BY bucket
+            """, (since_dt,))
+
+            conn.commit()
+            cursor.close()
+            return hourly
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _load(table: str, start: datetime, end: datetime):
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError("Database connection failed")
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT bucket_start, SUM(order_count), SUM(gross_revenue),
+                       SUM(cancelled_count), SUM(refunded_amount)
+                FROM {table}
+                WHERE bucket_start >= %s AND bucket_start < %s
+                GROUP BY bucket_start
+                ORDER BY bucket_start
+            """, (start, end))
+            rows = cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()
+
+        return rows
+
+    @staticmethod
+    def _bucket_of(stamps, bucket: str):
+        """
+        Start of the bucket each timestamp falls in (numpy datetime64 array)
+        """
+        if bucket == 'hour':
+            return stamps.astype('datetime64[h]')
+        if bucket == 'month':
+            return stamps.astype('datetime64[M]').astype('datetime64[D]')
+
+        days = stamps.astype('datetime64[D]')
+        if bucket == 'week':
+            # datetime64 day 0 (1970-01-01) was a Thursday; weeks start on Monday
+            offset = (days.astype(np.int64) + 3) % 7
+            days = days - offset.astype('timedelta64[D]')
+        return days
+
+    @classmethod
+    def timeseries(cls, start: datetime, end: datetime, bucket: str = 'day') -> List[Dict]:
+        """
+        Totals per bucket for every bucket that overlaps [start, end)
+
+        Whole buckets are returned: the first one starts at or before start
+        (e.g. 10:00 for start 10:25, or that week's Monday) and the last one
+        covers the instant before end, each with its full totals.
+
+        Hour buckets read revenue_hourly; day/week/month read revenue_daily
+        and are summed into the requested size. Buckets with no orders are
+        returned with zeros.
+
+        Args:
+            start: Range start
+            end: Range end
+            bucket: 'hour', 'day', 'week' or 'month'
+
+        Returns:
+            list: [{bucket_start, orders, gross_revenue, cancelled, refunded, net_revenue}]
+        """
+        if bucket not in BUCKETS:
+            raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+        if end <= start:
+            raise ValueError("end must be after start")
+
+        first = cls._bucket_of(np.array([start], dtype='datetime64[s]'), bucket)[0]
+        last = cls._bucket_of(np.array([end - timedelta(seconds=1)], dtype='datetime64[s]'), bucket)[0]
+        if bucket == 'month':
+            months = np.arange(first.astype('datetime64[M]'), last.astype('datetime64[M]') + 2)
+            bounds = months.astype('datetime64[D]')
+        elif bucket == 'week':
+            bounds = np.arange(first, last + 8, 7)
+        else:
+            bounds = np.arange(first, last + 2)
+        # bounds has one extra entry: where the last bucket ends
+        starts = bounds[:-1]
+
+        if len(starts) > MAX_POINTS:
+            raise ValueError(f"Range too large for {bucket} buckets (max {MAX_POINTS} points)")
+
+        # Load whole buckets, so the first and last ones are not cut at start/end
+        load_start, load_end = bounds[[0, -1]].astype('datetime64[s]').astype(datetime)
+        table = 'revenue_hourly' if bucket == 'hour' else 'revenue_daily'
+        rows = cls._load(table, load_start, load_end)
+
+        totals = np.zeros((len(METRICS), len(starts)))
+        if rows:
+            stamps = np.array([row[0] for row in rows], dtype='datetime64[s]')
+            values = np.array([[float(v or 0) for v in row[1:]] for row in rows]).T
+
+            # Position of each row's bucket (searchsorted also copes with uneven months)
+            row_buckets = cls._bucket_of(stamps, bucket)
+            index = np.searchsorted(starts, row_buckets)
+            keep = (index < len(starts)) & (starts[np.minimum(index, len(starts) - 1)] == row_buckets)
+            for m in range(len(METRICS)):
+                totals[m] = np.bincount(index[keep], weights=values[m][keep], minlength=len(starts))
+
+        orders, gross, cancelled, refunded = totals
+        net = gross - refunded
+        labels = starts.astype('datetime64[s]').astype(datetime)
+
+        return [
+            {
+                "bucket_start": labels[i].isoformat(),
+                "orders": int(orders[i]),
+                "gross_revenue": round(float(gross[i]), 2),
+                "cancelled": int(cancelled[i]),
+                "refunded": round(float(refunded[i]), 2),
+                "net_revenue": round(float(net[i]), 2),
+            }
+            for i in range(len(starts))
+        ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild revenue rollups from the orders table")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--since", type=date.fromisoformat, help="only rebuild from this day (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    buckets = RevenueRollup.backfill(args.since)
+    print(f"Revenue rollups rebuilt ({buckets} hourly buckets)")
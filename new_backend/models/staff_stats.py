@@ -0,0 +1,225 @@
+from typing import Dict, List, Optional
+
+from db import get_db_connection
+
+
+# Orders that count as prepared once the chef marks them complete
+PREPARED_STATUSES = ('Ready for Delivery', 'Out for Delivery', 'Delivered')
+
+STAFF_ROLES = ('chef', 'driver', 'delivery')
+
+COUNTERS = ('dishes_prepared', 'deliveries', 'complaints', 'compliments', 'rating_sum', 'rating_count')
+
+
+class StaffStats:
+    """
+    Per-employee totals in the staff_stats table.
+
+    Chef and driver profiles and the manager's employee list read one row
+    per person instead of counting orders, feedback and reviews. The
+    routes that complete, deliver, cancel and rate orders or submit
+    feedback update the row in their own transaction; reconcile() rebuilds
+    every row from the source tables and runs periodically to correct drift.
+    """
+
+    @staticmethod
+    def bump(cursor, user_id: int, **deltas):
+        """
+        Add deltas to a staff member's counters (creates the row if needed)
+
+        Args:
+            cursor: Cursor of the caller's transaction
+            user_id: Staff member
+            **deltas: counter name -> amount, e.g. complaints=1
+        """
+        columns = [name for name in COUNTERS if deltas.get(name)]
+        if not user_id or not columns:
+            return
+
+        cursor.execute(f"""
+            INSERT INTO staff_stats (user_id, {', '.join(columns)})
+            VALUES (%s, {', '.join(['%s'] * len(columns))})
+            ON DUPLICATE KEY UPDATE
+                {', '.join(f'{name} = {name} + VALUES({name})' for name in columns)}
+        """, (user_id, *[deltas[name] for name in columns]))
+
+    @staticmethod
+    def order_completed(cursor, order_id: int):
+        """
+        Count a dish for the order's chef; call before the status changes
+        (an order that already counted is skipped)
+        """
+        placeholders = ', '.join(['%s'] * len(PREPARED_STATUSES))
+        cursor.execute(f"""
+            INSERT INTO staff_stats (user_id, dishes_prepared)
+            SELECT prepared_by, 1 FROM orders
+            WHERE order_id = %s
+              AND prepared_by IS NOT NULL
+              AND delivery_status NOT IN ({placeholders})
+            ON DUPLICATE KEY UPDATE dishes_prepared = dishes_prepared + 1
+        """, (order_id, *PREPARED_STATUSES))
+
+    @staticmethod
+    def order_delivered(cursor, order_id: int):
+        """
+        Count a delivery for the order's driver; call before the status changes
+        """
+        cursor.execute("""
+            INSERT INTO staff_stats (user_id, deliveries)
+            SELECT delivered_by, 1 FROM orders
+            WHERE order_id = %s
+              AND delivered_by IS NOT NULL
+              AND delivery_status <> 'Delivered'
+            ON DUPLICATE KEY UPDATE deliveries = deliveries + 1
+        """, (order_id,))
+
+    @staticmethod
+    def order_cancelled(cursor, order_id: int):
+        """
+        Take back a prepared dish / delivery; call before the status changes
+        """
+        placeholders = ', '.join(['%s'] * len(PREPARED_STATUSES))
+        cursor.execute(f"""
+            UPDATE staff_stats s
+            JOIN orders o ON s.user_id = o.prepared_by
+            SET s.dishes_prepared = GREATEST(s.dishes_prepared - 1, 0)
+            WHERE o.order_id = %s AND o.delivery_status IN ({placeholders})
+        """, (order_id, *PREPARED_STATUSES))
+        cursor.execute("""
+            UPDATE staff_stats s
+            JOIN orders o ON s.user_id = o.delivered_by
+            SET s.deliveries = GREATEST(s.deliveries - 1, 0)
+            WHERE o.order_id = %s AND o.delivery_status = 'Delivered'
+        """, (order_id,))
+
+    @staticmethod
+    def feedback_added(cursor, user_id: int, feedback_type: str):
+        """
+        Count a complaint or compliment about a staff member
+        """
+        if feedback_type == 'complaint':
+            StaffStats.bump(cursor, user_id, complaints=1)
+        elif feedback_type == 'compliment':
+            StaffStats.bump(cursor, user_id, compliments=1)
+
+    @staticmethod
+    def _to_dict(row) -> Dict:
+        rating_count = row.get('rating_count') or 0
+        return {
+            'dishes_prepared': row.get('dishes_prepared') or 0,
+            'deliveries': row.get('deliveries') or 0,
+            'complaints': row.get('complaints') or 0,
+            'compliments': row.get('compliments') or 0,
+            'avg_rating': round(float(row.get('rating_sum') or 0) / rating_count, 1) if rating_count else 0,
+        }
+
+    @staticmethod
+    def for_user(cursor, user_id: int, roles=STAFF_ROLES) -> Optional[Dict]:
+        """
+        Profile fields plus stats for one staff member (one query)
+
+        Returns:
+            dict with name, salary, amount_warnings and the stats, or None
+        """
+        placeholders = ', '.join(['%s'] * len(roles))
+        cursor.execute(f"""
+            SELECT u.name, u.salary, u.amount_warnings,
+                   s.dishes_prepared, s.deliveries, s.complaints, s.compliments,
+                   s.rating_sum, s.rating_count
+            FROM users u
+            LEFT JOIN staff_stats s ON s.user_id = u.user_id
+            WHERE u.user_id = %s AND u.role IN ({placeholders})
+        """, (user_id, *roles))
+        row = cursor.fetchone()
+        if not row:
+            return None
+
+        stats = StaffStats._to_dict(row)
+        stats.update(name=row['name'], salary=row['salary'], amount_warnings=row['amount_warnings'])
+        return stats
+
+    @staticmethod
+    def attach(rows: List[Dict]) -> List[Dict]:
+        """
+        Replace raw stat columns on employee rows with the computed fields
+        """
+        for row in rows:
+            stats = StaffStats._to_dict(row)
+            for name in COUNTERS:
+                row.pop(name, None)
+            row.update(stats)
+        return rows
+
+    @staticmethod
+    def reconcile() -> int:
+        """
+        Rebuild every staff member's row from orders, feedback and reviews
+
+        Returns:
+            int: Rows inserted or changed
+        """
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError("Database connection failed")
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO staff_stats
+                    (user_id, dishes_prepared, deliveries, complaints, compliments, rating_sum, rating_count)
+                SELECT u.user_id,
+                       COALESCE(p.total, 0),
+                       COALESCE(d.total, 0),
+                       COALESCE(f.complaints, 0),
+                       COALESCE(f.compliments, 0),
+                       COALESCE(r.stars, 0),
+                       COALESCE(r.total, 0)
+                FROM users u
+                LEFT JOIN (
+                    SELECT prepared_by AS user_id, COUNT(*) AS total
+                    FROM orders
+                    WHERE delivery_status IN ('Ready for Delivery', 'Out for Delivery', 'Delivered')
+                    GROUP BY prepared_by
+                ) p ON p.user_id = u.user_id
+                LEFT JOIN (
+                    SELECT delivered_by AS user_id, COUNT(*) AS total
+                    FROM orders
+                    WHERE delivery_status = 'Delivered'
+                    GROUP BY delivered_by
+                ) d ON d.user_id = u.user_id
+                LEFT JOIN (
+                    SELECT feedback_for AS user_id,
+                           SUM(feedback_type = 'complaint') AS complaints,
+                           SUM(feedback_type = 'compliment') AS compliments
+                    FROM feedback
+                    GROUP BY feedback_for
+                ) f ON f.user_id = u.user_id
+                LEFT JOIN (
+                    SELECT o.prepared_by AS user_id, SUM(rv.amount_stars) AS stars, COUNT(*) AS total
+                    FROM reviews rv
+                    JOIN orders o ON rv.related_order = o.order_id
+                    WHERE rv.amount_stars > 0
+                    GROUP BY o.prepared_by
+                ) r ON r.user_id = u.user_id
+                WHERE u.role IN ('chef', 'driver', 'delivery')
+                ON DUPLICATE KEY UPDATE
+                    dishes_prepared = VALUES(dishes_prepared),
+                    deliveries = VALUES(deliveries),
+                    complaints = VALUES(complaints),
+                    compliments = VALUES(compliments),
+                    rating_sum = VALUES(rating_sum),
+                    rating_count = VALUES(rating_count)
+            """)
+            changed = cursor.rowcount
+            conn.commit()
+            cursor.close()
+            return changed
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    print(f"Staff stats rebuilt ({StaffStats.reconcile()} rows changed)")
@@ -1,4 +1,7 @@
 from db import get_db_connection
+from models.dashboard_counters import dashboard_counters
+from models.wallet import Wallet
+from utils.tokens import revocations
 from typing import Optional, Dict, List
 
 
@@ -52,12 +55,14 @@ class User:
             """
             
             cursor.execute(query, (username, password_hash, name, email, phone, home_address))
-            conn.commit()
-            
             user_id = cursor.lastrowid
+            Wallet.create_snapshot(cursor, user_id)
+            conn.commit()
             
             cursor.close()
             conn.close()
+
+            dashboard_counters.user_added('customer')
             
             return user_id
             
@@ -258,7 +263,8 @@ class User:
             action: 'add' or 'subtract'
             
         Returns:
-            bool: True if successful, False otherwise
+            bool: True if successful, False otherwise (a subtraction the
+            balance does not cover changes nothing and returns False)
         """
         try:
             conn = get_db_connection()
@@ -267,19 +273,22 @@ class User:
             
             cursor = conn.cursor()
             
+            # Balance changes are wallet ledger entries
             if action == 'add':
-                query = "UPDATE users SET total_balance = total_balance + %s WHERE user_id = %s"
+                changed = Wallet.credit(cursor, self.user_id, amount, 'adjustment')
             else:
-                query = "UPDATE users SET total_balance = total_balance - %s WHERE user_id = %s"
-            
-            cursor.execute(query, (amount, self.user_id))
+                changed = Wallet.debit(cursor, self.user_id, amount, 'adjustment')
+            if not changed:
+                # Balance does not cover it, nothing was changed
+                conn.rollback()
+                cursor.close()
+                conn.close()
+                return False
+
             conn.commit()
             
             # Update local balance
-            if action == 'add':
-                self.total_balance += amount
-            else:
-                self.total_balance -= amount
+            self.total_balance = Wallet.balance(cursor, self.user_id)
             
             cursor.close()
             conn.close()
@@ -290,6 +299,43 @@ class User:
             print(f"Error updating balance: {e}")
             return False
     
+    @staticmethod
+    def update_password_hash(user_id: int, old_hash: str, new_hash: str) -> bool:
+        """
+        Replace a password hash (e.g. after the bcrypt cost changed)
+        
+        Only updates if the stored hash is still old_hash, so a password
+        changed in the meantime is not overwritten.
+        
+        Args:
+            user_id: User to update
+            old_hash: Hash the caller verified against
+            new_hash: New hash of the same password
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            conn = get_db_connection()
+            if not conn:
+                return False
+            
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE users SET password_hash = %s WHERE user_id = %s AND password_hash = %s",
+                (new_hash, user_id, old_hash)
+            )
+            conn.commit()
+            
+            cursor.close()
+            conn.close()
+            
+            return True
+            
+        except Exception as e:
+            print(f"Error updating password hash: {e}")
+            return False
+    
     def add_warning(self) -> bool:
         """
         Add a warning to the user
@@ -342,6 +388,9 @@ class User:
             cursor.close()
             conn.close()
             
+            # tokens issued before now stop working immediately
+            revocations.revoke(self.user_id)
+            
             return True
             
         except Exception as e:
@@ -0,0 +1,252 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional
+
+from db import get_db_connection
+
+
+CENT = Decimal("0.01")
+
+# Current balance for a query over users u LEFT JOIN wallet_snapshots s:
+# the snapshot (users.total_balance before a user's first entry) plus the
+# entries after it
+BALANCE_SQL = """COALESCE(s.balance, u.total_balance) + COALESCE((
+    SELECT SUM(l.amount) FROM wallet_ledger l
+    WHERE l.user_id = u.user_id AND l.entry_id > COALESCE(s.last_entry_id, 0)
+), 0)"""
+
+# One user's current balance (param: user_id)
+USER_BALANCE_SQL = f"""
+    SELECT {BALANCE_SQL} AS balance
+    FROM users u
+    LEFT JOIN wallet_snapshots s ON s.user_id = u.user_id
+    WHERE u.user_id = %s
+"""
+
+
+def to_amount(value) -> Decimal:
+    """Round a float/str/Decimal to cents the way a DECIMAL(10,2) column does"""
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class Wallet:
+    """
+    Customer balances as an append-only ledger.
+
+    Every deposit, order payment, refund and manual adjustment is a row in
+    wallet_ledger (positive = credit, negative = debit); rows are never
+    changed. wallet_snapshots holds each user's balance up to last_entry_id,
+    so a balance is the snapshot plus the few entries after it. compact()
+    runs periodically, folds new entries into the snapshots and copies the
+    result to users.total_balance for the list views that read it.
+
+    Writers never update the users row. Credits take a shared lock on the
+    user's snapshot row, so they do not wait for each other; debits take
+    it exclusively, so two debits cannot both spend the same money. Every
+    user gets a snapshot row when created (and migration 8/12 seeded the
+    existing ones), starting from users.total_balance.
+    """
+
+    @staticmethod
+    def create_snapshot(cursor, user_id: int):
+        """
+        Give a user their snapshot row, starting from users.total_balance
+
+        Called in the transaction that creates the user; does nothing if
+        the row already exists.
+        """
+        cursor.execute("""
+            INSERT IGNORE INTO wallet_snapshots (user_id, balance, last_entry_id)
+            SELECT user_id, total_balance, 0 FROM users WHERE user_id = %s
+        """, (user_id,))
+
+    @staticmethod
+    def _lock_snapshot(cursor, user_id: int, exclusive: bool) -> Optional[int]:
+        """
+        Lock the user's snapshot row (created from users.total_balance if missing)
+
+        The locking read only ever runs on a row that exists: a locking read
+        that finds nothing takes a gap lock, and two writers holding gap
+        locks and then inserting deadlock each other.
+
+        Returns:
+            int: last_entry_id of the snapshot, or None if the user does not exist
+        """
+        # plain read, takes no locks
+        cursor.execute("""
+            SELECT s.user_id IS NOT NULL AS has_snapshot FROM users u
+            LEFT JOIN wallet_snapshots s ON s.user_id = u.user_id
+            WHERE u.user_id = %s
+        """, (user_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        if not (row['has_snapshot'] if isinstance(row, dict) else row[0]):
+            # users created before their snapshot was seeded
+            Wallet.create_snapshot(cursor, user_id)
+
+        lock = "FOR UPDATE" if exclusive else "LOCK IN SHARE MODE"
+        cursor.execute(f"SELECT last_entry_id FROM wallet_snapshots WHERE user_id = %s {lock}", (user_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return row['last_entry_id'] if isinstance(row, dict) else row[0]
+
+    @staticmethod
+    def _append(cursor, user_id: int, amount: Decimal, reason: str, order_id: Optional[int]):
+        cursor.execute("""
+            INSERT INTO wallet_ledger (user_id, amount, reason, order_id)
+            VALUES (%s, %s, %s, %s)
+        """, (user_id, amount, reason, order_id))
+
+    @staticmethod
+    def credit(cursor, user_id: int, amount, reason: str, order_id: Optional[int] = None) -> bool:
+        """
+        Add money to a wallet
+
+        Args:
+            cursor: Cursor of the caller's transaction
+            user_id: User to credit
+            amount: Amount to add (positive)
+            reason: 'deposit', 'refund' or 'adjustment'
+            order_id: Order the entry belongs to (refunds)
+
+        Returns:
+            bool: True if credited, False if the user does not exist
+        """
+        amount = to_amount(amount)
+        if amount <= 0:
+            raise ValueError("Credit amount must be positive")
+        if Wallet._lock_snapshot(cursor, user_id, exclusive=False) is None:
+            return False
+        Wallet._append(cursor, user_id, amount, reason, order_id)
+        return True
+
+    @staticmethod
+    def debit(cursor, user_id: int, amount, reason: str, order_id: Optional[int] = None) -> bool:
+        """
+        Take money from a wallet only if the balance covers it
+
+        The snapshot row stays locked until the caller commits, so the
+        balance cannot change between the check and the new entry.
+
+        Args:
+            cursor: Cursor of the caller's transaction
+            user_id: User to debit
+            amount: Amount to take (not negative)
+            reason: 'order' or 'adjustment'
+            order_id: Order the entry pays for
+
+        Returns:
+            bool: True if debited, False if the balance is too low or the
+            user does not exist
+        """
+        amount = to_amount(amount)
+        if amount < 0:
+            raise ValueError("Debit amount cannot be negative")
+        if Wallet._lock_snapshot(cursor, user_id, exclusive=True) is None:
+            return False
+        if amount == 0:
+            return True
+
+        # Locking read: sees every committed entry, not the transaction's
+        # older read view
+        cursor.execute("""
+            SELECT s.balance + COALESCE(SUM(l.amount), 0) AS balance
+            FROM wallet_snapshots s
+            LEFT JOIN wallet_ledger l ON l.user_id = s.user_id AND l.entry_id > s.last_entry_id
+            WHERE s.user_id = %s
+            GROUP BY s.user_id, s.balance
+            LOCK IN SHARE MODE
+        """, (user_id,))
+        row = cursor.fetchone()
+        balance = row['balance'] if isinstance(row, dict) else row[0]
+        if balance < amount:
+            return False
+
+        Wallet._append(cursor, user_id, -amount, reason, order_id)
+        return True
+
+    @staticmethod
+    def balance(cursor, user_id: int) -> Optional[float]:
+        """
+        Current balance: snapshot plus the entries after it (one query)
+
+        Returns:
+            float: Balance, or None if the user does not exist
+        """
+        cursor.execute(USER_BALANCE_SQL, (user_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return float(row['balance'] if isinstance(row, dict) else row[0])
+
+    @staticmethod
+    def compact() -> int:
+        """
+        Fold new ledger entries into the snapshots and sync users.total_balance
+
+        Each user's snapshot row is locked while it is updated, which waits
+        for credits and debits still in flight for that user, so no entry
+        is skipped.
+
+        Returns:
+            int: Users whose snapshot changed
+        """
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError("Database connection failed")
+
+        compacted = 0
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT s.user_id FROM wallet_snapshots s
+                WHERE EXISTS (
+                    SELECT 1 FROM wallet_ledger l
+                    WHERE l.user_id = s.user_id AND l.entry_id > s.last_entry_id
+                )
+            """)
+            user_ids = [row[0] for row in cursor.fetchall()]
+            conn.commit()
+
+            # one short transaction per user, so credits and debits only
+            # wait for their own user's fold
+            for user_id in user_ids:
+                cursor.execute(
+                    "SELECT balance, last_entry_id FROM wallet_snapshots WHERE user_id = %s FOR UPDATE",
+                    (user_id,)
+                )
+                row = cursor.fetchone()
+                if row is None:
+                    # user deleted since the list was read
+                    conn.commit()
+                    continue
+                balance, last_entry_id = row
+                cursor.execute("""
+                    SELECT COALESCE(SUM(amount), 0), MAX(entry_id) FROM wallet_ledger
+                    WHERE user_id = %s AND entry_id > %s
+                    LOCK IN SHARE MODE
+                """, (user_id, last_entry_id))
+                delta, max_entry_id = cursor.fetchone()
+                if max_entry_id is not None:
+                    cursor.execute("""
+                        UPDATE wallet_snapshots SET balance = %s, last_entry_id = %s
+                        WHERE user_id = %s
+                    """, (balance + delta, max_entry_id, user_id))
+                    cursor.execute(
+                        "UPDATE users SET total_balance = %s WHERE user_id = %s",
+                        (balance + delta, user_id)
+                    )
+                    compacted += 1
+                conn.commit()
+            cursor.close()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return compacted
+
+
+if __name__ == "__main__":
+    print(f"Wallet snapshots compacted ({Wallet.compact()} users)")
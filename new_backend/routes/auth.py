@@ -1,22 +1,41 @@
 from flask import Blueprint, request, jsonify
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from db import get_db_connection
-from utils.auth_helpers import hash_password, verify_password
+from config import AUTH_CONFIG
+from utils.auth_helpers import hash_password, verify_password, needs_rehash
+from utils.bulkhead import BusyError
+from utils.rate_limit import SlidingWindowLimiter
+from utils.tokens import issue_token
+from models.dashboard_counters import dashboard_counters
+from models.user import User
+from models.wallet import BALANCE_SQL, Wallet
 
 auth_bp = Blueprint('auth', __name__)
 
+# every login attempt costs a bcrypt check, so cap attempts per client IP
+login_limiter = SlidingWindowLimiter(AUTH_CONFIG["login_attempts"], AUTH_CONFIG["login_window"])
+
+def busy_response():
+    # all password workers are taken, ask the client to retry shortly
+    response = jsonify({"error": "Server is busy, please try again", "busy": True})
+    response.headers["Retry-After"] = str(AUTH_CONFIG["retry_after"])
+    return response, 503
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     try:
         data = request.json
+
+        # hash the password before storing (before taking a db connection,
+        # since it can wait on the password workers)
+        hashed = hash_password(data['password'])
+
         conn = get_db_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
         
         cursor = conn.cursor()
         
-        # hash the password before storing
-        hashed = hash_password(data['password'])
-        
         cursor.execute("""
             INSERT INTO users (username, password_hash, name, email, phone, home_address, 
                               role, total_balance, amount_warnings, vip_status, is_blacklisted)
@@ -29,19 +48,30 @@ def register():
             data.get('phone', ''),
             data['home_address']
         ))
-        
-        conn.commit()
         user_id = cursor.lastrowid
+        Wallet.create_snapshot(cursor, user_id)
+
+        conn.commit()
         cursor.close()
         conn.close()
+
+        dashboard_counters.user_added('customer')
         
         return jsonify({"message": "User registered successfully", "user_id": user_id}), 201
+    except (BusyError, FutureTimeoutError):
+        return busy_response()
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
     try:
+        retry_after = login_limiter.hit(request.remote_addr)
+        if retry_after:
+            response = jsonify({"error": "Too many login attempts, please try again later"})
+            response.headers["Retry-After"] = str(int(retry_after) + 1)
+            return response, 429
+
         data = request.json
         conn = get_db_connection()
         if not conn:
@@ -50,7 +80,12 @@ def login():
         cursor = conn.cursor(dictionary=True)
         
         # check user exists
-        cursor.execute("SELECT * FROM users WHERE username = %s", (data['username'],))
+        cursor.execute(f"""
+            SELECT u.*, {BALANCE_SQL} AS wallet_balance
+            FROM users u
+            LEFT JOIN wallet_snapshots s ON s.user_id = u.user_id
+            WHERE u.username = %s
+        """, (data['username'],))
         user = cursor.fetchone()
         
         cursor.close()
@@ -59,13 +94,25 @@ def login():
         # validate user login info
         if not user or not verify_password(data['password'], user['password_hash']):
             return jsonify({"error": "Invalid credentials"}), 401
+
+        # the bcrypt cost setting changed since this hash was made, upgrade it
+        # while we have the plain password (skipped if the workers are busy)
+        if needs_rehash(user['password_hash']):
+            try:
+                new_hash = hash_password(data['password'])
+                User.update_password_hash(user['user_id'], user['password_hash'], new_hash)
+            except (BusyError, FutureTimeoutError):
+                pass
         
         # check blacklist staus
         if user['is_blacklisted']:
             return jsonify({"error": "Account has been suspended"}), 403
         
-        # add JWT tokens 
+        # signed access token, sent back as Authorization: Bearer <token>
+        token = issue_token(user['user_id'], user['role'], user['vip_status'])
         return jsonify({
+            "token": token,
+            "token_expires_in": AUTH_CONFIG["token_ttl"],
             "customer_id": user['user_id'],
             "id": user['user_id'],
             "username": user['username'],
@@ -74,9 +121,11 @@ def login():
             "phone": user['phone'],
             "home_address": user['home_address'],
             "role": user['role'],
-            "balance": float(user['total_balance']),
+            "balance": float(user['wallet_balance']),
             "warnings": user['amount_warnings'],
             "vip_status": user['vip_status']
         }), 200
+    except (BusyError, FutureTimeoutError):
+        return busy_response()
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -1,75 +1,123 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context, g
 from db import get_db_connection
+from config import OLLAMA_CONFIG, CACHE_CONFIG
+from models.knowledge_index import knowledge_index
+from models.kb_ratings import record_rating
+from models.chat_history import chat_history_writer
+from utils.llm_cache import AnswerCache, SingleFlight, normalize_question
+from utils.bulkhead import BoundedExecutor, BusyError, CircuitBreaker, CircuitOpenError
+from utils.pagination import Keyset, page_args, set_next_cursor
+from utils.tokens import token_optional, token_mismatch
+from utils.permissions import permission_matrix, require_permission
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime
+import json
 import requests
 
 chat_bp = Blueprint('chat', __name__)
 
+# answers to questions the knowledge base missed
+answer_cache = AnswerCache(
+    max_entries=CACHE_CONFIG["llm_answer_max_entries"],
+    ttl=CACHE_CONFIG["llm_answer_ttl"],
+)
+llm_flights = SingleFlight()
+
+# flagged answers waiting for review, newest first (paged with ?limit= / ?cursor=)
+FLAGGED_ORDER = Keyset(("cr.created_at", "created_at", "desc"), ("cr.rating_id", "rating_id", "desc"))
+
+# Latest chats; {where} is "WHERE user_id = %s" or ""
+CHAT_HISTORY_SQL = """
+    SELECT chat_id, message, response, source, created_at
+    FROM chat_history
+    {where}
+    ORDER BY created_at DESC
+    LIMIT %s
+"""
+
+# Flagged answers waiting for review; {after} is the keyset condition or ""
+FLAGGED_SQL = f"""
+    SELECT 
+        cr.rating_id,
+        cr.chat_id,
+        cr.rating,
+        cr.feedback,
+        cr.review_status,
+        cr.created_at,
+        ch.message as question,
+        ch.response as answer,
+        kb.kb_id,
+        kb.question as kb_question,
+        kb.created_by,
+        u.name as author_name
+    FROM chat_ratings cr
+    JOIN chat_history ch ON cr.chat_id = ch.chat_id
+    LEFT JOIN knowledge_base kb ON ch.kb_id = kb.kb_id
+    LEFT JOIN users u ON kb.created_by = u.user_id
+    WHERE cr.is_flagged = TRUE AND cr.review_status = 'pending'
+    {{after}}
+    ORDER BY {FLAGGED_ORDER.order_by()}
+    LIMIT %s
+"""
+
+# ollama calls run on their own small pool so a slow model can't tie up
+# every web worker; the breaker stops calling ollama while it is down
+llm_executor = BoundedExecutor(
+    "llm",
+    workers=OLLAMA_CONFIG["workers"],
+    queue_limit=OLLAMA_CONFIG["queue_limit"],
+)
+llm_breaker = CircuitBreaker(
+    "ollama",
+    failure_threshold=OLLAMA_CONFIG["breaker_failures"],
+    reset_timeout=OLLAMA_CONFIG["breaker_reset"],
+)
+
 def search_knowledge_base(query):
-    # search KB for matching questions
+    # search KB for the best matching entry (in-memory index, no table scan)
     try:
-        conn = get_db_connection()
-        if not conn:
-            return None
-
-        cursor = conn.cursor(dictionary=True)
-        query_clean = query.lower().strip()
-
-        # try exact match first
-        cursor.execute("""
-            SELECT kb_id, question, answer, category, avg_rating
-            FROM knowledge_base
-            WHERE is_active = TRUE 
-              AND is_approved = TRUE
-              AND LOWER(question) LIKE %s
-            ORDER BY avg_rating DESC
-            LIMIT 1
-        """, (f"%{query_clean}%",))
-
-        result = cursor.fetchone()
-
-        # if no exact match, try keywords
-        if not result:
-            keywords = query_clean.split()
-            if keywords:
-                cursor.execute("""
-                    SELECT kb_id, question, answer, category, avg_rating
-                    FROM knowledge_base
-                    WHERE is_active = TRUE 
-                      AND is_approved = TRUE
-                      AND (LOWER(question) LIKE %s OR LOWER(answer) LIKE %s)
-                    ORDER BY avg_rating DESC
-                    LIMIT 1
-                """, (f"%{keywords[0]}%", f"%{keywords[0]}%"))
-                result = cursor.fetchone()
-
-        cursor.close()
-        conn.close()
-        return result
-
+        return knowledge_index.search(query)
     except Exception as e:
         print(f"KB search error: {e}")
         return None
 
-def query_llm(question):
-    # call ollama for AI response
-    try:
-        url = "http://localhost:11434/api/generate"
+# fallback replies when the AI service fails
+LLM_ERROR_REPLY = "I'm having trouble answering that right now. Please try again later."
+LLM_TIMEOUT_REPLY = "I'm taking too long to respond. Please try a simpler question."
+LLM_OFFLINE_REPLY = "I can't reach the AI service. Please make sure Ollama is running."
+LLM_FAILURE_REPLY = "I encountered an error. Please try again later."
+LLM_BUSY_REPLY = "The assistant is busy right now. Please try again in a moment."
 
-        prompt = f"""You are a helpful restaurant assistant for SD Foods.
+def build_prompt(question):
+    return f"""You are a helpful restaurant assistant for SD Foods.
 Answer the following question concisely and professionally.
 
 Question: {question}
 
 Answer:"""
 
+class LLMError(Exception):
+    # raised when ollama can't answer; reply is the message shown to the customer
+    def __init__(self, reply):
+        super().__init__(reply)
+        self.reply = reply
+
+class LLMBusyError(LLMError):
+    # every LLM worker and queue slot is taken
+    pass
+
+def ollama_generate(question):
+    # one blocking call to ollama (runs on the LLM worker pool)
+    try:
         payload = {
-            "model": "phi",
-            "prompt": prompt,
+            "model": OLLAMA_CONFIG["model"],
+            "prompt": build_prompt(question),
             "stream": False,
         }
 
-        response = requests.post(url, json=payload, timeout=120)
+        response = requests.post(OLLAMA_CONFIG["url"], json=payload, timeout=OLLAMA_CONFIG["timeout"])
+        # ollama answered, so the service is up even if the answer is unusable
+        llm_breaker.record_success()
 
         if response.status_code == 200:
             data = response.json()
@@ -77,15 +125,101 @@ Answer:"""
             if answer:
                 return answer
 
-        return "I'm having trouble answering that right now. Please try again later."
+        raise LLMError(LLM_ERROR_REPLY)
 
     except requests.exceptions.Timeout:
-        return "I'm taking too long to respond. Please try a simpler question."
+        llm_breaker.record_failure()
+        raise LLMError(LLM_TIMEOUT_REPLY)
     except requests.exceptions.ConnectionError:
-        return "I can't reach the AI service. Please make sure Ollama is running."
+        llm_breaker.record_failure()
+        raise LLMError(LLM_OFFLINE_REPLY)
+    except LLMError:
+        raise
     except Exception as e:
         print(f"LLM error: {e}")
-        return "I encountered an error. Please try again later."
+        raise LLMError(LLM_FAILURE_REPLY)
+
+def call_llm(question):
+    # ask ollama through the bounded LLM pool and circuit breaker
+    # raises LLMBusyError when the pool is full, LLMError for everything else
+    try:
+        llm_breaker.before_call()
+    except CircuitOpenError:
+        raise LLMError(LLM_OFFLINE_REPLY)
+
+    try:
+        return llm_executor.run(lambda: ollama_generate(question), OLLAMA_CONFIG["deadline"])
+    except BusyError:
+        raise LLMBusyError(LLM_BUSY_REPLY)
+    except FutureTimeoutError:
+        raise LLMError(LLM_TIMEOUT_REPLY)
+
+def query_llm(question):
+    # call ollama for AI response
+    # identical questions are answered from the cache, and identical questions
+    # asked at the same time share one ollama call
+    key = normalize_question(question)
+
+    cached = answer_cache.get(key) if key else None
+    if cached is not None:
+        return cached
+
+    def generate():
+        answer = call_llm(question)
+        answer_cache.put(key, answer)
+        return answer
+
+    try:
+        if not key:
+            # nothing to key on (only punctuation/emoji), so unrelated
+            # questions would share one cache entry
+            return call_llm(question)
+        return llm_flights.do(key, generate)
+    except LLMBusyError:
+        # let the route answer 503 so the client retries later
+        raise
+    except LLMError as e:
+        return e.reply
+
+def stream_llm(question):
+    # call ollama with streaming on and yield text pieces as they arrive
+    # ollama sends one JSON object per line: {"response": "...", "done": false}
+    payload = {
+        "model": OLLAMA_CONFIG["model"],
+        "prompt": build_prompt(question),
+        "stream": True,
+    }
+
+    with requests.post(
+        OLLAMA_CONFIG["url"],
+        json=payload,
+        stream=True,
+        timeout=(OLLAMA_CONFIG["connect_timeout"], OLLAMA_CONFIG["timeout"]),
+    ) as response:
+        if response.status_code != 200:
+            raise requests.exceptions.HTTPError(f"Ollama returned {response.status_code}")
+
+        for line in response.iter_lines():
+            if not line:
+                continue
+            data = json.loads(line)
+            piece = data.get("response") or ""
+            if piece:
+                yield piece
+            if data.get("done"):
+                break
+
+def save_chat(user_id, session_id, message, response_text, source, kb_id=None):
+    # queue one question/answer pair (written in batches), returns its chat_id (None on failure)
+    return chat_history_writer.add(user_id, session_id, message, response_text, source, kb_id)
+
+def sse_event(data, event=None):
+    # format one Server-Sent Event
+    text = ""
+    if event:
+        text += f"event: {event}\n"
+    text += f"data: {json.dumps(data)}\n\n"
+    return text
 
 @chat_bp.route("/ask", methods=["POST"])
 def ask_question():
@@ -107,21 +241,7 @@ def ask_question():
             kb_id = kb_result["kb_id"]
 
             # save to chat history
-            conn = get_db_connection()
-            chat_id = None
-            if conn:
-                try:
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        INSERT INTO chat_history (user_id, session_id, message, response, source, kb_id)
-                        VALUES (%s, %s, %s, %s, %s, %s)
-                    """, (user_id, session_id, message, response_text, source, kb_id))
-                    chat_id = cursor.lastrowid
-                    conn.commit()
-                    cursor.close()
-                    conn.close()
-                except Exception as e:
-                    print(f"Error saving chat: {e}")
+            chat_id = save_chat(user_id, session_id, message, response_text, source, kb_id)
 
             return jsonify({
                 "response": response_text,
@@ -134,24 +254,15 @@ def ask_question():
 
         else:
             # use LLM if Knowlege base doesn't know
-            response_text = query_llm(message)
+            try:
+                response_text = query_llm(message)
+            except LLMBusyError as e:
+                response = jsonify({"error": e.reply, "busy": True})
+                response.headers["Retry-After"] = str(OLLAMA_CONFIG["retry_after"])
+                return response, 503
             source = "llm"
 
-            conn = get_db_connection()
-            chat_id = None
-            if conn:
-                try:
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        INSERT INTO chat_history (user_id, session_id, message, response, source)
-                        VALUES (%s, %s, %s, %s, %s)
-                    """, (user_id, session_id, message, response_text, source))
-                    chat_id = cursor.lastrowid
-                    conn.commit()
-                    cursor.close()
-                    conn.close()
-                except Exception as e:
-                    print(f"Error saving chat: {e}")
+            chat_id = save_chat(user_id, session_id, message, response_text, source)
 
             return jsonify({
                 "response": response_text,
@@ -166,6 +277,106 @@ def ask_question():
         traceback.print_exc()
         return jsonify({"error": str(e)}), 400 # HTTP 400 = Bad Request
 
+@chat_bp.route("/ask/stream", methods=["POST"])
+def ask_question_stream():
+    # same as /ask but answers as Server-Sent Events:
+    #   event: meta   {"source", "kb_id", "category"}
+    #   (default)     {"token": "..."}  one per piece of the answer
+    #   event: done   {"chat_id", "source", "needs_rating"}
+    # the full answer is saved to chat_history once it is complete
+    try:
+        data = request.json
+        message = data.get("message", "").strip()
+        user_id = data.get("user_id")
+        session_id = data.get("session_id") or datetime.now().strftime("%Y%m%d%H%M%S")
+
+        if not message:
+            return jsonify({"error": "Message cannot be empty"}), 400
+
+        kb_result = search_knowledge_base(message)
+
+    except Exception as e:
+        print(f"Chat stream error: {e}")
+        return jsonify({"error": str(e)}), 400
+
+    def generate():
+        if kb_result:
+            source = "knowledge_base"
+            kb_id = kb_result["kb_id"]
+            yield sse_event({"source": source, "kb_id": kb_id, "category": kb_result.get("category")}, "meta")
+
+            response_text = kb_result["answer"]
+            yield sse_event({"token": response_text})
+        else:
+            source = "llm"
+            kb_id = None
+            yield sse_event({"source": source, "kb_id": None, "category": None}, "meta")
+
+            key = normalize_question(message)
+            cached = answer_cache.get(key) if key else None
+
+            pieces = []
+            try:
+                if cached is not None:
+                    pieces.append(cached)
+                    yield sse_event({"token": cached})
+                else:
+                    llm_breaker.before_call()
+                    # a stream holds this request thread; streams have their own cap
+                    with llm_executor.slot():
+                        reachable = True
+                        try:
+                            for piece in stream_llm(message):
+                                pieces.append(piece)
+                                yield sse_event({"token": piece})
+                        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+                            reachable = False
+                            raise
+                        finally:
+                            if reachable:
+                                llm_breaker.record_success()
+                            else:
+                                llm_breaker.record_failure()
+                    answer = "".join(pieces).strip()
+                    if answer and key:
+                        answer_cache.put(key, answer)
+            except BusyError:
+                yield sse_event({"error": LLM_BUSY_REPLY, "busy": True}, "error")
+                return
+            except Exception as e:
+                if isinstance(e, requests.exceptions.Timeout):
+                    fallback = LLM_TIMEOUT_REPLY
+                elif isinstance(e, (requests.exceptions.ConnectionError, CircuitOpenError)):
+                    fallback = LLM_OFFLINE_REPLY
+                else:
+                    print(f"LLM stream error: {e}")
+                    fallback = LLM_FAILURE_REPLY
+                # keep what was already sent, otherwise send the fallback reply
+                if not pieces:
+                    pieces.append(fallback)
+                    yield sse_event({"token": fallback})
+
+            response_text = "".join(pieces).strip() or LLM_ERROR_REPLY
+
+        chat_id = save_chat(user_id, session_id, message, response_text, source, kb_id)
+        yield sse_event({"chat_id": chat_id, "source": source, "needs_rating": kb_id is not None}, "done")
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # stop proxies (nginx) from buffering the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+@chat_bp.route("/llm/stats", methods=["GET"])
+def get_llm_stats():
+    # cache, worker pool and circuit breaker counters for the LLM fallback
+    return jsonify({
+        "cache": answer_cache.stats(),
+        "single_flight": llm_flights.stats(),
+        "pool": llm_executor.stats(),
+        "circuit": llm_breaker.stats(),
+    }), 200
+
 @chat_bp.route("/rate", methods=["POST"])
 def rate_response():
     try:
@@ -182,6 +393,9 @@ def rate_response():
         if rating < 0 or rating > 5:
             return jsonify({"error": "Rating must be between 0 and 5"}), 400
 
+        # the chat may still be waiting in the write buffer
+        chat_history_writer.ensure_written(chat_id)
+
         conn = get_db_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
@@ -207,30 +421,18 @@ def rate_response():
         """, (chat_id, user_id, rating, feedback, is_flagged))
         rating_id = cursor.lastrowid
 
-        # update KB stats if from knowledge base
+        # update the entry's running totals (same transaction as the rating)
+        avg_rating = None
         if chat["kb_id"]:
-            cursor.execute("""
-                UPDATE knowledge_base kb
-                SET 
-                    avg_rating = (
-                        SELECT AVG(cr.rating)
-                        FROM chat_ratings cr
-                        JOIN chat_history ch ON cr.chat_id = ch.chat_id
-                        WHERE ch.kb_id = kb.kb_id
-                    ),
-                    total_ratings = (
-                        SELECT COUNT(*)
-                        FROM chat_ratings cr
-                        JOIN chat_history ch ON cr.chat_id = ch.chat_id
-                        WHERE ch.kb_id = kb.kb_id
-                    )
-                WHERE kb_id = %s
-            """, (chat["kb_id"],))
+            avg_rating = record_rating(cursor, chat["kb_id"], rating)
 
         conn.commit()
         cursor.close()
         conn.close()
 
+        if avg_rating is not None:
+            knowledge_index.update_rating(chat["kb_id"], avg_rating)
+
         msg = "Thank you for your feedback!"
         if is_flagged:
             msg = "Your feedback has been flagged for manager review. Thank you for helping us improve!"
@@ -248,7 +450,7 @@ def rate_response():
         return jsonify({"error": str(e)}), 400
 
 @chat_bp.route("/knowledge/add", methods=["POST"])
-
+@token_optional
 def add_knowledge():
     try:
         data = request.json
@@ -280,8 +482,17 @@ def add_knowledge():
         cursor = conn.cursor(dictionary=True)
 
         # check user role to see if we auto-approve
-        cursor.execute("SELECT role FROM users WHERE user_id = %s", (created_by,))
-        user = cursor.fetchone()
+        # (a token already carries the role, only look it up without one)
+        mismatch = token_mismatch(created_by)
+        if mismatch:
+            cursor.close()
+            conn.close()
+            return mismatch
+        if g.user:
+            user = {"role": g.user["role"]}
+        else:
+            cursor.execute("SELECT role FROM users WHERE user_id = %s", (created_by,))
+            user = cursor.fetchone()
 
         if not user:
             cursor.close()
@@ -291,8 +502,8 @@ def add_knowledge():
 
         print(f"✅ User found: {user['role']}")
 
-        # employees get auto-approved
-        is_approved = user['role'] in ['chef', 'driver', 'delivery', 'manager', 'admin']
+        # employees get auto-approved (knowledge.auto_approve in role_permissions)
+        is_approved = permission_matrix.allows(user['role'], "knowledge.auto_approve")
         print(f"📋 Auto-approve: {is_approved}")
 
         cursor.execute("""
@@ -307,6 +518,10 @@ def add_knowledge():
 
         print(f"✅ Knowledge added with ID: {kb_id}")
 
+        # searchable right away if it was auto-approved
+        if is_approved:
+            knowledge_index.refresh(kb_id)
+
         message = "Knowledge added successfully!"
         if not is_approved:
             message = "Knowledge submitted for manager approval!"
@@ -329,6 +544,9 @@ def get_chat_history():
         user_id = request.args.get("user_id")
         limit = int(request.args.get("limit", 20))
 
+        # include chats that are still in the write buffer
+        chat_history_writer.flush()
+
         conn = get_db_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
@@ -336,20 +554,9 @@ def get_chat_history():
         cursor = conn.cursor(dictionary=True)
 
         if user_id:
-            cursor.execute("""
-                SELECT chat_id, message, response, source, created_at
-                FROM chat_history
-                WHERE user_id = %s
-                ORDER BY created_at DESC
-                LIMIT %s
-            """, (user_id, limit))
+            cursor.execute(CHAT_HISTORY_SQL.format(where="WHERE user_id = %s"), (user_id, limit))
         else:
-            cursor.execute("""
-                SELECT chat_id, message, response, source, created_at
-                FROM chat_history
-                ORDER BY created_at DESC
-                LIMIT %s
-            """, (limit,))
+            cursor.execute(CHAT_HISTORY_SQL.format(where=""), (limit,))
 
         history = cursor.fetchall()
         cursor.close()
@@ -362,47 +569,36 @@ def get_chat_history():
         return jsonify({"error": str(e)}), 400
 
 @chat_bp.route("/knowledge/flagged", methods=["GET"])
+@require_permission("knowledge.review")
 def get_flagged_knowledge():
     try:
+        limit, page_cursor = page_args(request.args)
+        after = ""
+        params = []
+        if page_cursor:
+            condition, params = FLAGGED_ORDER.after(page_cursor)
+            after = "AND " + condition
+
         conn = get_db_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
         cursor = conn.cursor(dictionary=True)
 
-        cursor.execute("""
-            SELECT 
-                cr.rating_id,
-                cr.chat_id,
-                cr.rating,
-                cr.feedback,
-                cr.review_status,
-                cr.created_at,
-                ch.message as question,
-                ch.response as answer,
-                kb.kb_id,
-                kb.question as kb_question,
-                kb.created_by,
-                u.name as author_name
-            FROM chat_ratings cr
-            JOIN chat_history ch ON cr.chat_id = ch.chat_id
-            LEFT JOIN knowledge_base kb ON ch.kb_id = kb.kb_id
-            LEFT JOIN users u ON kb.created_by = u.user_id
-            WHERE cr.is_flagged = TRUE AND cr.review_status = 'pending'
-            ORDER BY cr.created_at DESC
-        """)
+        cursor.execute(FLAGGED_SQL.format(after=after), (*params, limit + 1))
 
-        flagged = cursor.fetchall()
+        flagged, next_cursor = FLAGGED_ORDER.paginate(cursor.fetchall(), limit)
         cursor.close()
         conn.close()
 
-        return jsonify(flagged), 200
+        return set_next_cursor(jsonify(flagged), next_cursor), 200
 
     except Exception as e:
         print(f"Flagged knowledge error: {e}")
         return jsonify({"error": str(e)}), 400
 
 @chat_bp.route("/knowledge/review/<int:rating_id>", methods=["POST"])
+@require_permission("knowledge.review")
 def review_flagged_knowledge(rating_id):
     # manager reviews flagged content
     try:
@@ -466,6 +662,9 @@ def review_flagged_knowledge(rating_id):
         cursor.close()
         conn.close()
 
+        if action == "remove" and rating_data["kb_id"]:
+            knowledge_index.remove(rating_data["kb_id"])
+
         return jsonify({
             "message": f"Knowledge {'removed' if action == 'remove' else 'kept'} successfully"
         }), 200
@@ -475,6 +674,7 @@ def review_flagged_knowledge(rating_id):
         return jsonify({"error": str(e)}), 400
 
 @chat_bp.route("/knowledge/pending", methods=["GET"])
+@require_permission("knowledge.review")
 def get_pending_knowledge():
     try:
         conn = get_db_connection()
@@ -509,6 +709,7 @@ def get_pending_knowledge():
         return jsonify({"error": str(e)}), 400
 
 @chat_bp.route("/knowledge/approve/<int:kb_id>", methods=["POST"])
+@require_permission("knowledge.review")
 def approve_knowledge(kb_id):
     try:
         conn = get_db_connection()
@@ -527,6 +728,8 @@ def approve_knowledge(kb_id):
         cursor.close()
         conn.close()
 
+        knowledge_index.refresh(kb_id)
+
         return jsonify({"message": "Knowledge approved successfully"}), 200
 
     except Exception as e:
@@ -534,6 +737,7 @@ def approve_knowledge(kb_id):
         return jsonify({"error": str(e)}), 400
 
 @chat_bp.route("/knowledge/reject/<int:kb_id>", methods=["POST"])
+@require_permission("knowledge.review")
 def reject_knowledge(kb_id):
     try:
         conn = get_db_connection()
@@ -553,6 +757,8 @@ def reject_knowledge(kb_id):
         cursor.close()
         conn.close()
 
+        knowledge_index.remove(kb_id)
+
         return jsonify({"message": "Knowledge rejected"}), 200
 
     except Exception as e:
@@ -1,13 +1,24 @@
 # backend_modular/routes/chef.py - COMPLETE VERSION
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, make_response
 from db import get_db_connection
+from models.kitchen_queue import KitchenQueue
+from models.revenue_rollup import RevenueRollup
+from models.staff_stats import StaffStats
+from models.wallet import Wallet
+from utils.permissions import require_permission
 
 chef_bp = Blueprint('chef', __name__)
 
 
 @chef_bp.route('/orders', methods=['GET'])
+@require_permission("orders.prepare")
 def get_chef_orders():
-    """Get orders for chef dashboard"""
+    """
+    Get orders for chef dashboard
+
+    Responds with an ETag; clients that send it back in If-None-Match get
+    304 Not Modified while the queue is unchanged.
+    """
     try:
         conn = get_db_connection()
         if not conn:
@@ -16,39 +27,29 @@ def get_chef_orders():
         cursor = conn.cursor(dictionary=True)
 
         # Show pending and preparing orders
-        query = """
-        SELECT o.order_id,
-               o.customer_id,
-               o.delivery_status,
-               o.total_price,
-               o.created_at,
-               o.delivered_to,
-               u.name AS customer_name
-        FROM orders o
-        JOIN users u ON o.customer_id = u.user_id
-        WHERE o.delivery_status IN ('Pending', 'Preparing', 'Confirmed')
-        ORDER BY o.created_at ASC
-        """
-        cursor.execute(query)
-        orders = cursor.fetchall()
-
-        # Attach items to each order
-        for order in orders:
-            cursor.execute("""
-                SELECT oi.quantity,
-                       m.name
-                FROM order_items oi
-                JOIN menu_items m ON oi.item_id = m.item_id
-                WHERE oi.order_id = %s
-            """, (order['order_id'],))
-
-            items = cursor.fetchall()
-            order['items'] = items
+        orders = KitchenQueue.load_headers(cursor)
+        version = KitchenQueue.version(orders)
+
+        # Queue unchanged since the tablet's last poll, skip the items query
+        if request.if_none_match.contains(version):
+            cursor.close()
+            conn.close()
+            response = make_response('', 304)
+            response.set_etag(version)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+
+        # Attach items to every order with one query
+        KitchenQueue.attach_items(cursor, orders)
 
         cursor.close()
         conn.close()
 
-        return jsonify(orders), 200
+        response = jsonify(orders)
+        response.set_etag(version)
+        # Let browsers keep the body but always revalidate with the ETag
+        response.headers['Cache-Control'] = 'no-cache'
+        return response, 200
 
     except Exception as e:
         print(f"Get chef orders error: {e}")
@@ -56,6 +57,7 @@ def get_chef_orders():
 
 
 @chef_bp.route('/orders/<int:order_id>/accept', methods=['POST'])
+@require_permission("orders.prepare")
 def accept_order(order_id):
     """Chef accepts order and assigns themselves"""
     try:
@@ -91,6 +93,7 @@ def accept_order(order_id):
 
 
 @chef_bp.route('/orders/<int:order_id>/complete', methods=['POST'])
+@require_permission("orders.prepare")
 def complete_order(order_id):
     """Chef completes order - DOES NOT touch delivered_by"""
     try:
@@ -99,6 +102,9 @@ def complete_order(order_id):
             return jsonify({"error": "Database connection failed"}), 500
 
         cursor = conn.cursor()
+
+        # Count the dish for the chef (before the status changes)
+        StaffStats.order_completed(cursor, order_id)
         
         # Only change status, leave delivered_by as NULL for bidding
         cursor.execute(
@@ -118,6 +124,7 @@ def complete_order(order_id):
 
 
 @chef_bp.route('/orders/<int:order_id>/reject', methods=['POST'])
+@require_permission("orders.prepare")
 def reject_order(order_id):
     """Chef rejects order and refunds customer"""
     try:
@@ -127,6 +134,10 @@ def reject_order(order_id):
 
         cursor = conn.cursor()
 
+        # Book the refund in the revenue rollups (before the status changes)
+        RevenueRollup.record_cancellation(cursor, order_id)
+        StaffStats.order_cancelled(cursor, order_id)
+
         # Mark as cancelled
         cursor.execute(
             "UPDATE orders SET delivery_status = 'Cancelled' WHERE order_id = %s",
@@ -134,12 +145,10 @@ def reject_order(order_id):
         )
 
         # Refund customer
-        cursor.execute("""
-            UPDATE users u
-            JOIN orders o ON u.user_id = o.customer_id
-            SET u.total_balance = u.total_balance + o.total_price
-            WHERE o.order_id = %s
-        """, (order_id,))
+        cursor.execute("SELECT customer_id, total_price FROM orders WHERE order_id = %s", (order_id,))
+        order = cursor.fetchone()
+        if order and order[1]:
+            Wallet.credit(cursor, order[0], order[1], 'refund', order_id)
 
         conn.commit()
         cursor.close()
@@ -154,72 +163,28 @@ def reject_order(order_id):
 
 @chef_bp.route('/profile/<int:chef_id>', methods=['GET'])
 def get_chef_profile(chef_id):
-    """Get chef profile stats"""
+    """Get chef profile stats (from the staff_stats rollup)"""
     try:
         conn = get_db_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
         cursor = conn.cursor(dictionary=True)
-        
-        # Get chef info
-        cursor.execute("""
-            SELECT name, salary, amount_warnings
-            FROM users
-            WHERE user_id = %s
-        """, (chef_id,))
-        
-        chef = cursor.fetchone()
-        if not chef:
-            cursor.close()
-            conn.close()
-            return jsonify({"error": "Chef not found"}), 404
-        
-        # Get total dishes prepared
-        cursor.execute("""
-            SELECT COUNT(*) as dishes_prepared
-            FROM orders
-            WHERE prepared_by = %s AND delivery_status IN ('Ready for Delivery', 'Out for Delivery', 'Delivered')
-        """, (chef_id,))
-        dishes_row = cursor.fetchone()
-        
-        # Get complaints count
-        cursor.execute("""
-            SELECT COUNT(*) as complaints
-            FROM feedback
-            WHERE feedback_for = %s AND feedback_type = 'complaint'
-        """, (chef_id,))
-        complaints_row = cursor.fetchone()
-        
-        # Get compliments count
-        cursor.execute("""
-            SELECT COUNT(*) as compliments
-            FROM feedback
-            WHERE feedback_for = %s AND feedback_type = 'compliment'
-        """, (chef_id,))
-        compliments_row = cursor.fetchone()
-        
-        # Get average rating from reviews
-        cursor.execute("""
-            SELECT AVG(r.amount_stars) as avg_rating
-            FROM reviews r
-            JOIN order_items oi ON r.item_reviewed = oi.item_id
-            JOIN orders o ON oi.order_id = o.order_id
-            WHERE o.prepared_by = %s AND r.amount_stars > 0
-        """, (chef_id,))
-        rating_row = cursor.fetchone()
-        
+        chef = StaffStats.for_user(cursor, chef_id)
         cursor.close()
         conn.close()
+
+        if not chef:
+            return jsonify({"error": "Chef not found"}), 404
         
         return jsonify({
             "name": chef['name'],
             "salary": float(chef['salary']),
             "warnings": chef['amount_warnings'],
-            "dishes_prepared": dishes_row['dishes_prepared'] if dishes_row else 0,
-            "complaints": complaints_row['complaints'] if complaints_row else 0,
-            "compliments": compliments_row['compliments'] if compliments_row else 0,
-            "avg_rating": round(float(rating_row['avg_rating'] or 0), 1) if rating_row else 0
+            "dishes_prepared": chef['dishes_prepared'],
+            "complaints": chef['complaints'],
+            "compliments": chef['compliments'],
+            "avg_rating": chef['avg_rating']
         }), 200
 
     except Exception as e:
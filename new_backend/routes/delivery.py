@@ -1,8 +1,27 @@
 from flask import Blueprint, request, jsonify
 from db import get_db_connection
+from models.bid_book import bid_book
+from models.dashboard_counters import dashboard_counters
+from models.staff_stats import StaffStats
+from utils.permissions import require_permission
 
 delivery_bp = Blueprint("delivery", __name__)
 
+# Orders waiting for a driver, oldest first
+AVAILABLE_ORDERS_SQL = """
+    SELECT
+        o.order_id,
+        o.delivered_to,
+        o.total_price,
+        o.delivery_status,
+        u.name AS customer_name
+    FROM orders o
+    JOIN users u ON o.customer_id = u.user_id
+    WHERE o.delivery_status = 'Ready for Delivery'
+      AND o.delivered_by IS NULL
+    ORDER BY o.created_at ASC
+"""
+
 @delivery_bp.route("/profile/<int:driver_id>", methods=["GET"])
 def get_driver_profile(driver_id):
     # get delivery driver info for profile page
@@ -13,65 +32,22 @@ def get_driver_profile(driver_id):
 
         cursor = conn.cursor(dictionary=True)
 
-        # get driver info from users table
-        cursor.execute(
-            """
-            SELECT name, salary, amount_warnings
-            FROM users
-            WHERE user_id = %s AND role IN ('driver', 'delivery')
-            """,
-            (driver_id,),
-        )
-        user_row = cursor.fetchone()
-        if not user_row:
-            cursor.close()
-            conn.close()
-            return jsonify({"error": "Driver not found"}), 404
-
-        # count how many deliveries this driver completed
-        cursor.execute(
-            """
-            SELECT COUNT(*) AS total_deliveries
-            FROM orders
-            WHERE delivered_by = %s AND delivery_status = 'Delivered'
-            """,
-            (driver_id,),
-        )
-        deliveries_row = cursor.fetchone() or {"total_deliveries": 0}
-
-        # count complaints from feedback table
-        cursor.execute(
-            """
-            SELECT COUNT(*) AS complaints
-            FROM feedback
-            WHERE feedback_for = %s AND feedback_type = 'complaint'
-            """,
-            (driver_id,),
-        )
-        complaints_row = cursor.fetchone() or {"complaints": 0}
-
-        # count compliments from feedback table
-        cursor.execute(
-            """
-            SELECT COUNT(*) AS compliments
-            FROM feedback
-            WHERE feedback_for = %s AND feedback_type = 'compliment'
-            """,
-            (driver_id,),
-        )
-        compliments_row = cursor.fetchone() or {"compliments": 0}
-
+        # driver info and totals from the staff_stats rollup
+        driver = StaffStats.for_user(cursor, driver_id, roles=('driver', 'delivery'))
         cursor.close()
         conn.close()
 
+        if not driver:
+            return jsonify({"error": "Driver not found"}), 404
+
         return jsonify(
             {
-                "name": user_row["name"],
-                "salary": float(user_row["salary"]),
-                "warnings": user_row["amount_warnings"],
-                "total_deliveries": deliveries_row["total_deliveries"],
-                "complaints": complaints_row["complaints"],
-                "compliments": compliments_row["compliments"],
+                "name": driver["name"],
+                "salary": float(driver["salary"]),
+                "warnings": driver["amount_warnings"],
+                "total_deliveries": driver["deliveries"],
+                "complaints": driver["complaints"],
+                "compliments": driver["compliments"],
             }
         ), 200
 
@@ -80,6 +56,7 @@ def get_driver_profile(driver_id):
         return jsonify({"error": str(e)}), 400
 
 @delivery_bp.route("/orders/available", methods=["GET"])
+@require_permission("orders.deliver")
 def get_available_orders():
     # get orders that are ready for delivery and not assigned yet drivers should bid on these
     try:
@@ -90,50 +67,19 @@ def get_available_orders():
         cursor = conn.cursor(dictionary=True)
 
         # find orders  with no driver assigned
-        cursor.execute(
-            """
-            SELECT
-                o.order_id,
-                o.delivered_to,
-                o.total_price,
-                o.delivery_status,
-                u.name AS customer_name
-            FROM orders o
-            JOIN users u ON o.customer_id = u.user_id
-            WHERE o.delivery_status = 'Ready for Delivery'
-              AND o.delivered_by IS NULL
-            ORDER BY o.created_at ASC
-            """
-        )
+        cursor.execute(AVAILABLE_ORDERS_SQL)
         orders = cursor.fetchall() or []
 
-        # get all bids for each order
+        cursor.close()
+        conn.close()
+
+        # bids come from the in-memory bid book, no query per order
+        bids_by_order = bid_book.bids_for([order["order_id"] for order in orders])
         for order in orders:
-            cursor.execute(
-                """
-                SELECT
-                    b.bid_id,
-                    b.driver_id,
-                    b.bid_amount,
-                    b.bid_status,
-                    u.name AS driver_name
-                FROM delivery_bids b
-                JOIN users u ON b.driver_id = u.user_id
-                WHERE b.order_id = %s
-                ORDER BY b.bid_amount ASC, b.created_at ASC
-                """,
-                (order["order_id"],),
-            )
-            bids = cursor.fetchall() or []
+            order["bids"] = bids_by_order[order["order_id"]]
             # convert prices to float so they complatible with JSON
-            for bid in bids:
-                bid["bid_amount"] = float(bid["bid_amount"])
-            order["bids"] = bids
             order["total_price"] = float(order["total_price"])
 
-        cursor.close()
-        conn.close()
-
         return jsonify(orders), 200
 
     except Exception as e:
@@ -141,6 +87,7 @@ def get_available_orders():
         return jsonify({"error": str(e)}), 400
 
 @delivery_bp.route("/orders/assigned", methods=["GET"])
+@require_permission("orders.deliver")
 def get_assigned_orders():
     # get orders that are assigned to a specific driver
     try:
@@ -185,6 +132,7 @@ def get_assigned_orders():
         return jsonify({"error": str(e)}), 400
 
 @delivery_bp.route("/orders/<int:order_id>/bid", methods=["POST"])
+@require_permission("orders.deliver")
 def place_bid(order_id):
     # driver places a bid on an order
     try:
@@ -199,7 +147,7 @@ def place_bid(order_id):
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
-        cursor = conn.cursor()
+        cursor = conn.cursor(dictionary=True)
 
         # insert bid or update if driver already bid on this order
         cursor.execute(
@@ -207,13 +155,38 @@ def place_bid(order_id):
             INSERT INTO delivery_bids (order_id, driver_id, bid_amount, bid_status)
             VALUES (%s, %s, %s, 'pending')
             ON DUPLICATE KEY UPDATE
+                bid_id = LAST_INSERT_ID(bid_id),
                 bid_amount = VALUES(bid_amount),
                 bid_status = 'pending'
             """,
             (order_id, driver_id, bid_amount),
         )
+        bid_id = cursor.lastrowid
 
         conn.commit()
+        dashboard_counters.bid_pending(order_id, bid_id)
+
+        # keep the bid book current
+        cursor.execute(
+            """
+            SELECT
+                b.bid_id,
+                b.order_id,
+                b.driver_id,
+                b.bid_amount,
+                b.bid_status,
+                b.created_at,
+                u.name AS driver_name
+            FROM delivery_bids b
+            JOIN users u ON b.driver_id = u.user_id
+            WHERE b.bid_id = %s
+            """,
+            (bid_id,),
+        )
+        bid_row = cursor.fetchone()
+        if bid_row:
+            bid_book.upsert(bid_row)
+
         cursor.close()
         conn.close()
 
@@ -224,6 +197,7 @@ def place_bid(order_id):
         return jsonify({"error": str(e)}), 400
 
 @delivery_bp.route("/orders/<int:order_id>/pickup", methods=["POST"])
+@require_permission("orders.deliver")
 def pickup_order(order_id):
     # driver picks up the order from restaurant
     try:
@@ -259,6 +233,9 @@ def pickup_order(order_id):
         cursor.close()
         conn.close()
 
+        # order is off the bidding board now
+        bid_book.drop_order(order_id)
+
         return jsonify({"message": "Order picked up"}), 200
 
     except Exception as e:
@@ -266,6 +243,7 @@ def pickup_order(order_id):
         return jsonify({"error": str(e)}), 400
 
 @delivery_bp.route("/orders/<int:order_id>/deliver", methods=["POST"])
+@require_permission("orders.deliver")
 def deliver_order(order_id):
     # mark order as delivered
     try:
@@ -275,6 +253,9 @@ def deliver_order(order_id):
 
         cursor = conn.cursor()
 
+        # count the delivery for the driver (before the status changes)
+        StaffStats.order_delivered(cursor, order_id)
+
         # change status to delivered
         cursor.execute(
             """
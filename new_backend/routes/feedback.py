@@ -1,8 +1,53 @@
 from flask import Blueprint, request, jsonify
 from db import get_db_connection
+from models.dashboard_counters import dashboard_counters
+from models.staff_stats import StaffStats
+from utils.pagination import Keyset, page_args, set_next_cursor
 
 feedback_bp = Blueprint("feedback", __name__)
 
+# newest first; the lists are paged with ?limit= and ?cursor= (next cursor in X-Next-Cursor)
+FEEDBACK_ORDER = Keyset(("f.created_at", "created_at", "desc"), ("f.feedback_id", "feedback_id", "desc"))
+
+# Feedback pages; {after} takes the keyset condition ("AND ...") or ""
+FEEDBACK_SENT_SQL = f"""
+    SELECT
+        f.feedback_id,
+        f.feedback_type,
+        f.complaint_status,
+        f.message,
+        f.related_order,
+        f.feedback_for,
+        f.created_at,
+        u.role AS target_role,
+        u.name AS target_name,
+        DATE(f.created_at) AS created_date
+    FROM feedback f
+    JOIN users u ON f.feedback_for = u.user_id
+    WHERE f.feedback_from = %s
+    {{after}}
+    ORDER BY {FEEDBACK_ORDER.order_by()}
+    LIMIT %s
+"""
+
+FEEDBACK_RECEIVED_SQL = f"""
+    SELECT
+        f.feedback_id,
+        f.feedback_type,
+        f.complaint_status,
+        f.message,
+        f.related_order,
+        f.created_at,
+        u.name AS from_name,
+        DATE(f.created_at) AS created_date
+    FROM feedback f
+    JOIN users u ON f.feedback_from = u.user_id
+    WHERE f.feedback_for = %s
+    {{after}}
+    ORDER BY {FEEDBACK_ORDER.order_by()}
+    LIMIT %s
+"""
+
 @feedback_bp.route("/submit", methods=["POST"])
 def submit_feedback():
     # submit feedback for chef, delivery person, or customer
@@ -120,10 +165,17 @@ def submit_feedback():
         )
 
         feedback_id = cursor.lastrowid
+
+        # keep the chef/driver totals current
+        if target_type in ("chef", "delivery"):
+            StaffStats.feedback_added(cursor, resolved_target_id, feedback_type)
+
         conn.commit()
         cursor.close()
         conn.close()
 
+        dashboard_counters.feedback_added(feedback_type, complaint_status)
+
         return jsonify(
             {
                 "message": "Feedback submitted successfully",
@@ -139,8 +191,17 @@ def submit_feedback():
 
 @feedback_bp.route("/sent/<int:user_id>", methods=["GET"])
 def get_sent_feedback(user_id):
-    # get all feedback that this user has submitted to others
+    # get feedback that this user has submitted to others, one page at a time
     try:
+        limit, page_cursor = page_args(request.args)
+        after = ""
+        params = [user_id]
+        if page_cursor:
+            condition, values = FEEDBACK_ORDER.after(page_cursor)
+            after = "AND " + condition
+            params.extend(values)
+        params.append(limit + 1)
+
         conn = get_db_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
@@ -148,24 +209,8 @@ def get_sent_feedback(user_id):
         cursor = conn.cursor(dictionary=True)
 
         # get feedback sent by this user with target person's info
-        query = """
-            SELECT
-                f.feedback_id,
-                f.feedback_type,
-                f.complaint_status,
-                f.message,
-                f.related_order,
-                f.feedback_for,
-                u.role AS target_role,
-                u.name AS target_name,
-                DATE(f.created_at) AS created_date
-            FROM feedback f
-            JOIN users u ON f.feedback_for = u.user_id
-            WHERE f.feedback_from = %s
-            ORDER BY f.created_at DESC
-        """
-        cursor.execute(query, (user_id,))
-        rows = cursor.fetchall() or []
+        cursor.execute(FEEDBACK_SENT_SQL.format(after=after), tuple(params))
+        rows, next_cursor = FEEDBACK_ORDER.paginate(cursor.fetchall() or [], limit)
 
         # build result array by looping through each feedback
         result = []
@@ -187,7 +232,7 @@ def get_sent_feedback(user_id):
         cursor.close()
         conn.close()
 
-        return jsonify(result), 200
+        return set_next_cursor(jsonify(result), next_cursor), 200
 
     except Exception as e:
         print("Sent feedback error:", e)
@@ -195,8 +240,17 @@ def get_sent_feedback(user_id):
 
 @feedback_bp.route("/received/<int:user_id>", methods=["GET"])
 def get_received_feedback(user_id):
-    # get all feedback that this user has received from others
+    # get feedback that this user has received from others, one page at a time
     try:
+        limit, page_cursor = page_args(request.args)
+        after = ""
+        params = [user_id]
+        if page_cursor:
+            condition, values = FEEDBACK_ORDER.after(page_cursor)
+            after = "AND " + condition
+            params.extend(values)
+        params.append(limit + 1)
+
         conn = get_db_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
@@ -204,22 +258,8 @@ def get_received_feedback(user_id):
         cursor = conn.cursor(dictionary=True)
 
         # get feedback received by this user with sender's info
-        query = """
-            SELECT
-                f.feedback_id,
-                f.feedback_type,
-                f.complaint_status,
-                f.message,
-                f.related_order,
-                u.name AS from_name,
-                DATE(f.created_at) AS created_date
-            FROM feedback f
-            JOIN users u ON f.feedback_from = u.user_id
-            WHERE f.feedback_for = %s
-            ORDER BY f.created_at DESC
-        """
-        cursor.execute(query, (user_id,))
-        rows = cursor.fetchall() or []
+        cursor.execute(FEEDBACK_RECEIVED_SQL.format(after=after), tuple(params))
+        rows, next_cursor = FEEDBACK_ORDER.paginate(cursor.fetchall() or [], limit)
 
         # loop through and format each feedback
         result = []
@@ -238,7 +278,7 @@ def get_received_feedback(user_id):
         cursor.close()
         conn.close()
 
-        return jsonify(result), 200
+        return set_next_cursor(jsonify(result), next_cursor), 200
 
     except Exception as e:
         print("Received feedback error:", e)
@@ -253,6 +293,12 @@ def dispute_feedback(feedback_id):
             return jsonify({"error": "Database connection failed"}), 500
 
         cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT feedback_type, complaint_status FROM feedback WHERE feedback_id = %s",
+            (feedback_id,),
+        )
+        previous = cursor.fetchone()
         
         # change complaint status to under review
         cursor.execute(
@@ -264,6 +310,9 @@ def dispute_feedback(feedback_id):
         cursor.close()
         conn.close()
 
+        if previous:
+            dashboard_counters.feedback_status_changed(previous[0], previous[1], 'Under Review')
+
         return jsonify({"message": "Dispute submitted"}), 200
 
     except Exception as e:
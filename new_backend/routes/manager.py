@@ -540,128 +540,129 @@
 # backend_modular/routes/manager.py - COMPLETE WITH VIP & BIDDING
 from flask import Blueprint, request, jsonify
 from db import get_db_connection
+from models.bid_book import bid_book
+from models.dashboard_counters import dashboard_counters
+from models.revenue_rollup import RevenueRollup
+from models.staff_stats import StaffStats
+from models.wallet import BALANCE_SQL
+from utils.pagination import Keyset, page_args, set_next_cursor
+from utils.streaming import stream_format, stream_query
+from utils.tokens import revocations
+from utils.permissions import require_permission
+from datetime import datetime, timedelta
 
 manager_bp = Blueprint("manager", __name__)
 
+# Sort orders of the paged manager lists (?limit=, ?cursor= / X-Next-Cursor)
+FEEDBACK_ORDER = Keyset(("f.created_at", "created_at", "desc"), ("f.feedback_id", "feedback_id", "desc"))
+EMPLOYEE_ORDER = Keyset(("u.role", "role", "asc"), ("u.name", "name", "asc"), ("u.user_id", "user_id", "asc"))
+CUSTOMER_ORDER = Keyset(("u.amount_warnings", "amount_warnings", "desc"), ("u.name", "name", "asc"), ("u.user_id", "user_id", "asc"))
+
+# All feedback, newest first; {where} is "WHERE <keyset condition>" or ""
+MANAGER_FEEDBACK_SQL = f"""
+    SELECT 
+        f.feedback_id,
+        f.feedback_type,
+        f.feedback_from,
+        f.feedback_for,
+        f.message,
+        f.complaint_status,
+        f.created_at,
+        u1.name AS from_name,
+        u2.name AS to_name,
+        u2.role AS target_role
+    FROM feedback f
+    JOIN users u1 ON f.feedback_from = u1.user_id
+    JOIN users u2 ON f.feedback_for = u2.user_id
+    {{where}}
+    ORDER BY {FEEDBACK_ORDER.order_by()}
+"""
+
 
 @manager_bp.route("/stats", methods=["GET"])
+@require_permission("manager.dashboard")
 def get_manager_stats():
-    """High-level stats for manager dashboard"""
-    conn = None
+    """High-level stats for manager dashboard (served from in-memory counters)"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({"error": "Database connection failed"}), 500
+        return jsonify(dashboard_counters.snapshot()), 200
 
-        cursor = conn.cursor(dictionary=True)
+    except Exception as e:
+        print("Manager /stats error:", e)
+        return jsonify({"error": str(e)}), 400
 
-        # Orders + revenue
-        cursor.execute("""
-            SELECT 
-                COUNT(*) AS total_orders,
-                COALESCE(SUM(total_price), 0) AS total_revenue
-            FROM orders
-        """)
-        order_row = cursor.fetchone() or {}
-        total_orders = order_row.get("total_orders", 0) or 0
-        total_revenue = float(order_row.get("total_revenue", 0) or 0)
 
-        # Total users
-        cursor.execute("SELECT COUNT(*) AS total_users FROM users")
-        user_row = cursor.fetchone() or {}
-        total_users = user_row.get("total_users", 0) or 0
+@manager_bp.route("/revenue/timeseries", methods=["GET"])
+@require_permission("manager.dashboard")
+def get_revenue_timeseries():
+    """
+    Orders and revenue per hour/day/week/month (from the rollup tables)
 
-        # Employees count (chefs + drivers)
-        cursor.execute("""
-            SELECT COUNT(*) AS employee_count
-            FROM users
-            WHERE role IN ('chef', 'driver', 'delivery')
-        """)
-        emp_row = cursor.fetchone() or {}
-        employee_count = emp_row.get("employee_count", 0) or 0
+    Query params:
+        bucket: hour, day (default), week or month
+        start: ISO date/datetime, inclusive (default: 48 hours / 30 days before end)
+        end: ISO date/datetime, exclusive (default: now)
+    """
+    try:
+        bucket = request.args.get("bucket", "day")
 
-        # Pending feedback (only unresolved complaints)
-        cursor.execute("""
-            SELECT COUNT(*) AS pending_feedback
-            FROM feedback
-            WHERE feedback_type = 'complaint' 
-            AND complaint_status IN ('Open', 'Pending', 'Under Review')
-        """)
-        fb_row = cursor.fetchone() or {}
-        pending_feedback = fb_row.get("pending_feedback", 0) or 0
+        end_arg = request.args.get("end")
+        end = datetime.fromisoformat(end_arg) if end_arg else datetime.now()
 
-        # Pending bids
-        cursor.execute("""
-            SELECT COUNT(DISTINCT order_id) AS pending_bids
-            FROM delivery_bids
-            WHERE bid_status = 'pending'
-        """)
-        bid_row = cursor.fetchone() or {}
-        pending_bids = bid_row.get("pending_bids", 0) or 0
+        start_arg = request.args.get("start")
+        if start_arg:
+            start = datetime.fromisoformat(start_arg)
+        else:
+            start = end - (timedelta(hours=48) if bucket == "hour" else timedelta(days=30))
 
-        # VIP requests
-        cursor.execute("""
-            SELECT COUNT(*) AS vip_requests
-            FROM vip_requests
-            WHERE request_status = 'pending'
-        """)
-        vip_row = cursor.fetchone() or {}
-        vip_requests = vip_row.get("vip_requests", 0) or 0
-
-        cursor.close()
-        conn.close()
+        points = RevenueRollup.timeseries(start, end, bucket)
 
         return jsonify({
-            "total_orders": total_orders,
-            "total_revenue": total_revenue,
-            "total_users": total_users,
-            "employee_count": employee_count,
-            "pending_feedback": pending_feedback,
-            "pending_bids": pending_bids,
-            "vip_requests": vip_requests,
+            "bucket": bucket,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "points": points,
         }), 200
 
     except Exception as e:
-        if conn:
-            conn.close()
-        print("Manager /stats error:", e)
+        print("Manager /revenue/timeseries error:", e)
         return jsonify({"error": str(e)}), 400
 
 
 @manager_bp.route("/feedback", methods=["GET"])
+@require_permission("manager.dashboard")
 def get_manager_feedback():
-    """Get feedback items for manager review"""
+    """
+    Get feedback items for manager review, newest first (paged)
+
+    ?stream=1 or ?format=ndjson streams every item after the cursor
+    instead of returning one page.
+    """
     conn = None
     try:
+        limit, page_cursor = page_args(request.args)
+        fmt = stream_format(request.args)
+        where = ""
+        params = []
+        if page_cursor:
+            where, params = FEEDBACK_ORDER.after(page_cursor)
+            where = "WHERE " + where
+
         conn = get_db_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
-        cursor = conn.cursor(dictionary=True)
+        query = MANAGER_FEEDBACK_SQL.format(where=where)
+        if fmt:
+            return stream_query(conn, query, params, fmt)
 
-        cursor.execute("""
-            SELECT 
-                f.feedback_id,
-                f.feedback_type,
-                f.feedback_from,
-                f.feedback_for,
-                f.message,
-                f.complaint_status,
-                f.created_at,
-                u1.name AS from_name,
-                u2.name AS to_name,
-                u2.role AS target_role
-            FROM feedback f
-            JOIN users u1 ON f.feedback_from = u1.user_id
-            JOIN users u2 ON f.feedback_for = u2.user_id
-            ORDER BY f.created_at DESC
-        """)
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(query + " LIMIT %s", (*params, limit + 1))
 
-        feedbacks = cursor.fetchall() or []
+        feedbacks, next_cursor = FEEDBACK_ORDER.paginate(cursor.fetchall() or [], limit)
         cursor.close()
         conn.close()
 
-        return jsonify(feedbacks), 200
+        return set_next_cursor(jsonify(feedbacks), next_cursor), 200
 
     except Exception as e:
         if conn:
@@ -671,24 +672,38 @@ def get_manager_feedback():
 
 
 @manager_bp.route("/employees", methods=["GET"])
+@require_permission("manager.dashboard")
 def get_employees():
-    """Get all chefs and delivery people"""
+    """Get chefs and delivery people with their performance totals (paged)"""
     conn = None
     try:
+        limit, page_cursor = page_args(request.args)
+        where = ""
+        params = []
+        if page_cursor:
+            where, params = EMPLOYEE_ORDER.after(page_cursor)
+            where = "AND " + where
+
         conn = get_db_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
         cursor = conn.cursor(dictionary=True)
         
-        cursor.execute("""
-            SELECT user_id, name, email, role, salary, amount_warnings
-            FROM users
-            WHERE role IN ('chef', 'driver', 'delivery')
-            ORDER BY role, name
-        """)
+        cursor.execute(f"""
+            SELECT u.user_id, u.name, u.email, u.role, u.salary, u.amount_warnings,
+                   s.dishes_prepared, s.deliveries, s.complaints, s.compliments,
+                   s.rating_sum, s.rating_count
+            FROM users u
+            LEFT JOIN staff_stats s ON s.user_id = u.user_id
+            WHERE u.role IN ('chef', 'driver', 'delivery')
+            {where}
+            ORDER BY {EMPLOYEE_ORDER.order_by()}
+            LIMIT %s
+        """, (*params, limit + 1))
         
-        employees = cursor.fetchall() or []
+        employees, next_cursor = EMPLOYEE_ORDER.paginate(cursor.fetchall() or [], limit)
+        StaffStats.attach(employees)
         
         # Convert salary to float
         for emp in employees:
@@ -697,7 +712,7 @@ def get_employees():
         cursor.close()
         conn.close()
         
-        return jsonify(employees), 200
+        return set_next_cursor(jsonify(employees), next_cursor), 200
 
     except Exception as e:
         if conn:
@@ -707,24 +722,36 @@ def get_employees():
 
 
 @manager_bp.route("/customers", methods=["GET"])
+@require_permission("manager.dashboard")
 def get_customers():
-    """Get all customers"""
+    """Get customers, most warnings first (paged)"""
     conn = None
     try:
+        limit, page_cursor = page_args(request.args)
+        where = ""
+        params = []
+        if page_cursor:
+            where, params = CUSTOMER_ORDER.after(page_cursor)
+            where = "AND " + where
+
         conn = get_db_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
         cursor = conn.cursor(dictionary=True)
         
-        cursor.execute("""
-            SELECT user_id, name, email, total_balance, amount_warnings, vip_status
-            FROM users
-            WHERE role = 'customer'
-            ORDER BY amount_warnings DESC, name
-        """)
+        cursor.execute(f"""
+            SELECT u.user_id, u.name, u.email, {BALANCE_SQL} AS total_balance,
+                   u.amount_warnings, u.vip_status
+            FROM users u
+            LEFT JOIN wallet_snapshots s ON s.user_id = u.user_id
+            WHERE u.role = 'customer'
+            {where}
+            ORDER BY {CUSTOMER_ORDER.order_by()}
+            LIMIT %s
+        """, (*params, limit + 1))
         
-        customers = cursor.fetchall() or []
+        customers, next_cursor = CUSTOMER_ORDER.paginate(cursor.fetchall() or [], limit)
         
         # Convert to float
         for cust in customers:
@@ -733,7 +760,7 @@ def get_customers():
         cursor.close()
         conn.close()
         
-        return jsonify(customers), 200
+        return set_next_cursor(jsonify(customers), next_cursor), 200
 
     except Exception as e:
         if conn:
@@ -743,6 +770,7 @@ def get_customers():
 
 
 @manager_bp.route("/feedback/<int:feedback_id>/approve", methods=["POST"])
+@require_permission("feedback.resolve")
 def approve_feedback(feedback_id):
     """Manager approves feedback (if complaint, add warning)"""
     conn = None
@@ -753,6 +781,12 @@ def approve_feedback(feedback_id):
 
         cursor = conn.cursor()
 
+        cursor.execute(
+            "SELECT feedback_type, complaint_status FROM feedback WHERE feedback_id = %s",
+            (feedback_id,),
+        )
+        previous = cursor.fetchone()
+
         # Mark complaint as resolved
         cursor.execute("""
             UPDATE feedback 
@@ -772,6 +806,9 @@ def approve_feedback(feedback_id):
         cursor.close()
         conn.close()
 
+        if previous:
+            dashboard_counters.feedback_status_changed(previous[0], previous[1], 'Resolved')
+
         return jsonify({"message": "Feedback approved"}), 200
 
     except Exception as e:
@@ -783,6 +820,7 @@ def approve_feedback(feedback_id):
 
 
 @manager_bp.route("/feedback/<int:feedback_id>/dismiss", methods=["POST"])
+@require_permission("feedback.resolve")
 def dismiss_feedback(feedback_id):
     """Manager dismisses feedback and warns the reporter"""
     conn = None
@@ -795,6 +833,12 @@ def dismiss_feedback(feedback_id):
             return jsonify({"error": "Database connection failed"}), 500
 
         cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT feedback_type, complaint_status FROM feedback WHERE feedback_id = %s",
+            (feedback_id,),
+        )
+        previous = cursor.fetchone()
         
         # Mark as dismissed
         cursor.execute("""
@@ -814,6 +858,9 @@ def dismiss_feedback(feedback_id):
         conn.commit()
         cursor.close()
         conn.close()
+
+        if previous:
+            dashboard_counters.feedback_status_changed(previous[0], previous[1], 'Dismissed')
         
         return jsonify({"message": "Feedback dismissed, reporter warned"}), 200
 
@@ -826,6 +873,7 @@ def dismiss_feedback(feedback_id):
 
 
 @manager_bp.route("/employees/<int:user_id>/fire", methods=["POST"])
+@require_permission("staff.manage")
 def fire_employee(user_id):
     """Fire an employee"""
     conn = None
@@ -841,6 +889,10 @@ def fire_employee(user_id):
         conn.commit()
         cursor.close()
         conn.close()
+
+        # the delete cascades into orders/feedback/bids, so recount
+        dashboard_counters.invalidate()
+        revocations.revoke(user_id)
         
         return jsonify({"message": "Employee fired"}), 200
 
@@ -853,6 +905,7 @@ def fire_employee(user_id):
 
 
 @manager_bp.route("/employees/<int:user_id>/promote", methods=["POST"])
+@require_permission("staff.manage")
 def promote_employee(user_id):
     """Promote employee (increase salary by 10%)"""
     conn = None
@@ -884,6 +937,7 @@ def promote_employee(user_id):
 
 
 @manager_bp.route("/employees/<int:user_id>/demote", methods=["POST"])
+@require_permission("staff.manage")
 def demote_employee(user_id):
     """Demote employee (decrease salary by 10%)"""
     conn = None
@@ -915,6 +969,7 @@ def demote_employee(user_id):
 
 
 @manager_bp.route("/customers/<int:user_id>/deregister", methods=["POST"])
+@require_permission("customers.manage")
 def deregister_customer(user_id):
     """Deregister customer and add to blacklist"""
     conn = None
@@ -947,6 +1002,10 @@ def deregister_customer(user_id):
         conn.commit()
         cursor.close()
         conn.close()
+
+        # the delete cascades into orders/feedback/bids, so recount
+        dashboard_counters.invalidate()
+        revocations.revoke(user_id)
         
         return jsonify({"message": "Customer deregistered and blacklisted"}), 200
 
@@ -963,6 +1022,7 @@ def deregister_customer(user_id):
 # ============================================
 
 @manager_bp.route("/bids/pending", methods=["GET"])
+@require_permission("manager.dashboard")
 def get_pending_bids():
     """Get all pending delivery bids grouped by order"""
     try:
@@ -1010,6 +1070,7 @@ def get_pending_bids():
 
 
 @manager_bp.route("/bids/<int:bid_id>/approve", methods=["POST"])
+@require_permission("bids.assign")
 def approve_bid(bid_id):
     """Manager approves a bid and assigns driver to order"""
     try:
@@ -1080,6 +1141,10 @@ def approve_bid(bid_id):
         cursor.close()
         conn.close()
 
+        # Order has a driver now, so it leaves the delivery board
+        bid_book.drop_order(bid['order_id'])
+        dashboard_counters.order_bids_closed(bid['order_id'])
+
         return jsonify({"message": "Bid approved and driver assigned"}), 200
 
     except Exception as e:
@@ -1091,6 +1156,7 @@ def approve_bid(bid_id):
 
 
 @manager_bp.route("/bids/<int:bid_id>/reject", methods=["POST"])
+@require_permission("bids.assign")
 def reject_bid(bid_id):
     """Manager rejects a specific bid"""
     try:
@@ -1110,6 +1176,9 @@ def reject_bid(bid_id):
         cursor.close()
         conn.close()
 
+        bid_book.set_status(bid_id, 'rejected')
+        dashboard_counters.bid_closed(bid_id)
+
         return jsonify({"message": "Bid rejected"}), 200
 
     except Exception as e:
@@ -1125,6 +1194,7 @@ def reject_bid(bid_id):
 # ============================================
 
 @manager_bp.route("/vip/requests", methods=["GET"])
+@require_permission("manager.dashboard")
 def get_vip_requests():
     """Get all pending VIP requests"""
     try:
@@ -1134,7 +1204,7 @@ def get_vip_requests():
 
         cursor = conn.cursor(dictionary=True)
 
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT 
                 vr.request_id,
                 vr.customer_id,
@@ -1142,11 +1212,12 @@ def get_vip_requests():
                 vr.request_date,
                 u.name as customer_name,
                 u.email,
-                u.total_balance,
+                {BALANCE_SQL} AS total_balance,
                 u.amount_warnings,
                 (SELECT COUNT(*) FROM orders WHERE customer_id = vr.customer_id) as total_orders
             FROM vip_requests vr
             JOIN users u ON vr.customer_id = u.user_id
+            LEFT JOIN wallet_snapshots s ON s.user_id = u.user_id
             WHERE vr.request_status = 'pending'
             ORDER BY vr.request_date DESC
         """)
@@ -1167,6 +1238,7 @@ def get_vip_requests():
 
 
 @manager_bp.route("/vip/<int:request_id>/approve", methods=["POST"])
+@require_permission("customers.manage")
 def approve_vip(request_id):
     """Manager approves VIP request"""
     try:
@@ -1178,7 +1250,7 @@ def approve_vip(request_id):
 
         # Get customer ID from request
         cursor.execute("""
-            SELECT customer_id FROM vip_requests WHERE request_id = %s
+            SELECT customer_id, request_status FROM vip_requests WHERE request_id = %s
         """, (request_id,))
         
         req = cursor.fetchone()
@@ -1205,6 +1277,8 @@ def approve_vip(request_id):
         cursor.close()
         conn.close()
 
+        dashboard_counters.vip_request_decided(req['request_status'], 'approved')
+
         return jsonify({"message": "VIP request approved"}), 200
 
     except Exception as e:
@@ -1216,6 +1290,7 @@ def approve_vip(request_id):
 
 
 @manager_bp.route("/vip/<int:request_id>/reject", methods=["POST"])
+@require_permission("customers.manage")
 def reject_vip(request_id):
     """Manager rejects VIP request"""
     try:
@@ -1225,6 +1300,12 @@ def reject_vip(request_id):
 
         cursor = conn.cursor()
 
+        cursor.execute(
+            "SELECT request_status FROM vip_requests WHERE request_id = %s",
+            (request_id,),
+        )
+        previous = cursor.fetchone()
+
         cursor.execute("""
             UPDATE vip_requests 
             SET request_status = 'rejected' 
@@ -1235,6 +1316,9 @@ def reject_vip(request_id):
         cursor.close()
         conn.close()
 
+        if previous:
+            dashboard_counters.vip_request_decided(previous[0], 'rejected')
+
         return jsonify({"message": "VIP request rejected"}), 200
 
     except Exception as e:
@@ -1246,6 +1330,7 @@ def reject_vip(request_id):
 
 
 @manager_bp.route("/vip/<int:customer_id>/demote", methods=["POST"])
+@require_permission("customers.manage")
 def demote_vip(customer_id):
     """Manager demotes VIP to regular customer"""
     try:
@@ -1,59 +1,35 @@
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, make_response, current_app
 from db import get_db_connection
+from models.menu_snapshot import menu_snapshot
+from utils.permissions import require_permission
 
 menu_bp = Blueprint('menu', __name__)
 
 
 @menu_bp.route('', methods=['GET'])
 def get_menu():
-    """Get all menu items"""
-    conn = None
-    cursor = None
+    """
+    Get all menu items
+
+    Served from the in-memory menu snapshot. Clients that send the ETag
+    back in If-None-Match get 304 Not Modified while the menu is unchanged.
+    """
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({"error": "Database connection failed"}), 500
-        
-        cursor = conn.cursor(dictionary=True)
-        query = """
-        SELECT m.*, c.category_type 
-        FROM menu_items m
-        JOIN category c ON m.category = c.category_id
-        WHERE m.in_stock = TRUE
-        """
-        cursor.execute(query)
-        items = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        # Convert price from Decimal to float for each item
-        result = []
-        for item in items:
-            item_dict = {}
-            item_dict['item_id'] = item['item_id']
-            item_dict['name'] = item['name']
-            item_dict['description'] = item['description']
-            item_dict['price'] = float(item['price'])
-            item_dict['category'] = item['category']
-            item_dict['category_type'] = item['category_type']
-            item_dict['is_time_limited'] = item['is_time_limited']
-            item_dict['in_stock'] = item['in_stock']
-            item_dict['image_url'] = item['image_url']
-            item_dict['created_by'] = item['created_by']
-            item_dict['updated_by'] = item['updated_by']
-            item_dict['dietary_restrictions'] = item['dietary_restrictions']
-            result.append(item_dict)
-        
-        return jsonify(result), 200
+        body, etag = menu_snapshot.get(current_app.json.dumps)
+
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        else:
+            response = current_app.response_class(body, status=200, mimetype='application/json')
+
+        response.set_etag(etag)
+        # Browsers may keep the body but must revalidate every time
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
         
     except Exception as e:
         print("Error getting menu:", e)
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
         return jsonify({"error": str(e)}), 400
 
 
@@ -110,6 +86,7 @@ def get_menu_item(item_id):
 
 
 @menu_bp.route('', methods=['POST'])
+@require_permission("menu.edit")
 def create_menu_item():
     """Create new menu item"""
     conn = None
@@ -159,6 +136,9 @@ def create_menu_item():
         cursor.close()
         conn.close()
         
+        # Menu changed, next GET /api/menu rebuilds the snapshot
+        menu_snapshot.invalidate()
+        
         response = {
             "message": "Menu item created",
             "item_id": item_id
@@ -177,6 +157,7 @@ def create_menu_item():
 
 
 @menu_bp.route('/<int:item_id>', methods=['PUT'])
+@require_permission("menu.edit")
 def update_menu_item(item_id):
     """Update menu item"""
     conn = None
@@ -239,6 +220,9 @@ def update_menu_item(item_id):
         cursor.close()
         conn.close()
         
+        # Menu changed, next GET /api/menu rebuilds the snapshot
+        menu_snapshot.invalidate()
+        
         return jsonify({"message": "Menu item updated"}), 200
         
     except Exception as e:
@@ -253,6 +237,7 @@ def update_menu_item(item_id):
 
 
 @menu_bp.route('/<int:item_id>', methods=['DELETE'])
+@require_permission("menu.edit")
 def delete_menu_item(item_id):
     """Delete menu item or mark as out of stock"""
     conn = None
@@ -272,6 +257,9 @@ def delete_menu_item(item_id):
         cursor.close()
         conn.close()
         
+        # Menu changed, next GET /api/menu rebuilds the snapshot
+        menu_snapshot.invalidate()
+        
         return jsonify({"message": "Menu item removed from stock"}), 200
         
     except Exception as e:
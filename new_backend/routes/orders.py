@@ -2,77 +2,29 @@
 from flask import Blueprint, request, jsonify
 from db import get_db_connection
 from datetime import datetime, timedelta
-from decimal import Decimal
+from models.order import Order
+from models.wallet import Wallet
+from models.dashboard_counters import dashboard_counters
+from models.revenue_rollup import RevenueRollup
+from models.staff_stats import StaffStats
+from utils.pagination import Keyset, parse_limit, set_next_cursor
+from utils.streaming import stream_format, stream_pages
+from utils.serializers import RowSerializer
+from utils.idempotency import idempotent
+from utils.tokens import token_optional, token_mismatch
 
 orders_bp = Blueprint('orders', __name__)
 
 
-def serialize_order(order):
-    """Convert order to JSON format"""
-    # empty dictionary to store serialized data
-    serialized = {}
-    
-    # Loop through each field in the order dictionary  Example 'order_id', 'total_price', 'delivery_time', 
-    for key in order:
-        # Get the value for field
-        value = order[key]
-        
-        # Check if value is a decimal  need to be converted to regular floats for JSON
-        if isinstance(value, Decimal):
-            # Convert decimal to float
-            serialized[key] = float(value)
-            
-        # Check if value is a timedelta (represents time duration) e.g, delivery_time might be stored as timedelta in database
-        elif isinstance(value, timedelta):
-            # Get total seconds from the timedelta
-            total_seconds = int(value.total_seconds())
-            
-            # Calculate hours from total seconds example 7200 seconds / 3600 = 2 hours
-            hours = total_seconds // 3600
-            
-            # Calculate remaining minutes after removing hours
-            minutes = (total_seconds % 3600) // 60
-            
-            # Calculate remaining seconds after removing hours and minutes
-            seconds = total_seconds % 60
-            
-            # Format hours with leading zero if less than 10
-            if hours < 10:
-                hours_str = "0" + str(hours)
-            else:
-                hours_str = str(hours)
-            
-            # Format minutes with leading zero if less than 10
-            if minutes < 10:
-                minutes_str = "0" + str(minutes)
-            else:
-                minutes_str = str(minutes)
-            
-            # Format seconds with leading zero if less than 10
-            if seconds < 10:
-                seconds_str = "0" + str(seconds)
-            else:
-                seconds_str = str(seconds)
-            
-            # Combine into time string format HH:MM:SS
-            # Example: "02:30:45"
-            time_string = hours_str + ":" + minutes_str + ":" + seconds_str
-            serialized[key] = time_string
-            
-        # Check if value is a datetime object
-        elif isinstance(value, datetime):
-            # Convert datetime to ISO format string
-            # Example: 2024-12-11T14:30:00
-            serialized[key] = value.isoformat()
-        else:
-            # For all other types (strings, ints, etc), keep as is
-            serialized[key] = value
-    
-    # Return the converted dictionary
-    return serialized
+# Order and item rows go out with floats for prices, "HH:MM:SS" for TIME
+# columns and ISO timestamps (converters are resolved once per column)
+ORDER_ROW = RowSerializer()
+ORDER_ITEM_ROW = RowSerializer()
 
 
 @orders_bp.route('/', methods=['POST'])
+@token_optional
+@idempotent
 def create_order():
     """Create new order"""
     conn = None
@@ -80,6 +32,11 @@ def create_order():
     try:
         data = request.json
 
+        # With a token, customers can only order for themselves
+        mismatch = token_mismatch(data.get('customer_id'))
+        if mismatch:
+            return mismatch
+
         conn = get_db_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
@@ -92,8 +49,8 @@ def create_order():
         total_amount = data['total_amount']
         delivery_address = data['delivery_address']
 
-        # Check if customer exists and get their info
-        get_customer = "SELECT total_balance, vip_status FROM users WHERE user_id = %s"
+        # Check if customer exists and get their VIP status
+        get_customer = "SELECT vip_status FROM users WHERE user_id = %s"
         cursor.execute(get_customer, (customer_id,))
         result = cursor.fetchone()
 
@@ -102,7 +59,6 @@ def create_order():
             conn.close()
             return jsonify({"error": "Customer not found"}), 404
 
-        balance = float(result['total_balance'])
         is_vip = result['vip_status']
         
         # Apply discount if customer is VIP
@@ -111,16 +67,6 @@ def create_order():
             discount = total_amount * 0.05
             total_amount = total_amount - discount
         
-        # Check if customer has enough money
-        if balance < total_amount:
-            # Add warning for insufficient funds
-            warning_query = "UPDATE users SET amount_warnings = amount_warnings + 1 WHERE user_id = %s"
-            cursor.execute(warning_query, (customer_id,))
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return jsonify({"error": "Insufficient balance. Warning added."}), 400
-
         # Set delivery date to tomorrow
         today = datetime.now()
         tomorrow = today + timedelta(days=1)
@@ -150,9 +96,20 @@ def create_order():
             item_query = "INSERT INTO order_items (order_id, item_id, quantity, item_price) VALUES (%s, %s, %s, %s)"
             cursor.execute(item_query, (order_id, item['dish_id'], item['quantity'], item['price']))
 
-        # Take money from customer balance
-        deduct_query = "UPDATE users SET total_balance = total_balance - %s WHERE user_id = %s"
-        cursor.execute(deduct_query, (total_amount, customer_id))
+        # Take money from customer wallet; the balance is checked under the
+        # wallet lock, so concurrent orders cannot both spend the same money
+        if not Wallet.debit(cursor, customer_id, total_amount, 'order', order_id):
+            conn.rollback()
+            # Add warning for insufficient funds
+            warning_query = "UPDATE users SET amount_warnings = amount_warnings + 1 WHERE user_id = %s"
+            cursor.execute(warning_query, (customer_id,))
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return jsonify({"error": "Insufficient balance. Warning added."}), 400
+
+        # Count it in the revenue rollups (same transaction)
+        RevenueRollup.record_order(cursor, order_id)
 
         # Try to create payment record
         try:
@@ -175,6 +132,8 @@ def create_order():
         cursor.close()
         conn.close()
 
+        dashboard_counters.order_created(total_amount)
+
         response = {
             "message": "Order created successfully",
             "order_id": order_id
@@ -189,85 +148,129 @@ def create_order():
             cursor.close()
         if conn:
             conn.close()
-        return jsonify({"error": str(e)}), 400
+        # A malformed body is a 400. Anything else (deadlock, lock wait
+        # timeout, lost connection) may work on a retry, so it is a 500,
+        # which @idempotent does not store
+        if isinstance(e, (KeyError, TypeError, ValueError)):
+            return jsonify({"error": str(e)}), 400
+        return jsonify({"error": "Order failed, please retry"}), 500
+
+
+def serialize_orders_with_items(orders, cursor=None):
+    """
+    Serialize orders with their items (one items query for the whole list)
+    """
+    # cursor still describes the orders query until the items are loaded
+    order_row = ORDER_ROW.compile(cursor.description) if cursor else ORDER_ROW
+    order_ids = [order['order_id'] for order in orders]
+    items_by_order = Order.load_items(order_ids, cursor)
+    item_row = ORDER_ITEM_ROW.compile(cursor.description) if cursor and order_ids else ORDER_ITEM_ROW
+
+    serialized_orders = []
+    for order in orders:
+        serialized_order = order_row(order)
+        serialized_order['items'] = item_row.many(items_by_order[order['order_id']])
+        serialized_orders.append(serialized_order)
+    return serialized_orders
+
+
+# Page size for order history (the unfiltered manager view is always paged)
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+HISTORY_ORDER = Keyset(("o.created_at", "created_at", "desc"), ("o.order_id", "order_id", "desc"))
+
+
+def history_query(conditions):
+    """Order history SELECT with the given WHERE conditions, newest first"""
+    query = """
+        SELECT 
+            o.*,
+            u.name as customer_name,
+            chef.name as chef_name,
+            driver.name as driver_name
+        FROM orders o
+        JOIN users u ON o.customer_id = u.user_id
+        LEFT JOIN users chef ON o.prepared_by = chef.user_id
+        LEFT JOIN users driver ON o.delivered_by = driver.user_id
+        """
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return query + " ORDER BY " + HISTORY_ORDER.order_by()
 
 
 @orders_bp.route('/history', methods=['GET'])
 def get_order_history():
-    """Get order history"""
+    """
+    Get order history, newest first
+
+    Query params:
+        customer_id: Only this customer's orders
+        limit: Page size (always applied without customer_id)
+        cursor: Value of the X-Next-Cursor header from the previous page
+        stream / format: stream=1 streams every matching order as one JSON
+                         array, format=ndjson as one order per line
+                         (no page size unless limit is given)
+    """
     conn = None
     cursor = None
     try:
         customer_id = request.args.get('customer_id')
+        page_cursor = request.args.get('cursor')
+        fmt = stream_format(request.args)
+
+        # Customers get their full history unless they ask for pages,
+        # the unfiltered view never loads the whole table
+        default_limit = None if customer_id else HISTORY_PAGE_SIZE
+        if page_cursor and default_limit is None:
+            default_limit = HISTORY_PAGE_SIZE
+        if fmt:
+            # Streaming holds one batch in memory, so it can send everything
+            default_limit = None
+        limit = parse_limit(request.args.get('limit'), default_limit, HISTORY_MAX_PAGE_SIZE)
+
+        conditions = []
+        params = []
+
+        if customer_id:
+            conditions.append("o.customer_id = %s")
+            params.append(customer_id)
+
+        if page_cursor:
+            clause, values = HISTORY_ORDER.after(page_cursor)
+            conditions.append(clause)
+            params.extend(values)
 
         conn = get_db_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
-        cursor = conn.cursor(dictionary=True)
+        if fmt:
+            # Batches are read whole, so their items load on this same
+            # connection; it goes back to the pool when the response is done
+            return stream_pages(conn, history_query, conditions, params, HISTORY_ORDER, fmt,
+                                transform=serialize_orders_with_items, limit=limit)
 
-        # Build query based on whether customer_id is provided
-        if customer_id:
-            query = """
-            SELECT 
-                o.*,
-                u.name as customer_name,
-                chef.name as chef_name,
-                driver.name as driver_name
-            FROM orders o
-            JOIN users u ON o.customer_id = u.user_id
-            LEFT JOIN users chef ON o.prepared_by = chef.user_id
-            LEFT JOIN users driver ON o.delivered_by = driver.user_id
-            WHERE o.customer_id = %s
-            ORDER BY o.created_at DESC
-            """
-            cursor.execute(query, (customer_id,))
-        else:
-            query = """
-            SELECT 
-                o.*,
-                u.name as customer_name,
-                chef.name as chef_name,
-                driver.name as driver_name
-            FROM orders o
-            JOIN users u ON o.customer_id = u.user_id
-            LEFT JOIN users chef ON o.prepared_by = chef.user_id
-            LEFT JOIN users driver ON o.delivered_by = driver.user_id
-            ORDER BY o.created_at DESC
-            """
-            cursor.execute(query)
+        query = history_query(conditions)
 
+        if limit is not None:
+            # Fetch one extra row to know whether there is a next page
+            query += " LIMIT %s"
+            params.append(limit + 1)
+
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(query, tuple(params))
         orders = cursor.fetchall()
 
-        # Process each order
-        serialized_orders = []
-        for order in orders:
-            # Serialize the order
-            serialized_order = serialize_order(order)
-
-            # Get items for this order
-            items_query = """
-                SELECT oi.*, m.name, m.image_url
-                FROM order_items oi
-                JOIN menu_items m ON oi.item_id = m.item_id
-                WHERE oi.order_id = %s
-            """
-            cursor.execute(items_query, (order['order_id'],))
-            items = cursor.fetchall()
-            
-            # Serialize each item
-            serialized_items = []
-            for item in items:
-                serialized_item = serialize_order(item)
-                serialized_items.append(serialized_item)
-            
-            serialized_order['items'] = serialized_items
-            serialized_orders.append(serialized_order)
+        next_cursor = None
+        if limit is not None:
+            orders, next_cursor = HISTORY_ORDER.paginate(orders, limit)
+
+        serialized_orders = serialize_orders_with_items(orders, cursor)
 
         cursor.close()
         conn.close()
 
-        return jsonify(serialized_orders), 200
+        return set_next_cursor(jsonify(serialized_orders), next_cursor), 200
 
     except Exception as e:
         print("Error getting order history:", e)
@@ -293,6 +296,7 @@ def rate_order(order_id):
             return jsonify({"error": "Database connection failed"}), 500
 
         cursor = conn.cursor(dictionary=True)
+        added_feedback = []
 
         # Get order details
         order_query = "SELECT prepared_by, delivered_by, customer_id FROM orders WHERE order_id = %s"
@@ -317,8 +321,12 @@ def rate_order(order_id):
         if food_rating > 0:
             for item in items:
                 item_id = item['item_id']
-                review_query = "INSERT INTO reviews (amount_stars, item_reviewed, reviewed_by) VALUES (%s, %s, %s)"
-                cursor.execute(review_query, (food_rating, item_id, customer_id))
+                review_query = "INSERT INTO reviews (amount_stars, item_reviewed, reviewed_by, related_order) VALUES (%s, %s, %s, %s)"
+                cursor.execute(review_query, (food_rating, item_id, customer_id, order_id))
+
+            # Chef's average rating counts one review per item
+            if chef_id and items:
+                StaffStats.bump(cursor, chef_id, rating_sum=food_rating * len(items), rating_count=len(items))
 
         # Create feedback for chef based on food rating
         if chef_id and food_rating > 0:
@@ -344,6 +352,8 @@ def rate_order(order_id):
                 VALUES (%s, %s, %s, %s, %s, %s)
             """
             cursor.execute(chef_feedback, (customer_id, chef_id, feedback_type, feedback_message, complaint_status, order_id))
+            StaffStats.feedback_added(cursor, chef_id, feedback_type)
+            added_feedback.append((feedback_type, complaint_status))
 
         # Create feedback for driver based on delivery rating
         if driver_id and delivery_rating > 0:
@@ -369,11 +379,16 @@ def rate_order(order_id):
                 VALUES (%s, %s, %s, %s, %s, %s)
             """
             cursor.execute(driver_feedback, (customer_id, driver_id, feedback_type, feedback_message, complaint_status, order_id))
+            StaffStats.feedback_added(cursor, driver_id, feedback_type)
+            added_feedback.append((feedback_type, complaint_status))
 
         conn.commit()
         cursor.close()
         conn.close()
 
+        for feedback_type, complaint_status in added_feedback:
+            dashboard_counters.feedback_added(feedback_type, complaint_status)
+
         return jsonify({"message": "Rating submitted successfully"}), 200
         
     except Exception as e:
@@ -1,8 +1,36 @@
 from flask import Blueprint, request, jsonify
 from db import get_db_connection
+from utils.pagination import Keyset, page_args, set_next_cursor
 
 reservations_bp = Blueprint('reservations', __name__)
 
+# Latest reservations first, paged with ?limit= / ?cursor=
+RESERVATION_ORDER = Keyset(
+    ("r.reservation_date", "reservation_date", "desc"),
+    ("r.reservation_time", "reservation_time", "desc"),
+    ("r.reservation_id", "reservation_id", "desc"),
+)
+
+# Reservation pages; {where} is "WHERE ..." (customer / keyset) or ""
+CUSTOMER_RESERVATIONS_SQL = f"""
+    SELECT r.*, rt.table_number, rt.seating_capacity
+    FROM reservations r
+    JOIN restaurant_tables rt ON r.table_id = rt.table_id
+    {{where}}
+    ORDER BY {RESERVATION_ORDER.order_by()}
+    LIMIT %s
+"""
+
+RESERVATIONS_SQL = f"""
+    SELECT r.*, rt.table_number, rt.seating_capacity, u.name as customer_name
+    FROM reservations r
+    JOIN restaurant_tables rt ON r.table_id = rt.table_id
+    JOIN users u ON r.customer_id = u.user_id
+    {{where}}
+    ORDER BY {RESERVATION_ORDER.order_by()}
+    LIMIT %s
+"""
+
 
 @reservations_bp.route('/', methods=['POST'])
 def create_reservation():
@@ -64,9 +92,21 @@ def create_reservation():
 
 @reservations_bp.route('/', methods=['GET'])
 def get_reservations():
-    """Get reservations (can filter by customer_id)"""
+    """Get reservations (can filter by customer_id), one page at a time"""
     try:
         customer_id = request.args.get('customer_id')
+        limit, page_cursor = page_args(request.args)
+
+        conditions = []
+        params = []
+        if customer_id:
+            conditions.append("r.customer_id = %s")
+            params.append(customer_id)
+        if page_cursor:
+            condition, values = RESERVATION_ORDER.after(page_cursor)
+            conditions.append(condition)
+            params.extend(values)
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
         
         conn = get_db_connection()
         if not conn:
@@ -74,31 +114,15 @@ def get_reservations():
         
         cursor = conn.cursor(dictionary=True)
         
-        if customer_id:
-            query = """
-            SELECT r.*, rt.table_number, rt.seating_capacity
-            FROM reservations r
-            JOIN restaurant_tables rt ON r.table_id = rt.table_id
-            WHERE r.customer_id = %s
-            ORDER BY r.reservation_date DESC, r.reservation_time DESC
-            """
-            cursor.execute(query, (customer_id,))
-        else:
-            query = """
-            SELECT r.*, rt.table_number, rt.seating_capacity, u.name as customer_name
-            FROM reservations r
-            JOIN restaurant_tables rt ON r.table_id = rt.table_id
-            JOIN users u ON r.customer_id = u.user_id
-            ORDER BY r.reservation_date DESC, r.reservation_time DESC
-            """
-            cursor.execute(query)
-        
-        reservations = cursor.fetchall()
+        query = CUSTOMER_RESERVATIONS_SQL if customer_id else RESERVATIONS_SQL
+        cursor.execute(query.format(where=where), (*params, limit + 1))
+        
+        reservations, next_cursor = RESERVATION_ORDER.paginate(cursor.fetchall(), limit)
         
         cursor.close()
         conn.close()
         
-        return jsonify(reservations), 200
+        return set_next_cursor(jsonify(reservations), next_cursor), 200
         
     except Exception as e:
         return jsonify({"error": str(e)}), 400
\ No newline at end of file
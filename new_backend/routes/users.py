@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from db import get_db_connection
+from models.wallet import BALANCE_SQL, Wallet
 
 users_bp = Blueprint('users', __name__)
 
@@ -13,7 +14,12 @@ def get_user(user_id):
             return jsonify({"error": "Database connection failed"}), 500
         
         cursor = conn.cursor(dictionary=True)
-        query = "SELECT * FROM users WHERE user_id = %s"
+        query = f"""
+            SELECT u.*, {BALANCE_SQL} AS wallet_balance
+            FROM users u
+            LEFT JOIN wallet_snapshots s ON s.user_id = u.user_id
+            WHERE u.user_id = %s
+        """
         cursor.execute(query, (user_id,))
         user = cursor.fetchone()
         
@@ -31,7 +37,7 @@ def get_user(user_id):
             "phone": user['phone'],
             "home_address": user['home_address'],
             "role": user['role'],
-            "balance": float(user['total_balance']),
+            "balance": float(user['wallet_balance']),
             "warnings": user['amount_warnings'],
             "vip_status": user['vip_status'],
             "is_blacklisted": user['is_blacklisted']
@@ -52,26 +58,36 @@ def update_balance(user_id):
         
         cursor = conn.cursor()
         
+        # Balance changes are appended to the wallet ledger
         if data.get('action') == 'add':
-            query = "UPDATE users SET total_balance = total_balance + %s WHERE user_id = %s"
+            if not Wallet.credit(cursor, user_id, data['amount'], 'adjustment'):
+                conn.rollback()
+                cursor.close()
+                conn.close()
+                return jsonify({"error": "User not found"}), 404
         elif data.get('action') == 'subtract':
-            query = "UPDATE users SET total_balance = total_balance - %s WHERE user_id = %s"
+            # Only subtracts if the balance covers it
+            if not Wallet.debit(cursor, user_id, data['amount'], 'adjustment'):
+                conn.rollback()
+                cursor.close()
+                conn.close()
+                return jsonify({"error": "Insufficient balance"}), 400
         else:
+            cursor.close()
+            conn.close()
             return jsonify({"error": "Invalid action"}), 400
         
-        cursor.execute(query, (data['amount'], user_id))
         conn.commit()
         
         # Get updated balance
-        cursor.execute("SELECT total_balance FROM users WHERE user_id = %s", (user_id,))
-        result = cursor.fetchone()
+        new_balance = Wallet.balance(cursor, user_id)
         
         cursor.close()
         conn.close()
         
         return jsonify({
             "message": "Balance updated",
-            "new_balance": float(result[0])
+            "new_balance": new_balance
         }), 200
         
     except Exception as e:
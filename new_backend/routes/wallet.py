@@ -1,39 +1,58 @@
 from flask import Blueprint, request, jsonify
 from db import get_db_connection
+from models.wallet import Wallet, to_amount
+from utils.idempotency import idempotent
+from utils.tokens import token_optional, token_mismatch
 
 wallet_bp = Blueprint('wallet', __name__)
 
 @wallet_bp.route('/deposit', methods=['POST'])
+@token_optional
+@idempotent
 def deposit_funds():
+    conn = None
     try:
         data = request.json
         customer_id = data.get("customer_id")
-        amount = float(data.get("amount", 0))
 
-        if not customer_id or amount <= 0:
+        # Validate the amount as it will be stored (cents), so e.g. 0.004
+        # is a 400 here rather than a ValueError from Wallet.credit
+        try:
+            amount = to_amount(data.get("amount", 0))
+        except (ArithmeticError, ValueError, TypeError):
+            amount = None
+        if not customer_id or amount is None or not amount.is_finite() or amount <= 0:
             return jsonify({"error": "Invalid deposit request"}), 400
 
+        # with a token, only your own wallet
+        mismatch = token_mismatch(customer_id)
+        if mismatch:
+            return mismatch
+
         conn = get_db_connection()
+        if not conn:
+            return jsonify({"error": "Database connection failed"}), 500
         cursor = conn.cursor()
 
-        # Update database balance
-        cursor.execute("""
-            UPDATE users
-            SET total_balance = total_balance + %s
-            WHERE user_id = %s
-        """, (amount, customer_id))
+        # Append the deposit to the wallet ledger (no users row update)
+        if not Wallet.credit(cursor, customer_id, amount, 'deposit'):
+            conn.rollback()
+            cursor.close()
+            return jsonify({"error": "Customer not found"}), 404
 
         conn.commit()
 
         # Return new balance
-        cursor.execute("SELECT total_balance FROM users WHERE user_id = %s", (customer_id,))
-        new_balance = float(cursor.fetchone()[0])
+        new_balance = Wallet.balance(cursor, customer_id)
 
         cursor.close()
-        conn.close()
 
         return jsonify({"balance": new_balance}), 200
 
     except Exception as e:
         print("Wallet deposit error:", e)
         return jsonify({"error": "Deposit failed"}), 500
+    finally:
+        # returns the connection to the pool (rolls back anything uncommitted)
+        if conn:
+            conn.close()
@@ -1,10 +1,17 @@
 """
 Test script for SD Foods Backend API
 Run this after starting the Flask server to test all endpoints
+
+    python test_api.py          # every endpoint against http://localhost:5000
+    python test_api.py --stub   # stub-backed checks (chat stream, revenue buckets), no server needed
 """
 
 import requests
 import json
+import sys
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 BASE_URL = "http://localhost:5000/api"
 
@@ -13,17 +20,17 @@ def print_section(title):
     print(f"  {title}")
     print("="*60)
 
-def test_endpoint(method, endpoint, data=None, description=""):
+def test_endpoint(method, endpoint, data=None, description="", headers=None):
     print(f"\n🧪 Testing: {description}")
     print(f"   {method} {endpoint}")
     
     try:
         if method == "GET":
-            response = requests.get(f"{BASE_URL}{endpoint}")
+            response = requests.get(f"{BASE_URL}{endpoint}", headers=headers)
         elif method == "POST":
-            response = requests.post(f"{BASE_URL}{endpoint}", json=data)
+            response = requests.post(f"{BASE_URL}{endpoint}", json=data, headers=headers)
         elif method == "PUT":
-            response = requests.put(f"{BASE_URL}{endpoint}", json=data)
+            response = requests.put(f"{BASE_URL}{endpoint}", json=data, headers=headers)
         
         print(f"   Status: {response.status_code}")
         
@@ -43,6 +50,127 @@ def test_endpoint(method, endpoint, data=None, description=""):
         print(f"   ❌ Error: {str(e)}")
         return None
 
+def test_stream(endpoint, data=None, description=""):
+    print(f"\n🧪 Testing: {description}")
+    print(f"   POST {endpoint}")
+    
+    try:
+        response = requests.post(f"{BASE_URL}{endpoint}", json=data, stream=True)
+        print(f"   Status: {response.status_code}")
+        
+        events = 0
+        for line in response.iter_lines(decode_unicode=True):
+            if line and line.startswith("data:"):
+                events += 1
+                print(f"   {line[:100]}")
+        
+        if response.status_code < 400 and events:
+            print(f"   ✅ Success ({events} events)")
+        else:
+            print(f"   ❌ Failed")
+        return response
+    except Exception as e:
+        print(f"   ❌ Error: {str(e)}")
+        return None
+
+# Stub Ollama server: answers /api/generate like Ollama does, one JSON
+# object per line when "stream" is true, so the streamed chat can be tested
+# without a model running
+STUB_PIECES = ["Hello", " from", " the", " stub", " model."]
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        if payload.get("stream"):
+            for piece in STUB_PIECES:
+                self.wfile.write((json.dumps({"response": piece, "done": False}) + "\n").encode())
+                self.wfile.flush()
+            self.wfile.write((json.dumps({"response": "", "done": True}) + "\n").encode())
+        else:
+            self.wfile.write(json.dumps({"response": "".join(STUB_PIECES), "done": True}).encode())
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_ollama():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllamaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/api/generate"
+
+def test_stream_with_stub():
+    """Streamed chat against the stub server (runs the app in-process, no live server)"""
+    print_section("STREAMED CHAT WITH A STUB OLLAMA")
+    import secrets
+    from config import FLASK_CONFIG, OLLAMA_CONFIG
+    from app import create_app
+    import routes.chat as chat
+
+    if not FLASK_CONFIG["SECRET_KEY"]:
+        FLASK_CONFIG["SECRET_KEY"] = secrets.token_hex(32)
+
+    server, url = start_stub_ollama()
+    OLLAMA_CONFIG["url"] = url
+    ok = True
+    try:
+        pieces = list(chat.stream_llm("What are your hours?"))
+        print(f"   stream_llm pieces: {pieces}")
+        ok = ok and pieces == STUB_PIECES
+
+        # no knowledge base entry, so the route streams the model's answer
+        chat.search_knowledge_base = lambda query: None
+        chat.answer_cache.clear()
+        client = create_app().test_client()
+        response = client.post("/api/chat/ask/stream", json={"message": "Tell me a stub story"})
+        tokens = [json.loads(line[len("data:"):])["token"]
+                  for line in response.get_data(as_text=True).splitlines()
+                  if line.startswith("data:") and '"token"' in line]
+        print(f"   SSE status {response.status_code}, tokens: {tokens}")
+        ok = ok and response.status_code == 200 and tokens == STUB_PIECES
+    finally:
+        server.shutdown()
+
+    print(f"   {'✅ Success' if ok else '❌ Failed'}")
+    return ok
+
+def test_timeseries_with_stub_rows():
+    """Revenue buckets from an unaligned start, read from in-memory rollup rows"""
+    print_section("REVENUE TIMESERIES WITH STUB ROWS")
+    from datetime import datetime
+    from models.revenue_rollup import RevenueRollup
+
+    # (bucket_start, orders, gross, cancelled, refunded), like revenue_hourly/revenue_daily
+    hourly = [(datetime(2024, 3, 4, 10), 2, 30.0, 0, 0), (datetime(2024, 3, 4, 11), 1, 12.5, 0, 0)]
+    daily = [(datetime(2024, 3, 4), 3, 42.5, 0, 0), (datetime(2024, 3, 5), 1, 8.0, 1, 8.0)]
+    tables = {'revenue_hourly': hourly, 'revenue_daily': daily}
+
+    def fake_load(table, start, end):
+        return [row for row in tables[table] if start <= row[0] < end]
+
+    original = RevenueRollup._load
+    RevenueRollup._load = staticmethod(fake_load)
+    ok = True
+    try:
+        # start falls inside the first bucket; its whole totals should still count
+        checks = [
+            ('hour', datetime(2024, 3, 4, 10, 25), datetime(2024, 3, 4, 11, 5), [30.0, 12.5]),
+            ('day', datetime(2024, 3, 4, 18), datetime(2024, 3, 5, 6), [42.5, 8.0]),
+            ('week', datetime(2024, 3, 5, 9), datetime(2024, 3, 6), [50.5]),
+            ('month', datetime(2024, 3, 5, 9), datetime(2024, 3, 5, 12), [50.5]),
+        ]
+        for bucket, start, end, expected in checks:
+            gross = [point['gross_revenue'] for point in RevenueRollup.timeseries(start, end, bucket)]
+            print(f"   {bucket} from {start.isoformat()}: {gross}")
+            ok = ok and gross == expected
+    finally:
+        RevenueRollup._load = original
+
+    print(f"   {'✅ Success' if ok else '❌ Failed'}")
+    return ok
+
 def main():
     print("\n" + "🍕"*30)
     print("  SD Foods Backend API Test Suite")
@@ -74,8 +202,11 @@ def main():
     response = test_endpoint("POST", "/auth/login", login_data, "Login user")
     
     user_id = None
+    auth_headers = None
     if response and response.status_code == 200:
         user_id = response.json().get('customer_id')
+        # permission-checked routes need the token (403 for a customer's role)
+        auth_headers = {"Authorization": f"Bearer {response.json().get('token')}"}
         print(f"   📝 User ID: {user_id}")
     
     # Menu
@@ -96,8 +227,18 @@ def main():
             "total_amount": 59.98
         }
         test_endpoint("POST", "/orders/", order_data, "Create new order")
+
+        # A retry with the same Idempotency-Key gets the first response back
+        retry_headers = {"Idempotency-Key": str(uuid.uuid4())}
+        first = test_endpoint("POST", "/orders/", order_data, "Create order with Idempotency-Key", retry_headers)
+        retry = test_endpoint("POST", "/orders/", order_data, "Retry order with the same key", retry_headers)
+        if first is not None and retry is not None:
+            replayed = retry.headers.get("Idempotent-Replayed") == "true" and retry.text == first.text
+            print(f"   {'✅' if replayed else '❌'} Retry replayed the first response")
     
     test_endpoint("GET", "/orders/history", description="Get order history")
+    test_endpoint("GET", "/orders/history?stream=1", description="Stream order history (JSON array)")
+    test_endpoint("GET", "/orders/history?format=ndjson", description="Stream order history (NDJSON)")
     
     # Reservations
     print_section("5. RESERVATIONS")
@@ -122,35 +263,45 @@ def main():
         "customer_id": user_id
     }
     test_endpoint("POST", "/chat/", chat_data, "Chat with AI assistant")
+    test_stream("/chat/ask/stream", {"message": "What are your hours?", "user_id": user_id},
+                "Streamed chat answer (SSE)")
     
     # Chef Routes
     print_section("7. CHEF ROUTES")
-    test_endpoint("GET", "/chef/orders", description="Get chef orders")
+    test_endpoint("GET", "/chef/orders", description="Get chef orders", headers=auth_headers)
     
     # Delivery Routes
     print_section("8. DELIVERY ROUTES")
-    test_endpoint("GET", "/delivery/orders", description="Get delivery orders")
+    test_endpoint("GET", "/delivery/orders", description="Get delivery orders", headers=auth_headers)
     
     # Manager Routes
     print_section("9. MANAGER ROUTES")
-    test_endpoint("GET", "/manager/feedback", description="Get pending feedback")
+    test_endpoint("GET", "/manager/feedback", description="Get pending feedback", headers=auth_headers)
+    test_endpoint("GET", "/manager/feedback?stream=1", description="Stream all feedback", headers=auth_headers)
+    test_endpoint("GET", "/manager/stats", description="Get dashboard stats", headers=auth_headers)
+    test_endpoint("GET", "/manager/revenue/timeseries?bucket=day", description="Get daily revenue", headers=auth_headers)
     
     # User Routes
     print_section("10. USER ROUTES")
     if user_id:
-        test_endpoint("GET", f"/users/{user_id}", description="Get user details")
+        test_endpoint("GET", f"/users/{user_id}", description="Get user details", headers=auth_headers)
         
         balance_data = {
             "action": "add",
             "amount": 50.00
         }
-        test_endpoint("PUT", f"/users/{user_id}/balance", balance_data, "Add to balance")
+        test_endpoint("PUT", f"/users/{user_id}/balance", balance_data, "Add to balance", auth_headers)
     
     print("\n" + "🎉"*30)
     print("  Test Suite Complete!")
     print("🎉"*30 + "\n")
 
 if __name__ == "__main__":
+    if "--stub" in sys.argv:
+        # only the stub-backed checks; needs the backend's packages, not a server
+        results = [test_stream_with_stub(), test_timeseries_with_stub_rows()]
+        sys.exit(0 if all(results) else 1)
+
     print("\n⚠️  Make sure the Flask server is running on http://localhost:5000")
     print("   Run: python app.py\n")
     
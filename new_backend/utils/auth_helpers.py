@@ -1,37 +1,106 @@
+import threading
+
 import bcrypt
 
+from config import AUTH_CONFIG
+from utils.bulkhead import BoundedExecutor
+
+
+def _hashpw(password, rounds):
+    # runs in a worker process
+    salt = bcrypt.gensalt(rounds=rounds)
+    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+
+def _checkpw(password, hashed_password):
+    # runs in a worker process
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+    except Exception as e:
+        print(f"Password verification error: {e}")
+        return False
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    # created on first use, so importing this module (and the worker
+    # processes, which import it too) never starts a pool
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BoundedExecutor(
+                    "bcrypt",
+                    workers=AUTH_CONFIG["hash_workers"],
+                    queue_limit=AUTH_CONFIG["hash_queue_limit"],
+                    processes=True,
+                )
+    return _pool
+
+
+def _run(fn, *args):
+    if AUTH_CONFIG["hash_workers"] <= 0:
+        return fn(*args)
+    return _get_pool().run(fn, AUTH_CONFIG["hash_timeout"], *args)
+
 
 def hash_password(password):
     """
-    Hash a password using bcrypt
-    
+    Hash a password using bcrypt (on the password worker pool)
+
     Args:
         password (str): Plain text password
-        
+
     Returns:
-        str: Hashed password
+        str: Hashed password with the configured cost (BCRYPT_ROUNDS)
+
+    Raises:
+        BusyError: Every worker and queue slot is taken
+        concurrent.futures.TimeoutError: Hashing took longer than hash_timeout
     """
-    password_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password_bytes, salt)
-    return hashed.decode('utf-8')
+    return _run(_hashpw, password, AUTH_CONFIG["bcrypt_rounds"])
 
 
 def verify_password(password, hashed_password):
     """
-    Verify a password against a hash
-    
+    Verify a password against a hash (on the password worker pool)
+
     Args:
         password (str): Plain text password
         hashed_password (str): Hashed password from database
-        
+
     Returns:
         bool: True if password matches, False otherwise
+
+    Raises:
+        BusyError: Every worker and queue slot is taken
+        concurrent.futures.TimeoutError: Checking took longer than hash_timeout
+    """
+    return _run(_checkpw, password, hashed_password)
+
+
+def needs_rehash(hashed_password):
+    """
+    Check whether a stored hash was made with a different cost than BCRYPT_ROUNDS
+
+    Args:
+        hashed_password (str): Hash like $2b$12$...
+
+    Returns:
+        bool: True if the password should be hashed again
     """
     try:
-        password_bytes = password.encode('utf-8')
-        hashed_bytes = hashed_password.encode('utf-8')
-        return bcrypt.checkpw(password_bytes, hashed_bytes)
-    except Exception as e:
-        print(f"Password verification error: {e}")
-        return False
\ No newline at end of file
+        cost = int(hashed_password.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return False
+    return cost != AUTH_CONFIG["bcrypt_rounds"]
+
+
+def password_pool_stats():
+    """
+    Worker pool metrics, or None before the first hash
+    """
+    return _pool.stats() if _pool else None
@@ -0,0 +1,64 @@
+import threading
+
+
+class PeriodicJob:
+    """
+    Runs a function every interval seconds on a daemon thread.
+
+    Errors are printed and the job keeps its schedule, so one bad run
+    (e.g. the database restarting) doesn't stop later runs.
+    """
+
+    def __init__(self, name, interval, fn, run_at_start=False):
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self.run_at_start = run_at_start
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._loop, name=f"job-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self):
+        try:
+            self.fn()
+        except Exception as e:
+            print(f"Background job {self.name} error: {e}")
+
+    def _loop(self):
+        if self.run_at_start:
+            self.run_once()
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def start_periodic(name, interval, fn, run_at_start=False):
+    """
+    Start a periodic job once per process (later calls with the same name
+    return the running job)
+    """
+    with _jobs_lock:
+        job = _jobs.get(name)
+        if job is None:
+            job = PeriodicJob(name, interval, fn, run_at_start).start()
+            _jobs[name] = job
+        return job
+
+
+def stop_all():
+    with _jobs_lock:
+        for job in _jobs.values():
+            job.stop()
+        _jobs.clear()
@@ -0,0 +1,184 @@
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+
+
+class BusyError(Exception):
+    """Raised when a bounded executor has no free worker or queue slot"""
+
+
+class CircuitOpenError(Exception):
+    """Raised when a circuit breaker is refusing calls"""
+
+
+class BoundedExecutor:
+    """
+    Thread (or process) pool with a hard cap on queued work.
+
+    At most workers + queue_limit tasks are accepted at once; anything
+    beyond that is rejected immediately with BusyError instead of piling
+    up behind a slow dependency. Work held on the caller's own thread
+    (slot()) has a separate cap of workers, with no queue.
+
+    With processes=True the work runs in separate processes (started with
+    spawn, so they do not inherit the web server's threads and locks);
+    fn and its args must then be picklable, i.e. module-level functions.
+    """
+
+    def __init__(self, name, workers=4, queue_limit=8, processes=False):
+        self.name = name
+        self.workers = workers
+        self.queue_limit = queue_limit
+        if processes:
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self._stream_slots = threading.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._streaming = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _acquire(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise BusyError(f"{self.name} is busy")
+        with self._lock:
+            self._active += 1
+
+    def _release(self, *_):
+        with self._lock:
+            self._active -= 1
+        self._slots.release()
+
+    def run(self, fn, deadline, *args):
+        """
+        Run fn(*args) on the pool and wait at most deadline seconds for the result
+
+        Raises:
+            BusyError: pool and queue are full
+            concurrent.futures.TimeoutError: fn did not finish in time
+        """
+        self._acquire()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+
+        try:
+            return future.result(timeout=deadline)
+        except FutureTimeoutError:
+            # Drop it if it never started; a running call finishes on its own
+            future.cancel()
+            with self._lock:
+                self.timed_out += 1
+            raise
+
+    @contextmanager
+    def slot(self):
+        """
+        Hold one slot while work runs on the caller's own thread (used for
+        streaming responses, which cannot be handed to the pool)
+
+        Streams do not wait in a queue, so they have their own workers-sized
+        cap and never take the slots run() calls need.
+
+        Raises:
+            BusyError: workers streams are already running
+        """
+        if not self._stream_slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise BusyError(f"{self.name} is busy")
+        with self._lock:
+            self._streaming += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._streaming -= 1
+            self._stream_slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "active": self._active,
+                "streaming": self._streaming,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+            }
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency for a while.
+
+    closed    -> calls go through; failure_threshold failures in a row open it
+    open      -> calls are refused until reset_timeout seconds have passed
+    half_open -> one trial call; success closes the circuit, failure reopens it
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._trial_started = 0.0
+
+    def before_call(self):
+        """
+        Raises:
+            CircuitOpenError: the circuit is open (or a trial call is already running)
+        """
+        with self._lock:
+            if self._state == "closed":
+                return
+            now = time.monotonic()
+            if self._state == "open" and now - self._opened_at >= self.reset_timeout:
+                self._state = "half_open"
+                self._trial_running = False
+            # A trial that never reported back does not block recovery forever
+            if self._state == "half_open" and (
+                not self._trial_running or now - self._trial_started >= self.reset_timeout
+            ):
+                self._trial_running = True
+                self._trial_started = now
+                return
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def record_success(self):
+        with self._lock:
+            self._state = "closed"
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                self._state = "open"
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+            }
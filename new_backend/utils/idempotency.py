@@ -0,0 +1,217 @@
+import hashlib
+from functools import wraps
+
+from flask import current_app, g, jsonify, make_response, request
+
+from config import IDEMPOTENCY_CONFIG
+from db import get_db_connection
+from utils.llm_cache import AnswerCache
+
+
+# 4xx statuses that mean "try again later", not a final answer
+RETRYABLE_STATUSES = (408, 409, 425, 429)
+
+# Completed responses by key, so most retries never reach MySQL
+_recent = AnswerCache(
+    max_entries=IDEMPOTENCY_CONFIG["cache_size"],
+    ttl=IDEMPOTENCY_CONFIG["ttl"],
+)
+
+
+def _key_hash(key):
+    # keys are scoped to the caller and the endpoint, so two users (or two
+    # endpoints) sending the same key never see each other's responses
+    user = g.get("user")
+    if user:
+        owner = user["user_id"]
+    else:
+        owner = (request.get_json(silent=True) or {}).get("customer_id")
+    scoped = f"{owner}:{request.method} {request.path}:{key}"
+    return hashlib.sha256(scoped.encode("utf-8")).hexdigest()
+
+
+def _replay(stored):
+    status, body, mimetype = stored
+    response = current_app.response_class(body, status=status, mimetype=mimetype)
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _claim(key_hash, request_hash):
+    """
+    Insert the key as in progress, or read what is already stored
+
+    Returns:
+        tuple: ("claimed", None), ("in_progress", None), ("mismatch", None)
+        or ("done", (status, body, mimetype))
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT IGNORE INTO idempotency_keys (key_hash, request_hash)
+            VALUES (%s, %s)
+        """, (key_hash, request_hash))
+        if cursor.rowcount == 1:
+            conn.commit()
+            return "claimed", None
+
+        # take over a key whose first attempt died without finishing
+        cursor.execute("""
+            UPDATE idempotency_keys SET created_at = CURRENT_TIMESTAMP
+            WHERE key_hash = %s AND request_hash = %s AND status_code IS NULL
+              AND created_at < NOW() - INTERVAL %s SECOND
+        """, (key_hash, request_hash, IDEMPOTENCY_CONFIG["in_progress_timeout"]))
+        if cursor.rowcount == 1:
+            conn.commit()
+            return "claimed", None
+
+        cursor.execute("""
+            SELECT request_hash, status_code, response_body, content_type
+            FROM idempotency_keys WHERE key_hash = %s
+        """, (key_hash,))
+        row = cursor.fetchone()
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
+    if row is None:
+        # purged between the insert and the read; treat it as in progress
+        return "in_progress", None
+    stored_hash, status, body, mimetype = row
+    if stored_hash != request_hash:
+        return "mismatch", None
+    if status is None:
+        return "in_progress", None
+    return "done", (status, body, mimetype)
+
+
+def _finish(key_hash, stored):
+    """Store the response of the first attempt (None releases the key)"""
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+    try:
+        cursor = conn.cursor()
+        if stored is None:
+            cursor.execute("DELETE FROM idempotency_keys WHERE key_hash = %s", (key_hash,))
+        else:
+            cursor.execute("""
+                UPDATE idempotency_keys
+                SET status_code = %s, response_body = %s, content_type = %s
+                WHERE key_hash = %s
+            """, (*stored, key_hash))
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
+
+def idempotent(fn):
+    """
+    Route decorator: replay the first response for a repeated Idempotency-Key
+
+    Clients that may retry a POST send a unique Idempotency-Key header per
+    logical request. The first attempt runs the route and its response is
+    stored if it is final: a 2xx, or a 4xx the route returns on purpose
+    (validation, not found, insufficient balance). A retry with the same
+    key and body gets that response back with Idempotent-Replayed: true
+    instead of running the route again. The same key with a different body is a 422; a retry
+    while the first attempt is still running is a 409. Requests without
+    the header run normally. Keys are kept for IDEMPOTENCY_TTL seconds.
+
+    Routes must answer transient failures (database errors, deadlocks,
+    lock wait timeouts) with a 5xx so the key is released and a retry runs
+    again; 408, 409, 425 and 429 are not stored either.
+
+    Put it below token_optional so keys are scoped to the token's user.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get("Idempotency-Key", "").strip()
+        if not key:
+            return fn(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify({"error": "Idempotency-Key is too long"}), 400
+
+        key_hash = _key_hash(key)
+        request_hash = hashlib.sha256(request.get_data()).hexdigest()
+
+        cached = _recent.get(key_hash)
+        if cached is not None:
+            cached_hash, stored = cached
+            if cached_hash != request_hash:
+                return jsonify({"error": "Idempotency-Key was already used with a different request"}), 422
+            return _replay(stored)
+
+        try:
+            state, stored = _claim(key_hash, request_hash)
+        except Exception as e:
+            print(f"Idempotency key lookup failed: {e}")
+            return jsonify({"error": "Database connection failed"}), 500
+
+        if state == "mismatch":
+            return jsonify({"error": "Idempotency-Key was already used with a different request"}), 422
+        if state == "in_progress":
+            response = jsonify({"error": "A request with this Idempotency-Key is still being processed"})
+            response.headers["Retry-After"] = "1"
+            return response, 409
+        if state == "done":
+            _recent.put(key_hash, (request_hash, stored))
+            return _replay(stored)
+
+        try:
+            response = make_response(fn(*args, **kwargs))
+        except Exception:
+            try:
+                _finish(key_hash, None)
+            except Exception as e:
+                print(f"Idempotency key release failed: {e}")
+            raise
+
+        # server errors and "try again" statuses are not stored, so the
+        # client can retry them
+        stored = None
+        if response.status_code < 500 and response.status_code not in RETRYABLE_STATUSES:
+            stored = (response.status_code, response.get_data(as_text=True), response.mimetype)
+        try:
+            _finish(key_hash, stored)
+            if stored:
+                _recent.put(key_hash, (request_hash, stored))
+        except Exception as e:
+            print(f"Idempotency key store failed: {e}")
+        return response
+    return wrapper
+
+
+def purge_expired_keys():
+    """
+    Delete stored keys older than IDEMPOTENCY_TTL
+
+    Returns:
+        int: Keys deleted
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+    deleted = 0
+    try:
+        cursor = conn.cursor()
+        while True:
+            # small batches keep each delete's locks short
+            cursor.execute("""
+                DELETE FROM idempotency_keys
+                WHERE created_at < NOW() - INTERVAL %s SECOND
+                LIMIT 1000
+            """, (IDEMPOTENCY_CONFIG["ttl"],))
+            conn.commit()
+            deleted += cursor.rowcount
+            if cursor.rowcount < 1000:
+                break
+        cursor.close()
+    finally:
+        conn.close()
+    return deleted
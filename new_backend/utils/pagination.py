@@ -0,0 +1,182 @@
+import base64
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _encode_value(value):
+    # Tag non-JSON types so they come back as the same Python type
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if isinstance(value, timedelta):
+        return {"td": value.total_seconds()}
+    if isinstance(value, Decimal):
+        return {"dec": str(value)}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        if "td" in value:
+            return timedelta(seconds=value["td"])
+        if "dec" in value:
+            return Decimal(value["dec"])
+    return value
+
+
+def encode_cursor(values):
+    """
+    Encode the sort-key values of the last row on a page into an opaque cursor
+
+    Args:
+        values (list): Sort key values, e.g. [created_at, order_id]
+
+    Returns:
+        str: URL-safe cursor string
+    """
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, expected_length):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor (str): Cursor from the client
+        expected_length (int): Number of sort-key values the route uses
+
+    Returns:
+        list: Sort key values
+
+    Raises:
+        ValueError: Cursor is malformed or belongs to a different sort order
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(values, list) or len(values) != expected_length:
+        raise ValueError("Invalid cursor")
+
+    return [_decode_value(v) for v in values]
+
+
+def parse_limit(raw_limit, default, maximum):
+    """
+    Parse the ?limit= query parameter and clamp it to [1, maximum]
+
+    Returns:
+        int or None: None when raw_limit is missing and default is None
+    """
+    if raw_limit in (None, ""):
+        return default
+    try:
+        limit = int(raw_limit)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    return max(1, min(limit, maximum))
+
+
+# Defaults for list endpoints that are always paged
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def page_args(args, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """
+    Read ?limit= and ?cursor= from the request args
+
+    Returns:
+        tuple: (limit, cursor or None)
+    """
+    return parse_limit(args.get("limit"), default, maximum), args.get("cursor") or None
+
+
+def set_next_cursor(response, next_cursor):
+    """
+    Put the next-page cursor on a response (no header on the last page)
+    """
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return response
+
+
+class Keyset:
+    """
+    A sort order that can be paged with a cursor instead of OFFSET.
+
+    Each column is (SQL expression, key in the result row, "asc"/"desc").
+    The last column must be unique (normally the primary key) so every row
+    has exactly one position. Directions may be mixed, e.g. most warnings
+    first and then name A-Z.
+
+        CUSTOMERS = Keyset(("amount_warnings", "amount_warnings", "desc"),
+                           ("name", "name", "asc"),
+                           ("user_id", "user_id", "asc"))
+    """
+
+    def __init__(self, *columns):
+        for _, _, direction in columns:
+            if direction not in ("asc", "desc"):
+                raise ValueError("direction must be 'asc' or 'desc'")
+        self.columns = columns
+
+    def order_by(self):
+        """
+        ORDER BY list matching the cursor
+        """
+        return ", ".join(f"{expr} {direction.upper()}" for expr, _, direction in self.columns)
+
+    def after(self, cursor):
+        """
+        WHERE clause selecting the rows after the cursor
+
+        Returns:
+            tuple: (SQL condition, params)
+
+        Raises:
+            ValueError: Cursor is malformed or belongs to a different sort order
+        """
+        values = decode_cursor(cursor, len(self.columns))
+
+        branches = []
+        params = []
+        # (a, b, c) after (x, y, z): a beyond x, or a = x and b beyond y, or ...
+        for i, (expr, _, direction) in enumerate(self.columns):
+            parts = [f"{prev_expr} = %s" for prev_expr, _, _ in self.columns[:i]]
+            parts.append(f"{expr} {'<' if direction == 'desc' else '>'} %s")
+            branches.append("(" + " AND ".join(parts) + ")")
+            params.extend(values[:i])
+            params.append(values[i])
+
+        return "(" + " OR ".join(branches) + ")", params
+
+    def paginate(self, rows, limit):
+        """
+        Trim a result fetched with LIMIT limit + 1 and build the next cursor
+
+        Returns:
+            tuple: (rows on this page, next cursor or None)
+        """
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, self.cursor_for(rows[-1])
+
+    def cursor_for(self, row):
+        """
+        Cursor pointing just past row
+        """
+        return encode_cursor([row[key] for _, key, _ in self.columns])
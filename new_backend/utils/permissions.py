@@ -0,0 +1,168 @@
+import threading
+from collections import namedtuple
+from functools import wraps
+from types import MappingProxyType
+
+from flask import g, jsonify
+
+from config import AUTH_CONFIG
+from db import get_db_connection
+from utils.tokens import authenticate_request
+
+
+# Built-in grants, used when role_permissions is empty (database not seeded
+# yet) and by migrations.py to seed it. Keep in sync with schema.sql.
+DEFAULT_GRANTS = {
+    "chef": ("orders.prepare", "menu.edit", "knowledge.auto_approve"),
+    "driver": ("orders.deliver", "knowledge.auto_approve"),
+    "delivery": ("orders.deliver", "knowledge.auto_approve"),
+    "manager": (
+        "manager.dashboard", "feedback.resolve", "staff.manage", "customers.manage",
+        "bids.assign", "orders.prepare", "menu.edit",
+        "knowledge.auto_approve", "knowledge.review",
+    ),
+    "admin": (
+        "manager.dashboard", "feedback.resolve", "staff.manage", "customers.manage",
+        "bids.assign", "orders.prepare", "orders.deliver", "menu.edit",
+        "knowledge.auto_approve", "knowledge.review",
+    ),
+    "customer": (),
+}
+
+# One immutable snapshot: permission name -> bit, role -> bitset of its permissions
+Matrix = namedtuple("Matrix", ["bit_of", "role_bits"])
+
+
+def build_matrix(grants):
+    """
+    Build a snapshot from (role, permission) pairs
+
+    Returns:
+        Matrix: read-only mappings, replaced as a whole on reload
+    """
+    bit_of = {}
+    role_bits = {}
+    for role, permission in grants:
+        if permission not in bit_of:
+            bit_of[permission] = 1 << len(bit_of)
+        role_bits[role] = role_bits.get(role, 0) | bit_of[permission]
+    return Matrix(MappingProxyType(bit_of), MappingProxyType(role_bits))
+
+
+def _default_pairs():
+    return [(role, permission) for role, permissions in DEFAULT_GRANTS.items() for permission in permissions]
+
+
+class PermissionMatrix:
+    """
+    Role -> permission bitsets loaded from role, permissions and role_permissions.
+
+    The matrix is read once and kept as an immutable snapshot, so a check
+    is two dict lookups and an AND with no database access. reload() runs
+    on a background job and swaps in a new snapshot only when the tables
+    changed; readers never see a half-built matrix.
+    """
+
+    def __init__(self):
+        self._matrix = None
+        self._lock = threading.Lock()
+
+    def reload(self):
+        """
+        Read the permission tables and swap in the new matrix if it changed
+
+        Returns:
+            bool: True if the matrix changed
+        """
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError("Database connection failed")
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT r.role_type, p.permissions_type
+                FROM role_permissions rp
+                JOIN role r ON rp.role_id = r.role_id
+                JOIN permissions p ON rp.permissions_id = p.permissions_id
+                ORDER BY p.permissions_id, r.role_id
+            """)
+            pairs = cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()
+
+        matrix = build_matrix(pairs or _default_pairs())
+        with self._lock:
+            changed = self._matrix is None or self._grants(self._matrix) != self._grants(matrix)
+            if changed:
+                self._matrix = matrix
+        if changed:
+            print(f"Permission matrix loaded ({len(matrix.bit_of)} permissions, {len(matrix.role_bits)} roles)")
+        return changed
+
+    @staticmethod
+    def _grants(matrix):
+        return {
+            role: frozenset(name for name, bit in matrix.bit_of.items() if bits & bit)
+            for role, bits in matrix.role_bits.items()
+        }
+
+    def _current(self):
+        matrix = self._matrix
+        if matrix is None:
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Permission matrix load failed, using defaults: {e}")
+                with self._lock:
+                    if self._matrix is None:
+                        self._matrix = build_matrix(_default_pairs())
+            matrix = self._matrix
+        return matrix
+
+    def allows(self, role, permission):
+        """
+        Check whether a role has a permission
+
+        Returns:
+            bool: False for unknown roles and permissions
+        """
+        matrix = self._current()
+        bit = matrix.bit_of.get(permission)
+        return bit is not None and bool(matrix.role_bits.get(role, 0) & bit)
+
+    def permissions_of(self, role):
+        """
+        All permission names a role has
+        """
+        matrix = self._current()
+        bits = matrix.role_bits.get(role, 0)
+        return sorted(name for name, bit in matrix.bit_of.items() if bits & bit)
+
+
+permission_matrix = PermissionMatrix()
+
+
+def require_permission(permission):
+    """
+    Route decorator: the caller's token role must have the permission
+
+    The role comes from the access token (no database lookup). Requests
+    without a token get 401; REQUIRE_TOKENS=false lets them through
+    unchecked, for a deployment whose old clients cannot send one yet.
+
+        @manager_bp.route("/stats")
+        @require_permission("manager.dashboard")
+        def get_manager_stats(): ...
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            failed = authenticate_request(AUTH_CONFIG["require_tokens"])
+            if failed:
+                return failed
+            if g.user and not permission_matrix.allows(g.user["role"], permission):
+                return jsonify({"error": "Permission denied"}), 403
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
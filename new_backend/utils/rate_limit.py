@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import deque
+
+
+class SlidingWindowLimiter:
+    """
+    Allows at most `limit` hits per key in any `window` seconds.
+
+    Used to throttle login attempts per client IP: every attempt costs a
+    bcrypt check, so an attacker guessing passwords is cut off before it
+    can tie up the password workers.
+    """
+
+    def __init__(self, limit, window, max_keys=10000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._hits = {}
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def hit(self, key):
+        """
+        Record one hit for key if it is allowed
+
+        Returns:
+            float: 0 when allowed, otherwise seconds until the next hit is
+            allowed (the rejected hit is not recorded)
+        """
+        if self.limit <= 0:
+            return 0
+
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                if len(self._hits) >= self.max_keys:
+                    self._prune(now)
+                hits = self._hits[key] = deque()
+
+            while hits and now - hits[0] >= self.window:
+                hits.popleft()
+
+            if len(hits) >= self.limit:
+                self.rejected += 1
+                return self.window - (now - hits[0])
+
+            hits.append(now)
+            return 0
+
+    def _prune(self, now):
+        # drop keys with no hits left in the window (lock held)
+        stale = [key for key, hits in self._hits.items() if not hits or now - hits[-1] >= self.window]
+        for key in stale:
+            del self._hits[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "window": self.window,
+                "keys": len(self._hits),
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,154 @@
+import threading
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # stdlib json is used instead
+    orjson = None
+
+
+def format_time(value):
+    """
+    TIME column (timedelta) as HH:MM:SS, e.g. 2h 30m 45s -> "02:30:45"
+    """
+    hours, rest = divmod(int(value.total_seconds()), 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+# Python type -> converter, for columns first seen in a row
+VALUE_CONVERTERS = {
+    Decimal: float,
+    timedelta: format_time,
+    datetime: datetime.isoformat,
+}
+
+
+def _type_converters():
+    from mysql.connector.constants import FieldType
+
+    return {
+        FieldType.DECIMAL: float,
+        FieldType.NEWDECIMAL: float,
+        FieldType.TIME: format_time,
+        FieldType.DATETIME: datetime.isoformat,
+        FieldType.TIMESTAMP: datetime.isoformat,
+    }
+
+
+class RowSerializer:
+    """
+    Turns database rows into JSON-ready dicts.
+
+    Decimal becomes float, TIME becomes "HH:MM:SS" and DATETIME an ISO
+    string; everything else is passed through. The converter for each
+    column is looked up once, from cursor.description via compile() or
+    from the first non-NULL value of the column, so serializing a row is
+    one dict lookup per column instead of a chain of isinstance checks.
+
+    compile() returns a separate serializer per result shape and caches
+    it on the instance, so the first request with a shape builds it and
+    later ones (on any thread) reuse it without touching shared state:
+
+        ORDER_ROW = RowSerializer()
+        ...
+        cursor.execute(query)
+        order_row = ORDER_ROW.compile(cursor.description)
+        orders = [order_row(row) for row in cursor.fetchall()]
+    """
+
+    _by_type_code = None
+
+    def __init__(self):
+        # column name -> converter, or None to pass the value through
+        self._converters = {}
+        # (name, type_code) per column -> compiled RowSerializer
+        self._compiled = {}
+        self._compile_lock = threading.Lock()
+
+    def compile(self, description):
+        """
+        Serializer with converters resolved from cursor.description
+        (name, type_code, ...), built once per distinct description
+
+        Returns:
+            RowSerializer: The compiled serializer for this shape
+        """
+        shape = tuple((column[0], column[1]) for column in description or ())
+        compiled = self._compiled.get(shape)
+        if compiled is not None:
+            return compiled
+
+        if RowSerializer._by_type_code is None:
+            RowSerializer._by_type_code = _type_converters()
+        by_type_code = RowSerializer._by_type_code
+
+        compiled = RowSerializer()
+        for name, type_code in shape:
+            compiled._converters[name] = by_type_code.get(type_code)
+        with self._compile_lock:
+            return self._compiled.setdefault(shape, compiled)
+
+    def __call__(self, row):
+        converters = self._converters
+        serialized = {}
+        for key, value in row.items():
+            if value is None:
+                serialized[key] = None
+                continue
+            try:
+                convert = converters[key]
+            except KeyError:
+                convert = converters[key] = VALUE_CONVERTERS.get(type(value))
+            serialized[key] = convert(value) if convert else value
+        return serialized
+
+    def many(self, rows):
+        """
+        Serialize a list of rows
+        """
+        return [self(row) for row in rows]
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that encodes with orjson when it is installed.
+
+    Output is equivalent to the default provider: keys are sorted, dates
+    are HTTP dates, Decimal is a string, and responses are indented in
+    debug mode. Anything orjson cannot encode (or options it does not
+    support) falls back to the standard encoder.
+    """
+
+    ORJSON_OPTIONS = (
+        (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+         | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+        if orjson else 0
+    )
+
+    def _orjson_dumps(self, obj, indent=False):
+        options = self.ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=self.default, option=options)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {"indent"} or kwargs.get("indent") not in (None, 2):
+            return super().dumps(obj, **kwargs)
+        try:
+            return self._orjson_dumps(obj, indent=bool(kwargs.get("indent"))).decode("utf-8")
+        except (orjson.JSONEncodeError, TypeError):
+            return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        try:
+            body = self._orjson_dumps(obj, indent=indent)
+        except (orjson.JSONEncodeError, TypeError):
+            return super().response(obj)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
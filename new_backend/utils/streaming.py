@@ -0,0 +1,170 @@
+from flask import Response, current_app
+
+from config import STREAM_CONFIG
+
+
+JSON_MIMETYPE = "application/json"
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def stream_format(args):
+    """
+    Read the streaming mode a list endpoint was asked for
+
+        ?format=ndjson   one JSON object per line
+        ?stream=1        one JSON array, sent in chunks
+
+    Returns:
+        str or None: "ndjson", "json", or None for a normal response
+    """
+    if (args.get("format") or "").lower() == "ndjson":
+        return "ndjson"
+    if (args.get("stream") or "").lower() in ("1", "true", "yes"):
+        return "json"
+    return None
+
+
+def stream_query(conn, query, params=(), fmt="json", transform=None, batch_size=None):
+    """
+    Run a query and stream its rows as the response body
+
+    Rows are read from an unbuffered cursor with fetchmany() and written
+    out batch by batch, so memory stays at one batch no matter how many
+    rows match. The query runs before the response is returned, so SQL
+    errors still reach the route's except block.
+
+    Args:
+        conn: Connection to read from; closed (returned to the pool) when
+              the stream ends or the client goes away
+        query (str): SELECT to run
+        params (tuple): Query parameters
+        fmt (str): "json" (array) or "ndjson" (one object per line)
+        transform (callable): Optional, gets each batch of row dicts and
+                              returns the list of objects to send
+        batch_size (int): Rows per fetchmany() (default STREAM_CONFIG)
+
+    Returns:
+        flask.Response
+    """
+    batch_size = batch_size or STREAM_CONFIG["batch_size"]
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(query, tuple(params))
+    except Exception:
+        _close(cursor, conn)
+        raise
+
+    def batches():
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield transform(rows) if transform else rows
+
+    return _response(batches(), fmt, cursor, conn)
+
+
+def stream_pages(conn, build_query, conditions, params, keyset, fmt="json",
+                 transform=None, batch_size=None, limit=None):
+    """
+    Stream a keyset-ordered query as a series of fully read batches
+
+    Each batch is one query with LIMIT batch_size, starting after the last
+    row of the previous batch. Nothing is left unread between batches, so
+    transform can query the same connection (e.g. load the batch's
+    items) and a client that goes away costs at most the current batch.
+
+    Args:
+        conn: Connection to read from; closed when the stream ends
+        build_query (callable): Gets a list of WHERE conditions and returns
+                                the SELECT, ordered by keyset, without LIMIT
+        conditions (list): Conditions of the request (e.g. customer filter)
+        params (list): Parameters of those conditions
+        keyset (Keyset): Sort order of build_query
+        fmt (str): "json" (array) or "ndjson" (one object per line)
+        transform (callable): Optional, gets (rows, cursor) for each batch
+                              and returns the list of objects to send
+        batch_size (int): Rows per batch (default STREAM_CONFIG)
+        limit (int): Stop after this many rows (default: all)
+
+    Returns:
+        flask.Response
+    """
+    batch_size = batch_size or STREAM_CONFIG["batch_size"]
+    cursor = conn.cursor(dictionary=True)
+
+    def read_batch(last, remaining):
+        batch_conditions = list(conditions)
+        batch_params = list(params)
+        if last is not None:
+            clause, values = keyset.after(keyset.cursor_for(last))
+            batch_conditions.append(clause)
+            batch_params.extend(values)
+        size = batch_size if remaining is None else min(batch_size, remaining)
+        cursor.execute(build_query(batch_conditions) + " LIMIT %s", (*batch_params, size))
+        return cursor.fetchall()
+
+    # First batch before the response is returned, so SQL errors still
+    # reach the route's except block
+    try:
+        first = read_batch(None, limit) if limit != 0 else []
+    except Exception:
+        _close(cursor, conn)
+        raise
+
+    def batches():
+        rows, remaining = first, limit
+        while rows:
+            yield transform(rows, cursor) if transform else rows
+            if remaining is not None:
+                remaining -= len(rows)
+            if len(rows) < batch_size or remaining == 0:
+                return
+            rows = read_batch(rows[-1], remaining)
+
+    return _response(batches(), fmt, cursor, conn)
+
+
+def _response(batches, fmt, cursor, conn):
+    # Same encoder as jsonify(), so streamed rows look like normal responses
+    dumps = current_app.json.dumps
+
+    def generate():
+        sent = 0
+        finished = False
+        try:
+            if fmt == "json":
+                yield "["
+            for items in batches:
+                if not items:
+                    continue
+                if fmt == "json":
+                    chunk = ",".join(dumps(item) for item in items)
+                    yield ("," + chunk if sent else chunk)
+                else:
+                    yield "".join(dumps(item) + "\n" for item in items)
+                sent += len(items)
+            if fmt == "json":
+                yield "]"
+            finished = True
+        except Exception as e:
+            # Headers are already sent; the client sees a truncated body
+            print(f"Streaming error after {sent} rows: {e}")
+        finally:
+            _close(cursor, conn, finished)
+
+    mimetype = NDJSON_MIMETYPE if fmt == "ndjson" else JSON_MIMETYPE
+    return Response(generate(), mimetype=mimetype)
+
+
+def _close(cursor, conn, finished=True):
+    if not finished and getattr(conn, "unread_result", False):
+        # The client went away mid-result: drop the connection rather than
+        # read the rest of the rows just to reuse it
+        conn.discard()
+        return
+    try:
+        cursor.close()
+    except Exception:
+        pass
+    conn.close()
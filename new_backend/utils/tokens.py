@@ -0,0 +1,237 @@
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from functools import wraps
+
+from flask import g, jsonify, request
+
+from config import AUTH_CONFIG, FLASK_CONFIG
+from db import get_db_connection
+
+
+class TokenError(Exception):
+    """Raised when an access token is missing, malformed, expired or revoked"""
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+# Example values from old configs and the README; tokens signed with them
+# could be forged by anyone
+PLACEHOLDER_SECRETS = {"default-secret-key", "change-this-secret-key"}
+
+
+def signing_key():
+    """
+    Key that signs access tokens (FLASK_SECRET_KEY)
+
+    Raises:
+        RuntimeError: FLASK_SECRET_KEY is unset or a known example value
+    """
+    key = FLASK_CONFIG["SECRET_KEY"]
+    if not key or key in PLACEHOLDER_SECRETS:
+        raise RuntimeError("FLASK_SECRET_KEY is not set (or is an example value); refusing to sign tokens")
+    return key.encode("utf-8")
+
+
+def _sign(payload):
+    return _b64encode(hmac.new(signing_key(), payload.encode("ascii"), hashlib.sha256).digest())
+
+
+def issue_token(user_id, role, vip=False):
+    """
+    Create a signed access token for a logged in user
+
+    The token is "<payload>.<signature>": base64url JSON with the user id,
+    role, VIP flag, issue time and expiry, signed with HMAC-SHA256 and the
+    Flask SECRET_KEY. Checking it needs no database access.
+
+    Args:
+        user_id (int): User the token is for
+        role (str): User's role at login
+        vip (bool): User's VIP status at login
+
+    Returns:
+        str: Token for the Authorization: Bearer header
+    """
+    now = int(time.time())
+    claims = {
+        "sub": user_id,
+        "role": role,
+        "vip": bool(vip),
+        "iat": now,
+        "exp": now + AUTH_CONFIG["token_ttl"],
+    }
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    return f"{payload}.{_sign(payload)}"
+
+
+def decode_token(token):
+    """
+    Check a token's signature, expiry and revocation
+
+    Returns:
+        dict: {"user_id", "role", "vip"}
+
+    Raises:
+        TokenError: Token is invalid, expired or revoked
+    """
+    try:
+        payload, signature = token.split(".")
+    except (AttributeError, ValueError):
+        raise TokenError("Invalid token")
+
+    if not hmac.compare_digest(signature, _sign(payload)):
+        raise TokenError("Invalid token")
+
+    try:
+        claims = json.loads(_b64decode(payload))
+        user_id, issued_at, expires_at = claims["sub"], claims["iat"], claims["exp"]
+    except (ValueError, KeyError, TypeError):
+        raise TokenError("Invalid token")
+
+    if expires_at <= time.time():
+        raise TokenError("Token expired")
+    if revocations.is_revoked(user_id, issued_at):
+        raise TokenError("Token revoked")
+
+    return {"user_id": user_id, "role": claims.get("role"), "vip": bool(claims.get("vip"))}
+
+
+class RevocationList:
+    """
+    In-memory list of users whose tokens must no longer be accepted.
+
+    revoke() is called when a user is fired, deregistered or blacklisted;
+    it rejects every token issued to them up to now. Entries are dropped
+    once all such tokens would have expired anyway. Blacklisted users are
+    also reloaded from the users table by a background job, so other
+    processes pick up a blacklisting within one interval.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revoked = {}        # user_id -> revoked at (unix seconds)
+        self._blacklisted = set()
+
+    def revoke(self, user_id):
+        with self._lock:
+            self._revoked[int(user_id)] = int(time.time())
+
+    def is_revoked(self, user_id, issued_at):
+        if user_id in self._blacklisted:
+            return True
+        revoked_at = self._revoked.get(user_id)
+        return revoked_at is not None and issued_at <= revoked_at
+
+    def reload(self):
+        """
+        Reload blacklisted users and drop revocations older than the token lifetime
+
+        Returns:
+            int: Number of blacklisted users
+        """
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError("Database connection failed")
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT user_id FROM users WHERE is_blacklisted = TRUE")
+            blacklisted = {row[0] for row in cursor.fetchall()}
+            cursor.close()
+        finally:
+            conn.close()
+
+        cutoff = time.time() - AUTH_CONFIG["token_ttl"]
+        with self._lock:
+            self._blacklisted = blacklisted
+            self._revoked = {uid: at for uid, at in self._revoked.items() if at > cutoff}
+        return len(blacklisted)
+
+
+revocations = RevocationList()
+
+
+def _bearer_token():
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        return header[len("Bearer "):].strip() or None
+    return None
+
+
+def authenticate_request(required, roles=()):
+    """
+    Read the Bearer token into g.user (None when there is no token)
+
+    Returns:
+        tuple or None: an error response (401/403), or None to continue
+    """
+    token = _bearer_token()
+    if not token:
+        g.user = None
+        if required:
+            return jsonify({"error": "Authentication required"}), 401
+        return None
+
+    try:
+        g.user = decode_token(token)
+    except TokenError as e:
+        g.user = None
+        return jsonify({"error": str(e)}), 401
+
+    if roles and g.user["role"] not in roles:
+        return jsonify({"error": "Not allowed for this role"}), 403
+    return None
+
+
+def token_required(*roles):
+    """
+    Route decorator: require a valid token, optionally for one of the given roles
+
+    The token's claims are put in g.user ({"user_id", "role", "vip"}).
+
+        @manager_bp.route("/stats")
+        @token_required("manager")
+        def get_manager_stats(): ...
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            failed = authenticate_request(True, roles)
+            return failed if failed else fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def token_optional(fn):
+    """
+    Route decorator: use the token if one is sent (g.user), else g.user is None
+
+    A token that is sent but invalid, expired or revoked still gets a 401.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        failed = authenticate_request(False)
+        return failed if failed else fn(*args, **kwargs)
+    return wrapper
+
+
+def token_mismatch(user_id):
+    """
+    Check a user id from the request body against the token, if there is one
+
+    Returns:
+        tuple or None: a 403 response when the token belongs to someone else
+    """
+    user = g.get("user")
+    if user and user_id is not None and str(user["user_id"]) != str(user_id):
+        return jsonify({"error": "Token does not match this user"}), 403
+    return None